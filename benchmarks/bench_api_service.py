@@ -0,0 +1,67 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+
+Compares per-request connections, a pooled session and the concurrent batch API
+against a local stub server. Run from the project root:
+
+    python -m benchmarks.bench_api_service --cities 300 --latency 0.005
+"""
+
+import argparse
+import time
+
+from benchmarks.stub_server import StubWeatherServer
+from models.city import City
+from services.api_service import OpenWeatherMapService
+
+
+def run_sequential(service: OpenWeatherMapService, cities: list[City]) -> float:
+    start = time.perf_counter()
+    for city in cities:
+        service.get_weather_by_city_and_country(city.name, city.country)
+    return time.perf_counter() - start
+
+
+def run_batch(service: OpenWeatherMapService, cities: list[City]) -> float:
+    start = time.perf_counter()
+    results = service.get_weather_for_cities(cities)
+    elapsed = time.perf_counter() - start
+    errors = [error for _, error in results if error is not None]
+    if errors:
+        raise Exception(f"{len(errors)} lookups failed, first error: {errors[0]}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-2])
+    parser.add_argument("--cities", type=int, default=300, help="number of cities per cycle")
+    parser.add_argument("--latency", type=float, default=0.005, help="stub server delay per response (s)")
+    parser.add_argument("--workers", type=int, default=16, help="thread pool size for the batch API")
+    args = parser.parse_args()
+
+    cities = [City(f"City{i}", "HR") for i in range(args.cities)]
+
+    with StubWeatherServer(latency=args.latency) as server:
+        cases = [
+            ("requests.get per call", lambda: run_sequential(
+                OpenWeatherMapService("stub", server.base_url, use_session=False), cities)),
+            ("pooled session", lambda: run_sequential(
+                OpenWeatherMapService("stub", server.base_url), cities)),
+            (f"batch, {args.workers} workers", lambda: run_batch(
+                OpenWeatherMapService("stub", server.base_url, max_workers=args.workers), cities)),
+        ]
+        print(f"{args.cities} cities, {args.latency * 1000:.1f} ms stub latency")
+        for name, case in cases:
+            elapsed = case()
+            print(f"  {name:<24} {elapsed:8.3f} s  {args.cities / elapsed:10.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
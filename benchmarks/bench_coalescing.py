@@ -0,0 +1,68 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+
+Compares request counts and time per polling cycle of single-city lookups and coalesced group
+requests against a local stub server. Run from the project root:
+
+    python -m benchmarks.bench_coalescing --cities 300 --latency 0.005
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_server import StubWeatherServer
+from models.city import City
+from services.api_service import OpenWeatherMapService
+from services.coalescing_service import CoalescingWeatherService
+
+
+def run_cycle(server: StubWeatherServer, cycle) -> tuple[float, int]:
+    requests_before = server.request_count
+    start = time.perf_counter()
+    cycle()
+    return time.perf_counter() - start, server.request_count - requests_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-2])
+    parser.add_argument("--cities", type=int, default=300, help="number of cities per cycle")
+    parser.add_argument("--latency", type=float, default=0.005, help="stub server delay per response (s)")
+    parser.add_argument("--workers", type=int, default=16, help="thread pool size for batch lookups")
+    parser.add_argument("--callers", type=int, default=100, help="concurrent single-city callers")
+    args = parser.parse_args()
+
+    cities = [City(f"City{i}", "HR") for i in range(args.cities)]
+
+    with StubWeatherServer(latency=args.latency) as server:
+        service = OpenWeatherMapService("stub", server.base_url, max_workers=args.workers)
+        coalescing = CoalescingWeatherService(service)
+
+        # Upstream ids are learned from the first lookup of every city
+        _, warmup_requests = run_cycle(server, lambda: coalescing.get_weather_for_cities(cities))
+
+        def concurrent_callers():
+            with ThreadPoolExecutor(max_workers=args.callers) as executor:
+                list(executor.map(lambda c: coalescing.get_weather_by_city_and_country(c.name, c.country), cities))
+
+        cases = [
+            ("single-city batch", lambda: service.get_weather_for_cities(cities)),
+            ("group batch", lambda: coalescing.get_weather_for_cities(cities)),
+            (f"{args.callers} coalesced callers", concurrent_callers),
+        ]
+        print(f"{args.cities} cities, {args.latency * 1000:.1f} ms stub latency, "
+              f"{warmup_requests} requests to resolve upstream ids")
+        for name, cycle in cases:
+            elapsed, request_count = run_cycle(server, cycle)
+            print(f"  {name:<24} {elapsed:8.3f} s  {request_count:6d} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+
+Expires most of a database's weather records while a writer thread keeps storing batches, once with
+a single DELETE statement and once with the batched CompactionJob, and reports the longest time a
+writer batch had to wait. Run from the project root:
+
+    python -m benchmarks.bench_compaction --rows 1000000 --cities 100
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from models.city import City
+from models.weather import Weather
+from services.database_service import DatabaseService
+from services.retention import CompactionJob, RetentionPolicy
+
+NOW = datetime(2026, 1, 1)
+
+
+def fill(db: DatabaseService, cities: list[City], rows: int):
+    """Stores `rows` observations spread over the cities, one minute apart, ending at NOW."""
+    per_city = rows // len(cities)
+    start = NOW - timedelta(minutes=per_city)
+    chunk = []
+    for minute in range(per_city):
+        chunk.extend(Weather(city, 10.0 + minute % 20, 60, 1013, "Clear", 3.5, start + timedelta(minutes=minute))
+                     for city in cities)
+        if len(chunk) >= 50000:
+            db.add_weather_records(chunk, chunk_size=len(chunk))
+            chunk = []
+    db.add_weather_records(chunk, chunk_size=max(1, len(chunk)))
+
+
+def write_while(db: DatabaseService, cities: list[City], done: threading.Event, batch_size: int) -> list[float]:
+    """Stores new batches until done is set and returns the duration of every batch."""
+    durations = []
+    minute = 0
+    while not done.is_set():
+        batch = [Weather(city, 15.0, 60, 1013, "Rain", 2.0, NOW + timedelta(minutes=minute))
+                 for city in cities[:batch_size]]
+        minute += 1
+        started = time.perf_counter()
+        db.add_weather_records(batch, chunk_size=len(batch))
+        durations.append(time.perf_counter() - started)
+        time.sleep(0.01)
+    return durations
+
+
+def run_case(label: str, compact, args, cities: list[City]):
+    """Runs one compaction method against a fresh database while the writer is storing batches."""
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseService(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        db.create_schema()
+        fill(db, cities, args.rows)
+        done = threading.Event()
+        durations = []
+        writer = threading.Thread(target=lambda: durations.extend(write_while(db, cities, done, args.writer_batch)))
+        writer.start()
+        time.sleep(0.2)
+        started = time.perf_counter()
+        deleted = compact(db)
+        elapsed = time.perf_counter() - started
+        done.set()
+        writer.join()
+        durations.sort()
+        print(f"  {label:<9} {deleted:8d} deleted in {elapsed:6.2f} s  {len(durations):5d} writer batches  "
+              f"median {durations[len(durations) // 2] * 1000:7.2f} ms  max {durations[-1] * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-2])
+    parser.add_argument("--rows", type=int, default=1000000, help="weather_records rows before compaction")
+    parser.add_argument("--cities", type=int, default=100, help="cities the rows are spread over")
+    parser.add_argument("--raw-days", type=int, default=2, help="days of weather records kept")
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows deleted per compaction transaction")
+    parser.add_argument("--writer-batch", type=int, default=100, help="observations per writer batch")
+    args = parser.parse_args()
+
+    cities = [City(f"City{i}", "HR") for i in range(args.cities)]
+    policy = RetentionPolicy(raw_days=args.raw_days, hourly_days=None)
+    cutoff = int((policy.cutoffs(NOW)['raw'] - datetime(1970, 1, 1)).total_seconds())
+
+    def single_delete(db: DatabaseService) -> int:
+        with db.engine.begin() as connection:
+            return connection.exec_driver_sql("DELETE FROM weather_records WHERE observed_at < ?", (cutoff,)).rowcount
+
+    def batched(db: DatabaseService) -> int:
+        return CompactionJob(db, policy, batch_size=args.batch_size).run_once(NOW)['raw']
+
+    print(f"{args.rows} rows over {args.cities} cities, keeping {args.raw_days} days")
+    run_case("single", single_delete, args, cities)
+    run_case("batched", batched, args, cities)
+
+
+if __name__ == "__main__":
+    main()
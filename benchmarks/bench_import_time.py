@@ -0,0 +1,69 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+
+Measures the import time of the application modules with 'python -X importtime' and reports which
+heavy dependencies each one pulls in. Every module is imported in a fresh interpreter. Run from the
+project root:
+
+    python -m benchmarks.bench_import_time --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = ["main", "utils.formatters", "utils.helpers", "services.api_service", "services.database_service",
+           "services.ingestion_service"]
+
+HEAVY_DEPENDENCIES = ["requests", "sqlalchemy", "aiohttp", "numpy", "dotenv"]
+
+
+def import_profile(module: str) -> dict[str, int]:
+    """
+    Imports a module in a fresh interpreter and returns the cumulative import time of every module it loaded.
+
+    Args:
+        module (str): The module to import.
+
+    Returns:
+        dict[str, int]: Cumulative import time in microseconds by module name.
+    """
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=project_root, capture_output=True, text=True, check=True
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-2])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument("modules", nargs="*", default=MODULES, help="modules to measure")
+    args = parser.parse_args()
+
+    print(f"{'module':<30} {'median ms':>10}  heavy dependencies loaded")
+    for module in args.modules:
+        profiles = [import_profile(module) for _ in range(args.repeat)]
+        median = statistics.median(profile[module] for profile in profiles) / 1000
+        heavy = [name for name in HEAVY_DEPENDENCIES if name in profiles[0]]
+        print(f"{module:<30} {median:10.1f}  {', '.join(heavy) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
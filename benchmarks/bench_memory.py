@@ -0,0 +1,93 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+
+Measures memory per observation for dict-backed objects, slotted Weather objects and a WeatherBatch.
+Run from the project root:
+
+    python -m benchmarks.bench_memory --observations 200000
+"""
+
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchmarks.stub_server import make_payload
+from models.weather import Weather
+from models.weather_batch import WeatherBatch
+
+
+class DictCity:
+    """The City model as it was before __slots__, kept for comparison."""
+
+    def __init__(self, name, country):
+        self.name = name
+        self.country = country
+
+
+class DictWeather:
+    """The Weather model as it was before __slots__, kept for comparison."""
+
+    def __init__(self, city, temperature, humidity, pressure, condition, wind_speed, observed_at):
+        self.city = city
+        self.temperature = temperature
+        self.humidity = humidity
+        self.pressure = pressure
+        self.condition = condition
+        self.wind_speed = wind_speed
+        self.observed_at = observed_at
+
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-2])
+    parser.add_argument("--observations", type=int, default=200000)
+    parser.add_argument("--cities", type=int, default=300)
+    args = parser.parse_args()
+
+    epoch = datetime(1970, 1, 1)
+    responses = []
+    for i in range(args.observations):
+        payload = make_payload(f"City{i % args.cities}")
+        payload["main"]["temp"] = 10 + (i % 250) / 10
+        payload["dt"] += i * 600
+        responses.append(payload)
+
+    def dict_objects():
+        # Every parsed response gets its own strings and City, as with the original models
+        return [
+            DictWeather(DictCity(str(r["name"]), r["sys"]["country"]), r["main"]["temp"], r["main"]["humidity"],
+                        r["main"]["pressure"], r["weather"][0]["main"], r["wind"]["speed"],
+                        epoch + timedelta(seconds=r["dt"]))
+            for r in responses
+        ]
+
+    cases = [
+        ("dict-backed objects", dict_objects),
+        ("slotted Weather", lambda: [Weather.from_api_response(r) for r in responses]),
+        ("WeatherBatch", lambda: WeatherBatch.from_api_responses(responses)),
+    ]
+    print(f"{args.observations} observations, {args.cities} cities")
+    for name, build in cases:
+        size = measure(build)
+        print(f"  {name:<20} {size / args.observations:8.1f} bytes/observation")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+
+Polls a stub server that enforces a request rate limit, with and without client-side pacing and
+retries, then runs a scheduled cycle that spreads the same cities over an interval. Run from the
+project root:
+
+    python -m benchmarks.bench_rate_limit --cities 200 --limit 50
+"""
+
+import argparse
+import time
+
+from benchmarks.stub_server import StubWeatherServer
+from models.city import City
+from services.api_service import OpenWeatherMapService
+from services.rate_limiter import RetryPolicy, TokenBucket
+from services.scheduler import PollingScheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-2])
+    parser.add_argument("--cities", type=int, default=200, help="number of cities per cycle")
+    parser.add_argument("--limit", type=float, default=50, help="requests per second the server allows")
+    parser.add_argument("--workers", type=int, default=16, help="thread pool size")
+    args = parser.parse_args()
+
+    cities = [City(f"City{i}", "HR") for i in range(args.cities)]
+    client_rate = args.limit * 0.9  # stay slightly below the limit to absorb clock differences
+
+    cases = [
+        ("unpaced, no retries", {}),
+        ("unpaced, with retries", {"retry_policy": RetryPolicy(max_retries=8)}),
+        ("token bucket + retries", {"rate_limiter": TokenBucket(client_rate, capacity=1),
+                                    "retry_policy": RetryPolicy(max_retries=8)}),
+    ]
+    print(f"{args.cities} cities, server limit {args.limit:.0f} req/s")
+    for name, options in cases:
+        with StubWeatherServer(rate_limit=args.limit) as server:
+            service = OpenWeatherMapService("stub", server.base_url, max_workers=args.workers, **options)
+            start = time.perf_counter()
+            results = service.get_weather_for_cities(cities)
+            elapsed = time.perf_counter() - start
+            failed = sum(1 for _, error in results if error is not None)
+            print(f"  {name:<24} {elapsed:7.2f} s  {failed:4d} failed  {server.throttled_count:5d} throttled")
+
+    with StubWeatherServer(rate_limit=args.limit) as server:
+        service = OpenWeatherMapService("stub", server.base_url, retry_policy=RetryPolicy())
+        scheduler = PollingScheduler(cities, interval=args.cities / client_rate)
+        start = time.perf_counter()
+        refreshed = scheduler.run_cycle(lambda c: service.get_weather_by_city_and_country(c.name, c.country))
+        elapsed = time.perf_counter() - start
+        print(f"  {'scheduled cycle':<24} {elapsed:7.2f} s  {args.cities - refreshed:4d} failed  "
+              f"{server.throttled_count:5d} throttled")
+
+
+if __name__ == "__main__":
+    main()
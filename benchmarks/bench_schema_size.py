@@ -0,0 +1,140 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+
+Builds a database in the schema version 3 layout of weather_records (condition and observed_at as
+text, city_name and city_country columns), measures its size and the latency of history queries,
+migrates it to the normalized layout and measures again. Run from the project root:
+
+    python -m benchmarks.bench_schema_size --rows 1000000 --cities 100
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from services.database_service import DatabaseService
+
+CONDITIONS = ("Clear", "Clouds", "Rain", "Drizzle", "Thunderstorm", "Snow", "Mist")
+
+# The layout of schema version 3, as created by create_all and the first three migrations
+OLD_SCHEMA = (
+    "CREATE TABLE city_records (id INTEGER NOT NULL, name VARCHAR NOT NULL, country VARCHAR NOT NULL,"
+    " PRIMARY KEY (id))",
+    "CREATE UNIQUE INDEX ix_city_records_name_country ON city_records (name, country)",
+    "CREATE TABLE weather_records (id INTEGER NOT NULL, temperature FLOAT NOT NULL, humidity INTEGER NOT NULL,"
+    " pressure INTEGER NOT NULL, condition VARCHAR NOT NULL, wind_speed FLOAT NOT NULL, city_id INTEGER NOT NULL,"
+    " city_name VARCHAR, city_country VARCHAR, observed_at DATETIME, PRIMARY KEY (id),"
+    " FOREIGN KEY(city_id) REFERENCES city_records (id), FOREIGN KEY(city_name) REFERENCES city_records (name),"
+    " FOREIGN KEY(city_country) REFERENCES city_records (country))",
+    "CREATE UNIQUE INDEX ix_weather_records_city_id_observed_at ON weather_records (city_id, observed_at)",
+    "PRAGMA user_version = 3",
+)
+
+OLD_QUERY = (
+    "SELECT id, observed_at, temperature, humidity, pressure, condition, wind_speed FROM weather_records"
+    " WHERE city_id = ? AND observed_at >= ? ORDER BY observed_at, id LIMIT ?"
+)
+NEW_QUERY = (
+    "SELECT id, observed_at, temperature, humidity, pressure,"
+    " (SELECT name FROM weather_conditions WHERE weather_conditions.id = condition_id), wind_speed"
+    " FROM weather_records WHERE city_id = ? AND observed_at >= ? ORDER BY observed_at, id LIMIT ?"
+)
+
+
+def build_old_database(path: str, rows: int, cities: int, start: datetime):
+    """Creates the old layout and fills it with `rows` observations spread over `cities`, one minute apart."""
+    connection = sqlite3.connect(path)
+    for statement in OLD_SCHEMA:
+        connection.execute(statement)
+    connection.executemany("INSERT INTO city_records (name, country) VALUES (?, 'HR')",
+                           ((f"City{i}",) for i in range(cities)))
+    connection.executemany(
+        "INSERT INTO weather_records (temperature, humidity, pressure, condition, wind_speed, city_id, observed_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            (10.0 + i % 25, 40 + i % 60, 990 + i % 40, CONDITIONS[i % len(CONDITIONS)], (i % 90) / 7,
+             1 + i % cities, (start + timedelta(minutes=i // cities)).strftime("%Y-%m-%d %H:%M:%S.%f"))
+            for i in range(rows)
+        )
+    )
+    connection.commit()
+    connection.close()
+
+
+def measure_size(path: str) -> dict:
+    """Returns the bytes used by weather_records and its index (after VACUUM) and the file size."""
+    connection = sqlite3.connect(path)
+    connection.execute("VACUUM")
+    sizes = dict(connection.execute(
+        "SELECT name, SUM(pgsize) FROM dbstat"
+        " WHERE name IN ('weather_records', 'ix_weather_records_city_id_observed_at') GROUP BY name"
+    ).fetchall())
+    rows = connection.execute("SELECT COUNT(*) FROM weather_records").fetchone()[0]
+    connection.close()
+    return {"table": sizes["weather_records"], "index": sizes["ix_weather_records_city_id_observed_at"],
+            "file": os.path.getsize(path), "rows": rows}
+
+
+def measure_queries(path: str, query: str, since, city_id: int, repeat: int) -> tuple[float, float]:
+    """Returns the best time of a 100-row history page and of reading the whole history of one city."""
+    connection = sqlite3.connect(path)
+    page = full = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        connection.execute(query, (city_id, since, 100)).fetchall()
+        page = min(page, time.perf_counter() - started)
+        started = time.perf_counter()
+        connection.execute(query, (city_id, 0 if isinstance(since, int) else "", -1)).fetchall()
+        full = min(full, time.perf_counter() - started)
+    connection.close()
+    return page, full
+
+
+def report(label: str, size: dict, page: float, full: float):
+    print(f"  {label:<11} table {size['table'] / 2 ** 20:8.1f} MiB  index {size['index'] / 2 ** 20:7.1f} MiB  "
+          f"{(size['table'] + size['index']) / size['rows']:6.1f} B/row  file {size['file'] / 2 ** 20:8.1f} MiB  "
+          f"page {page * 1000:7.3f} ms  city {full * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-2])
+    parser.add_argument("--rows", type=int, default=1000000, help="weather_records rows")
+    parser.add_argument("--cities", type=int, default=100, help="cities the rows are spread over")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per query, the fastest is kept")
+    args = parser.parse_args()
+
+    start = datetime(2025, 1, 1)
+    middle = start + timedelta(minutes=args.rows // args.cities // 2)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        build_old_database(path, args.rows, args.cities, start)
+        print(f"{args.rows} rows over {args.cities} cities")
+        old_size = measure_size(path)
+        report("before", old_size, *measure_queries(path, OLD_QUERY, middle.strftime("%Y-%m-%d %H:%M:%S.%f"), 1,
+                                                    args.repeat))
+
+        started = time.perf_counter()
+        db = DatabaseService(f"sqlite:///{path}")
+        db.create_schema()
+        db.engine.dispose()
+        print(f"  migrated in {time.perf_counter() - started:.2f} s")
+
+        new_size = measure_size(path)
+        since = int((middle - datetime(1970, 1, 1)).total_seconds())
+        report("after", new_size, *measure_queries(path, NEW_QUERY, since, 1, args.repeat))
+        saved = 1 - (new_size["table"] + new_size["index"]) / (old_size["table"] + old_size["index"])
+        print(f"  weather_records and its index are {saved:.0%} smaller")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+
+Runs one ingestion cycle over the same cities with 1, 2, 4 and 8 worker processes against a stub
+server running in its own process, and reports the stored observations per second. Run from the
+project root:
+
+    python -m benchmarks.bench_sharded_ingestion --cities 2000 --processes 1 2 4 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.stub_server import StubWeatherServer
+
+
+def serve_stub(latency: float, ready, stop_event):
+    """Runs the stub server in a separate process, so it does not compete for the benchmark's GIL."""
+    with StubWeatherServer(latency=latency) as server:
+        ready.put(server.base_url)
+        stop_event.wait()
+
+
+def run_case(base_url: str, cities_path: str, processes: int, fetch_workers: int, batch_size: int) -> tuple:
+    """Runs one cycle with the given number of worker processes and returns (stored, failed, seconds)."""
+    from services.sharded_ingestion import ShardedIngestion
+
+    with tempfile.TemporaryDirectory() as directory:
+        ingestion = ShardedIngestion(
+            "stub",
+            f"sqlite:///{os.path.join(directory, 'bench.db')}",
+            cities_path=cities_path,
+            processes=processes,
+            base_url=base_url,
+            interval=0,
+            fetch_workers=fetch_workers,
+            batch_size=batch_size,
+            flush_interval=0.5
+        )
+        start = time.perf_counter()
+        ingestion.run(cycles=1)
+        return ingestion.stored, ingestion.failed, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-2])
+    parser.add_argument("--cities", type=int, default=2000, help="number of cities per cycle")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8], help="worker process counts")
+    parser.add_argument("--fetch-workers", type=int, default=4, help="fetch threads per worker process")
+    parser.add_argument("--batch-size", type=int, default=200, help="observations per batch")
+    parser.add_argument("--latency", type=float, default=0.002, help="stub server delay per response (s)")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    ready, stop_event = context.Queue(), context.Event()
+    stub = context.Process(target=serve_stub, args=(args.latency, ready, stop_event), daemon=True)
+    stub.start()
+    base_url = ready.get()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8") as file:
+        file.writelines(f"City{chr(65 + i % 26)}{chr(65 + i // 26 % 26)}{chr(65 + i // 676 % 26)},HR\n"
+                        for i in range(args.cities))
+        cities_path = file.name
+
+    try:
+        print(f"{args.cities} cities, {args.fetch_workers} fetch threads per process, "
+              f"{args.latency * 1000:.1f} ms stub latency, {os.cpu_count()} CPUs")
+        baseline = None
+        for processes in args.processes:
+            stored, failed, elapsed = run_case(base_url, cities_path, processes, args.fetch_workers,
+                                               args.batch_size)
+            rate = stored / elapsed
+            baseline = baseline or rate
+            print(f"  {processes} process(es)  {elapsed:7.2f} s  {rate:8.1f} obs/s  x{rate / baseline:4.2f}  "
+                  f"{stored:6d} stored  {failed:4d} failed")
+    finally:
+        os.unlink(cities_path)
+        stop_event.set()
+        stub.join()
+
+
+if __name__ == "__main__":
+    main()
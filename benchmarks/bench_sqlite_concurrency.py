@@ -0,0 +1,96 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+
+Runs one writer thread storing weather batches while reader threads page through the history,
+with SQLite's default settings and with the performance profile. Run from the project root:
+
+    python -m benchmarks.bench_sqlite_concurrency --readers 4 --seconds 5
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from models.city import City
+from models.weather import Weather
+from services.database_service import PERFORMANCE_PROFILE, DatabaseService
+
+
+def make_batch(cities: list[City], start: datetime, size: int) -> list[Weather]:
+    """Builds a batch of observations spread over the cities, one minute apart."""
+    return [
+        Weather(cities[i % len(cities)], 10.0 + i % 20, 60, 1013, "Clear", 3.5, start + timedelta(minutes=i))
+        for i in range(size)
+    ]
+
+
+def run_case(profile, cities: list[City], readers: int, seconds: float, batch_size: int) -> dict:
+    """Runs the writer and readers against a fresh database and returns the counts."""
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseService(f"sqlite:///{os.path.join(directory, 'bench.db')}", profile=profile)
+        db.add_weather_records(make_batch(cities, datetime(2026, 1, 1), batch_size))
+        stop = threading.Event()
+        counts = {"writes": 0, "reads": 0, "write_errors": 0, "read_errors": 0}
+        lock = threading.Lock()
+
+        def writer():
+            start = datetime(2026, 2, 1)
+            while not stop.is_set():
+                start += timedelta(minutes=batch_size)
+                # add_weather_records prints and swallows errors, so a short count is a failed write
+                stored = db.add_weather_records(make_batch(cities, start, batch_size))
+                with lock:
+                    counts["writes" if stored == batch_size else "write_errors"] += 1
+
+        def reader(index: int):
+            city = cities[index % len(cities)]
+            while not stop.is_set():
+                try:
+                    records, _ = db.get_weather_history(city, limit=100)
+                    key = "reads" if records else "read_errors"
+                except Exception:
+                    key = "read_errors"
+                with lock:
+                    counts[key] += 1
+
+        threads = [threading.Thread(target=writer)]
+        threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        db.engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-2])
+    parser.add_argument("--readers", type=int, default=4, help="number of reader threads")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each case")
+    parser.add_argument("--batch-size", type=int, default=200, help="observations per write")
+    parser.add_argument("--cities", type=int, default=50, help="number of distinct cities")
+    args = parser.parse_args()
+
+    cities = [City(f"City{i}", "HR") for i in range(args.cities)]
+    print(f"1 writer, {args.readers} readers, {args.seconds:.0f} s per case")
+    for name, profile in (("sqlite defaults", None), ("performance profile", PERFORMANCE_PROFILE)):
+        counts = run_case(profile, cities, args.readers, args.seconds, args.batch_size)
+        print(f"  {name:<20} {counts['writes'] / args.seconds:8.1f} writes/s  "
+              f"{counts['reads'] / args.seconds:8.1f} reads/s  "
+              f"{counts['write_errors']:4d} write errors  {counts['read_errors']:4d} read errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from services.rate_limiter import TokenBucket
+
+
+def stub_city_id(city_name: str, country: str = "HR") -> int:
+    """
+    Returns the stable upstream id the stub server assigns to a city.
+
+    Args:
+        city_name (str): The name of the city.
+        country (str): The country code of the city.
+
+    Returns:
+        int: The city id.
+    """
+    return zlib.crc32(f"{city_name},{country}".encode("utf-8")) & 0x7fffffff
+
+
+def make_payload(city_name: str, country: str = "HR") -> dict:
+    """
+    Builds a current weather payload shaped like an OpenWeatherMap API response.
+
+    Args:
+        city_name (str): The name of the city.
+        country (str): The country code of the city.
+
+    Returns:
+        dict: The payload for the city.
+    """
+    return {
+        "coord": {"lon": 15.978, "lat": 45.8144},
+        "weather": [{"id": 800, "main": "Clear", "description": "clear sky", "icon": "01d"}],
+        "base": "stations",
+        "main": {"temp": 21.5, "feels_like": 21.1, "temp_min": 20.2, "temp_max": 22.8,
+                 "pressure": 1016, "humidity": 58, "sea_level": 1016, "grnd_level": 991},
+        "visibility": 10000,
+        "wind": {"speed": 3.6, "deg": 200},
+        "clouds": {"all": 0},
+        "dt": 1727604000,
+        "sys": {"type": 2, "id": 2005, "country": country, "sunrise": 1727585281, "sunset": 1727627907},
+        "timezone": 7200,
+        "id": stub_city_id(city_name, country),
+        "name": city_name,
+        "cod": 200
+    }
+
+
+class StubWeatherHandler(BaseHTTPRequestHandler):
+    """
+    Answers current weather requests with a canned payload for the requested city.
+
+    Supports lookups by name ('/weather?q=...'), by id ('/weather?id=...') and by a list of ids
+    ('/group?id=1,2,3'). Ids are only known for cities that were looked up by name before, as upstream
+    ids are learned from responses.
+    """
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without TCP_NODELAY keep-alive clients stall on delayed ACKs
+    disable_nagle_algorithm = True
+    latency = 0.0
+
+    def do_GET(self):
+        self.server.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.server.rate_limit is not None and not self.server.rate_limit.try_acquire():
+            self.server.throttled_count += 1
+            self.send_json(429, {"cod": 429, "message": "rate limit exceeded"}, {"Retry-After": "1"})
+            return
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if "q" in query:
+            name, _, country = query["q"][0].partition(",")
+            country = country or "HR"
+            self.server.cities[stub_city_id(name, country)] = (name, country)
+            self.send_json(200, make_payload(name, country))
+            return
+
+        ids = [int(city_id) for city_id in query.get("id", [""])[0].split(",") if city_id]
+        unknown = [city_id for city_id in ids if city_id not in self.server.cities]
+        if not ids or unknown:
+            self.send_json(404, {"cod": "404", "message": "city not found"})
+        elif url.path.endswith("/group"):
+            payloads = [make_payload(*self.server.cities[city_id]) for city_id in ids]
+            self.send_json(200, {"cnt": len(payloads), "list": payloads})
+        else:
+            self.send_json(200, make_payload(*self.server.cities[ids[0]]))
+
+    def send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep benchmark output readable
+        pass
+
+
+class StubWeatherServer:
+    """
+    A local HTTP server that imitates the OpenWeatherMap API for benchmarks.
+
+    Attributes:
+        server (ThreadingHTTPServer): The underlying HTTP server.
+        base_url (str): The URL to pass to OpenWeatherMapService as its base URL.
+    """
+
+    @property
+    def request_count(self) -> int:
+        """The number of requests the server has received."""
+        return self.server.request_count
+
+    @property
+    def throttled_count(self) -> int:
+        """The number of requests the server rejected with 429."""
+        return self.server.throttled_count
+
+    def __init__(self, handler_class=StubWeatherHandler, latency: float = 0.0, rate_limit: float = None,
+                 burst: float = None):
+        """
+        Initializes the stub server on a free local port.
+
+        Args:
+            handler_class (type): The request handler class.
+            latency (float): Seconds each response is delayed by, to imitate network round trips.
+            rate_limit (float): Requests per second above which the server answers 429 (optional).
+            burst (float): The largest burst the rate limit allows (default is one second's worth).
+        """
+        if latency:
+            handler_class = type(handler_class.__name__, (handler_class,), {"latency": latency})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        self.server.daemon_threads = True
+        self.server.request_count = 0
+        self.server.throttled_count = 0
+        self.server.rate_limit = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.server.cities = {}  # upstream id -> (name, country) of every city looked up by name
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/data/2.5/weather"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,293 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+
+Runs the fetch, parse, store, query and format benchmarks and records the results as JSON, optionally
+comparing them with the results of an earlier run. Run from the project root:
+
+    python -m benchmarks.suite --sizes 10000 1000000 --output results.json --compare baseline.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.stub_server import StubWeatherServer, make_payload
+from models.city import City
+from models.weather import Weather
+from models.weather_batch import WeatherBatch
+from services.api_service import OpenWeatherMapService
+from services.database_service import DatabaseService
+from utils import json_decoder
+from utils.formatters import format_weather_history, write_weather_table
+
+# A rate that drops by more than this fraction against the compared run is reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+class Suite:
+    """
+    Times benchmark cases and collects their results.
+
+    Every case is run `repeat` times and the fastest run is kept, which filters out most of the noise
+    of a shared machine.
+
+    Attributes:
+        repeat (int): The number of runs per case.
+        results (list[dict]): One entry per case with its name, the number of processed items, the best
+            time in seconds and the resulting rate in items per second.
+    """
+
+    def __init__(self, repeat: int = 3):
+        self.repeat = repeat
+        self.results = []
+
+    def run(self, name: str, case, unit: str = "rows") -> dict:
+        """
+        Times a case and records its result.
+
+        Args:
+            name (str): The unique name of the case, used to match results across runs.
+            case (callable): A function without arguments that does the work and returns the number of
+                processed items.
+            unit (str): What the processed items are.
+
+        Returns:
+            dict: The recorded result.
+        """
+        best = None
+        count = 0
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            count = case()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        result = {"name": name, "count": count, "unit": unit, "seconds": best,
+                  "rate": count / best if best else 0.0}
+        self.results.append(result)
+        print(f"  {name:<44} {count:9d} {unit:<9} {best:9.4f} s  {result['rate']:12.1f} {unit}/s")
+        return result
+
+
+def make_weathers(cities: list[City], count: int, start: datetime) -> list[Weather]:
+    """Builds observations spread round-robin over the cities, one minute apart per city."""
+    return [
+        Weather(cities[i % len(cities)], 10.0 + i % 25, 40 + i % 60, 990 + i % 40,
+                ("Clear", "Clouds", "Rain")[i % 3], (i % 90) / 7, start + timedelta(minutes=i // len(cities)))
+        for i in range(count)
+    ]
+
+
+def bench_fetch(suite: Suite, requests: int, latency: float):
+    """Fetches weather from the stub server one by one and with the concurrent batch API."""
+    cities = [City(f"City{i}", "HR") for i in range(requests)]
+    with StubWeatherServer(latency=latency) as server:
+        with OpenWeatherMapService("stub", server.base_url) as service:
+            def sequential():
+                for city in cities:
+                    service.get_weather_by_city_and_country(city.name, city.country)
+                return len(cities)
+
+            def batch():
+                results = service.get_weather_for_cities(cities)
+                return sum(1 for _, error in results if error is None)
+
+            suite.run("fetch.sequential", sequential, "requests")
+            suite.run("fetch.batch", batch, "requests")
+
+
+def bench_parse(suite: Suite, count: int):
+    """Parses API responses: from dicts, from raw single-city bodies and from raw group bodies."""
+    payloads = [make_payload(f"City{i % 100}") for i in range(count)]
+    bodies = [json.dumps(payload).encode("utf-8") for payload in payloads]
+    groups = [json.dumps({"cnt": 20, "list": payloads[i:i + 20]}).encode("utf-8") for i in range(0, count, 20)]
+
+    def from_dicts():
+        for payload in payloads:
+            Weather.from_api_response(payload)
+        return len(payloads)
+
+    def stdlib_text():
+        # What response.json() did: decode the body to text, then parse it
+        for body in bodies:
+            Weather.from_api_response(json.loads(body.decode("utf-8")))
+        return len(bodies)
+
+    def from_json():
+        for body in bodies:
+            Weather.from_json(body)
+        return len(bodies)
+
+    def group_to_weathers():
+        return sum(len(Weather.list_from_json(body)) for body in groups)
+
+    def group_to_batch():
+        return sum(len(WeatherBatch.from_json(body)) for body in groups)
+
+    suite.run("parse.from_api_response", from_dicts, "responses")
+    suite.run("parse.json_and_from_api_response", stdlib_text, "responses")
+    selected = json_decoder.backend()
+    for backend in ("json", "orjson"):
+        try:
+            json_decoder.set_backend(backend)
+        except ImportError:
+            continue
+        suite.run(f"parse.from_json[{backend}]", from_json, "responses")
+        suite.run(f"parse.group_list_from_json[{backend}]", group_to_weathers, "cities")
+        suite.run(f"parse.group_batch_from_json[{backend}]", group_to_batch, "cities")
+    json_decoder.set_backend(selected)
+
+
+def bench_store(suite: Suite, directory: str, single: int, bulk: int):
+    """Stores observations one record per call and through the bulk path, each run in a fresh database."""
+    cities = [City(f"City{i}", "HR") for i in range(10)]
+    runs = iter(range(2 * suite.repeat))
+
+    def fresh_db() -> DatabaseService:
+        db = DatabaseService(f"sqlite:///{os.path.join(directory, f'store{next(runs)}.db')}")
+        db.create_schema()
+        return db
+
+    def one_by_one():
+        db = fresh_db()
+        for weather in make_weathers(cities, single, datetime(2026, 1, 1)):
+            db.add_weather_record(weather)
+        db.engine.dispose()
+        return single
+
+    def bulk_insert():
+        db = fresh_db()
+        stored = db.add_weather_records(make_weathers(cities, bulk, datetime(2026, 1, 1)))
+        db.engine.dispose()
+        return stored
+
+    suite.run("store.add_weather_record", one_by_one)
+    suite.run("store.add_weather_records", bulk_insert)
+
+
+def bench_query_and_format(suite: Suite, directory: str, size: int, cities: int):
+    """Queries the history of one city in a table of `size` rows, then formats the loaded records."""
+    db = DatabaseService(f"sqlite:///{os.path.join(directory, f'query{size}.db')}")
+    city_list = [City(f"City{i}", "HR") for i in range(cities)]
+    start = datetime(2025, 1, 1)
+    loaded = 0
+    while loaded < size:
+        count = min(50000, size - loaded)
+        db.add_weather_records(make_weathers(city_list, count, start + timedelta(minutes=loaded // cities)),
+                               chunk_size=5000)
+        loaded += count
+    city = city_list[0]
+
+    records = []
+
+    def all_records():
+        records[:] = db.get_weather_records_for_city(city)
+        return len(records)
+
+    suite.run(f"query.get_weather_records_for_city[{size}]", all_records)
+    middle = start + timedelta(minutes=size // cities // 2)
+    suite.run(f"query.get_weather_history_page[{size}]",
+              lambda: len(db.get_weather_history(city, since=middle, limit=100)[0]))
+    suite.run(f"query.iter_weather_history_rows[{size}]",
+              lambda: sum(1 for _ in db.iter_weather_history_rows(city)))
+
+    def format_history():
+        return format_weather_history(records).count("Weather in")
+
+    def format_table():
+        return write_weather_table(records, io.StringIO())
+
+    suite.run(f"format.format_weather_history[{size}]", format_history)
+    suite.run(f"format.write_weather_table[{size}]", format_table)
+    db.engine.dispose()
+
+
+def git_revision() -> str | None:
+    """Returns the current commit of the working tree, if it is a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict], path: str) -> int:
+    """
+    Prints the change of every rate against an earlier run.
+
+    Returns:
+        int: The number of cases that got slower by more than REGRESSION_THRESHOLD.
+    """
+    with open(path, encoding="utf-8") as file:
+        previous = {result["name"]: result for result in json.load(file)["results"]}
+
+    regressions = 0
+    print(f"\nCompared with {path}:")
+    for result in results:
+        old = previous.get(result["name"])
+        if not old or not old["rate"]:
+            continue
+        change = result["rate"] / old["rate"] - 1
+        flag = ""
+        if change < -REGRESSION_THRESHOLD:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"  {result['name']:<44} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-2])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 1000000],
+                        help="weather_records table sizes for the query and format cases")
+    parser.add_argument("--cities", type=int, default=10, help="cities the table rows are spread over")
+    parser.add_argument("--requests", type=int, default=200, help="stub server requests per fetch case")
+    parser.add_argument("--latency", type=float, default=0.002, help="stub server delay per response (s)")
+    parser.add_argument("--parse", type=int, default=50000, help="responses per parse case")
+    parser.add_argument("--single", type=int, default=500, help="records stored one by one")
+    parser.add_argument("--bulk", type=int, default=20000, help="records stored through the bulk path")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the fastest is kept")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    suite = Suite(args.repeat)
+    with tempfile.TemporaryDirectory() as directory:
+        bench_fetch(suite, args.requests, args.latency)
+        bench_parse(suite, args.parse)
+        bench_store(suite, directory, args.single, args.bulk)
+        for size in args.sizes:
+            bench_query_and_format(suite, directory, size, args.cities)
+
+    report = {
+        "revision": git_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "json_backend": json_decoder.backend(),
+        "parameters": vars(args),
+        "results": suite.results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare and compare(suite.results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
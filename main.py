@@ -4,37 +4,83 @@ Address: Gradišćanska 24, 10000 Zagreb, Croatia
 Web: www.algebra.hr
 VAT-ID: 10750578045
 
-Last modified: 2024-09-29
+Last modified: 2026-10-18
 
 NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
 """
 
+import argparse
 import os
-from dotenv import load_dotenv
-from services.api_service import OpenWeatherMapService
-from services.database_service import DatabaseService
+import sys
+from datetime import datetime
 from models.city import City
 from utils.helpers import validate_city_name, validate_country_code
-from utils.formatters import format_weather, format_weather_history
+from utils.formatters import CITY_TABLE_COLUMNS, WEATHER_TABLE_COLUMNS, format_weather, write_weather_table
 
-# Load environment variables from .env file
-load_dotenv()
+# Services are created on first use, and their modules (requests, SQLAlchemy) imported only then,
+# so the menu appears without waiting for them
+_weather_service = None
+_db_service = None
 
-# Fetch the API key from the environment
-api_key = os.getenv("OPENWEATHER_API_KEY")
+DEFAULT_DB_URL = "sqlite:///data/weather.db"
 
-# Check if the API key was loaded
-if not api_key:
-    raise Exception("API key not found. Please ensure OPENWEATHER_API_KEY is set in the .env file.")
+def load_api_key() -> str:
+    """
+    Loads the OpenWeatherMap API key from the environment or the .env file.
+
+    Returns:
+        str: The API key.
+
+    Raises:
+        Exception: If OPENWEATHER_API_KEY is not set.
+    """
+    from dotenv import load_dotenv
+
+    # Load environment variables from .env file
+    load_dotenv()
+
+    # Fetch the API key from the environment
+    api_key = os.getenv("OPENWEATHER_API_KEY")
+
+    # Check if the API key was loaded
+    if not api_key:
+        raise Exception("API key not found. Please ensure OPENWEATHER_API_KEY is set in the .env file.")
+    return api_key
+
+def get_weather_service():
+    """
+    Returns the weather service used by the interactive menu, creating it on first use.
 
-# Initialize services
-weather_service = OpenWeatherMapService(api_key)
-db_service = DatabaseService()
+    Returns:
+        CachedWeatherService: The cached OpenWeatherMap client.
+    """
+    global _weather_service
+    if _weather_service is None:
+        from services.api_service import OpenWeatherMapService
+        from services.cache_service import CachedWeatherService
+        _weather_service = CachedWeatherService(OpenWeatherMapService(load_api_key()))
+    return _weather_service
+
+def get_db_service():
+    """
+    Returns the database service used by the interactive menu, creating it on first use.
+
+    Returns:
+        DatabaseService: The database service.
+    """
+    global _db_service
+    if _db_service is None:
+        from services.database_service import DatabaseService
+        # Archived months are searched too when WEATHER_ARCHIVE_DIR is set in the environment
+        _db_service = DatabaseService(DEFAULT_DB_URL, archive_dir=os.getenv("WEATHER_ARCHIVE_DIR"))
+    return _db_service
 
 def main_menu():
     """
     Displays the main menu for the weather application and handles user input.
     """
+    # Fail early on a missing API key rather than on the first lookup
+    load_api_key()
     while True:
         print("\nWeather App - Main Menu")
         print("1. Get weather data for a city")
@@ -72,11 +118,11 @@ def get_weather_data():
 
     try:
         # Get weather data from the API
-        weather = weather_service.get_weather_by_city_and_country(city_name, country_code)
+        weather = get_weather_service().get_weather_by_city_and_country(city_name, country_code)
         print(format_weather(weather))
 
         # Store the weather data in the database
-        db_service.add_weather_record(weather)
+        get_db_service().add_weather_record(weather)
         print("Weather data successfully saved to the database.")
     except Exception as e:
         print(f"Error retrieving weather data: {e}")
@@ -96,12 +142,10 @@ def view_weather_history():
         return
 
     city = City(city_name, country_code)
-    records = db_service.get_weather_records_for_city(city)
 
-    if records:
-        print("\nWeather History:")
-        print(format_weather_history(records))
-    else:
+    # Stream the history as a table, reading only the printed columns chunk by chunk
+    print(f"\nWeather History for {city.name}, {city.country}:")
+    if not write_weather_table(get_db_service().iter_weather_history_rows(city), sys.stdout):
         print("No weather history available for this city.")
 
 def add_city():
@@ -120,10 +164,291 @@ def add_city():
 
     city = City(city_name, country_code)
     try:
-        db_service.add_city(city)
+        get_db_service().add_city(city)
         print(f"City '{city_name}, {country_code}' successfully added to the database.")
     except Exception as e:
         print(f"Error adding city: {e}")
 
+def run_ingestion(args: argparse.Namespace):
+    """
+    Runs the headless ingestion pipeline until it is interrupted or the requested cycles are done.
+
+    Args:
+        args (argparse.Namespace): The parsed 'ingest' command line options.
+    """
+    import signal
+    import threading
+    from services.api_service import OpenWeatherMapService
+    from services.database_service import ChangeThresholds, DatabaseService
+    from services.ingestion_service import IngestionPipeline
+    from services.metrics import PeriodicMetricsLogger, metrics, serve_metrics
+    from services.rate_limiter import RetryPolicy, TokenBucket
+
+    # Metrics are only recorded when they are exported somewhere
+    metrics.enabled = args.metrics_port is not None or args.metrics_interval is not None
+    metrics_server = serve_metrics(metrics, args.metrics_port) if args.metrics_port is not None else None
+    metrics_logger = None
+    if args.metrics_interval is not None:
+        metrics_logger = PeriodicMetricsLogger(metrics, args.metrics_interval).start()
+
+    # Observations that barely differ from the last stored one are only kept in --changes-only mode
+    change_thresholds = ChangeThresholds() if args.changes_only else None
+
+    weather_service = None
+    compaction = None
+    if args.processes > 1:
+        from services.sharded_ingestion import ShardedIngestion
+
+        # Every process fetches and parses its own shard; this process only writes to the database
+        pipeline = ShardedIngestion(
+            load_api_key(),
+            args.db_url,
+            cities_path=args.cities,
+            processes=args.processes,
+            interval=args.interval,
+            fetch_workers=args.workers,
+            batch_size=args.batch_size,
+            rate_limit=args.rate_limit,
+            change_thresholds=change_thresholds,
+            # Compaction runs in the writer, taking turns with the stored batches
+            retention_policy=retention_policy(args),
+            compact_interval=args.compact_interval,
+            archive_dir=args.archive_dir
+        )
+    else:
+        weather_service = OpenWeatherMapService(
+            load_api_key(),
+            max_workers=args.workers,
+            rate_limiter=TokenBucket.per_minute(args.rate_limit) if args.rate_limit else None,
+            retry_policy=RetryPolicy()
+        )
+        db_service = DatabaseService(args.db_url, change_thresholds=change_thresholds, archive_dir=args.archive_dir)
+        write_lock = threading.Lock()
+        pipeline = IngestionPipeline(
+            weather_service,
+            db_service,
+            cities_path=args.cities,
+            interval=args.interval,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            write_lock=write_lock
+        )
+        if args.compact_interval is not None:
+            from services.retention import CompactionJob
+
+            # Expired data is removed in small batches, taking turns with the writes of the pipeline
+            compaction = CompactionJob(db_service, retention_policy(args), interval=args.compact_interval,
+                                       write_lock=write_lock).start()
+
+    def handle_signal(signum, frame):
+        print("Stopping ingestion, finishing queued work...")
+        pipeline.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    source = args.cities or "the city_records table"
+    print(f"Ingesting weather data for the cities in {source} every {args.interval:g} s.")
+    try:
+        pipeline.run(cycles=1 if args.once else None)
+    finally:
+        if weather_service is not None:
+            weather_service.close()
+        if compaction is not None:
+            compaction.stop()
+        if metrics_logger is not None:
+            metrics_logger.stop()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+    print(f"Ingestion stopped: {pipeline.fetched} fetched, {pipeline.failed} failed, {pipeline.stored} stored.")
+
+def init_database(args: argparse.Namespace):
+    """
+    Creates the database schema and applies pending migrations.
+
+    Args:
+        args (argparse.Namespace): The parsed 'init-db' command line options.
+    """
+    from services.database_service import DatabaseService
+
+    DatabaseService(args.db_url).create_schema()
+    print(f"Database {args.db_url} is ready.")
+
+def retention_policy(args: argparse.Namespace):
+    """
+    Builds the retention policy from the command line options; 0 keeps the data forever.
+
+    Args:
+        args (argparse.Namespace): The parsed 'ingest' or 'compact' command line options.
+
+    Returns:
+        RetentionPolicy: The policy.
+    """
+    from services.retention import RetentionPolicy
+
+    return RetentionPolicy(
+        raw_days=args.raw_days or None,
+        hourly_days=args.hourly_days or None,
+        daily_days=args.daily_days or None,
+        archive_months=args.archive_months or None
+    )
+
+def run_compaction(args: argparse.Namespace):
+    """
+    Removes or archives the data that has expired under the retention policy, once.
+
+    Args:
+        args (argparse.Namespace): The parsed 'compact' command line options.
+    """
+    from services.database_service import DatabaseService
+    from services.retention import CompactionJob
+
+    job = CompactionJob(DatabaseService(args.db_url, archive_dir=args.archive_dir), retention_policy(args),
+                        batch_size=args.batch_size)
+    counts = job.run_once()
+    print(f"Compaction done: {counts['raw']} weather records deleted, {counts['archived']} archived, "
+          f"{counts['hour']} hourly and {counts['day']} daily rollups deleted, "
+          f"{counts['partitions']} archive files deleted.")
+
+def run_export(args: argparse.Namespace):
+    """
+    Exports the weather history to a CSV, JSON Lines or Parquet file.
+
+    Args:
+        args (argparse.Namespace): The parsed 'export' command line options.
+    """
+    from services.database_service import DatabaseService
+    from services.export_service import ExportService
+
+    exporter = ExportService(DatabaseService(args.db_url, archive_dir=args.archive_dir))
+    try:
+        count = exporter.export(
+            args.output,
+            fmt=args.format,
+            city=args.city,
+            country=args.country,
+            since=args.since,
+            until=args.until,
+            chunk_size=args.chunk_size
+        )
+    except (ImportError, ValueError) as e:
+        print(f"Error exporting weather history: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Exported {count} weather records to {args.output}.", file=sys.stderr)
+
+def show_nearby(args: argparse.Namespace):
+    """
+    Prints the latest observations of the tracked cities nearest to a point.
+
+    Args:
+        args (argparse.Namespace): The parsed 'nearby' command line options.
+    """
+    from types import SimpleNamespace
+    from services.database_service import DatabaseService
+
+    db_service = DatabaseService(args.db_url)
+    if args.radius is not None:
+        found = db_service.cities_within_radius(args.lat, args.lon, args.radius)[:args.count]
+    else:
+        found = db_service.nearest_cities(args.lat, args.lon, args.count)
+    rows = (
+        SimpleNamespace(city=weather.city.name, country=weather.city.country, distance=distance,
+                        observed_at=weather.observed_at, temperature=weather.temperature, humidity=weather.humidity,
+                        pressure=weather.pressure, condition=weather.condition, wind_speed=weather.wind_speed)
+        for weather, distance in found
+    )
+    columns = CITY_TABLE_COLUMNS + (('distance', 'km', lambda value: f"{value:.1f}"),) + WEATHER_TABLE_COLUMNS
+    if not write_weather_table(rows, sys.stdout, columns):
+        print("No tracked cities with known coordinates found.")
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    """
+    Parses the command line. Without a command the interactive menu is started.
+
+    Args:
+        argv (list[str]): The command line arguments (default is sys.argv[1:]).
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Weather app")
+    commands = parser.add_subparsers(dest="command")
+
+    # Options shared by the commands that enforce the retention policy
+    retention = argparse.ArgumentParser(add_help=False)
+    retention.add_argument("--raw-days", type=int, default=30,
+                           help="days weather records stay in the database (default 30, 0 keeps them forever)")
+    retention.add_argument("--hourly-days", type=int, default=365,
+                           help="days hourly summaries are kept (default 365, 0 keeps them forever)")
+    retention.add_argument("--daily-days", type=int, default=0,
+                           help="days daily summaries are kept (default 0, kept forever)")
+    retention.add_argument("--archive-months", type=int, default=0,
+                           help="months archive files are kept (default 0, kept forever)")
+    retention.add_argument("--archive-dir", default=os.getenv("WEATHER_ARCHIVE_DIR"),
+                           help="move expired weather records to monthly files in this directory instead of "
+                                "deleting them (default is $WEATHER_ARCHIVE_DIR)")
+
+    ingest = commands.add_parser("ingest", parents=[retention],
+                                 help="poll the weather of many cities continuously, without the menu")
+    ingest.add_argument("--cities", help="CSV file with 'name,country' lines (default is the city_records table)")
+    ingest.add_argument("--interval", type=float, default=600.0, help="seconds per polling cycle (default 600)")
+    ingest.add_argument("--workers", type=int, default=4, help="concurrent API requests per process (default 4)")
+    ingest.add_argument("--processes", type=int, default=1,
+                        help="worker processes, each polling a share of the cities (default 1)")
+    ingest.add_argument("--batch-size", type=int, default=100, help="observations per database write (default 100)")
+    ingest.add_argument("--rate-limit", type=int, default=60,
+                        help="API calls allowed per minute, 0 for unlimited (default 60)")
+    ingest.add_argument("--db-url", default=DEFAULT_DB_URL, help="database URL")
+    ingest.add_argument("--once", action="store_true", help="run a single cycle and exit")
+    ingest.add_argument("--changes-only", action="store_true",
+                        help="skip observations that have not changed noticeably since the last stored one")
+    ingest.add_argument("--metrics-port", type=int, help="serve Prometheus metrics at http://localhost:PORT/metrics")
+    ingest.add_argument("--metrics-interval", type=float, help="log the metrics as a JSON line every N seconds")
+    ingest.add_argument("--compact-interval", type=float,
+                        help="enforce the retention policy every N seconds while ingesting (default is never)")
+
+    init_db = commands.add_parser("init-db", help="create the database schema and apply migrations")
+    init_db.add_argument("--db-url", default=DEFAULT_DB_URL, help="database URL")
+
+    export = commands.add_parser("export", help="write the weather history to a CSV, JSON Lines or Parquet file")
+    export.add_argument("output", help="output file, or '-' for standard output")
+    export.add_argument("--format", choices=("csv", "jsonl", "parquet"),
+                        help="file format (default is derived from the file extension, else csv)")
+    export.add_argument("--city", help="only export this city")
+    export.add_argument("--country", help="only export cities in this country")
+    export.add_argument("--since", type=datetime.fromisoformat, help="only export observations from this UTC time on")
+    export.add_argument("--until", type=datetime.fromisoformat, help="only export observations before this UTC time")
+    export.add_argument("--chunk-size", type=int, default=5000, help="rows loaded per query (default 5000)")
+    export.add_argument("--db-url", default=DEFAULT_DB_URL, help="database URL")
+    export.add_argument("--archive-dir", default=os.getenv("WEATHER_ARCHIVE_DIR"),
+                        help="also export the monthly archive files in this directory "
+                             "(default is $WEATHER_ARCHIVE_DIR)")
+
+    compact = commands.add_parser("compact", parents=[retention],
+                                  help="delete or archive expired weather records and summaries once")
+    compact.add_argument("--batch-size", type=int, default=1000, help="rows changed per transaction (default 1000)")
+    compact.add_argument("--db-url", default=DEFAULT_DB_URL, help="database URL")
+
+    nearby = commands.add_parser("nearby", help="show the latest weather of the tracked cities nearest to a point")
+    nearby.add_argument("--lat", type=float, required=True, help="latitude in degrees")
+    nearby.add_argument("--lon", type=float, required=True, help="longitude in degrees")
+    nearby.add_argument("--count", type=int, default=10, help="number of cities shown (default 10)")
+    nearby.add_argument("--radius", type=float, help="only show cities within this many km")
+    nearby.add_argument("--db-url", default=DEFAULT_DB_URL, help="database URL")
+
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    main_menu()
+    arguments = parse_args()
+    if arguments.command == "ingest":
+        run_ingestion(arguments)
+    elif arguments.command == "init-db":
+        init_database(arguments)
+    elif arguments.command == "export":
+        run_export(arguments)
+    elif arguments.command == "compact":
+        run_compaction(arguments)
+    elif arguments.command == "nearby":
+        show_nearby(arguments)
+    else:
+        main_menu()
@@ -4,7 +4,7 @@ Address: Gradišćanska 24, 10000 Zagreb, Croatia
 Web: www.algebra.hr
 VAT-ID: 10750578045
 
-Last modified: 2024-09-29
+Last modified: 2026-10-18
 
 NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
 """
@@ -16,18 +16,25 @@ class City:
     Attributes:
         name (str): The name of the city.
         country (str): The country where the city is located.
+        lat (float | None): The latitude of the city in degrees, if known.
+        lon (float | None): The longitude of the city in degrees, if known.
     """
+    __slots__ = ('name', 'country', 'lat', 'lon')
 
-    def __init__(self, name: str, country: str):
+    def __init__(self, name: str, country: str, lat: float = None, lon: float = None):
         """
         Initializes the City object with a name and country.
 
         Args:
             name (str): The name of the city.
             country (str): The country where the city is located.
+            lat (float): The latitude of the city in degrees (optional).
+            lon (float): The longitude of the city in degrees (optional).
         """
         self.name = name
         self.country = country
+        self.lat = lat
+        self.lon = lon
 
     def get_full_name(self) -> str:
         """
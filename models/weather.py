@@ -4,12 +4,15 @@ Address: Gradišćanska 24, 10000 Zagreb, Croatia
 Web: www.algebra.hr
 VAT-ID: 10750578045
 
-Last modified: 2024-09-29
+Last modified: 2026-10-18
 
 NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
 """
 
+from datetime import datetime, timezone
+
 from models.city import City
+from utils.json_decoder import loads
 
 
 class Weather:
@@ -23,9 +26,12 @@ class Weather:
         pressure (int): The current atmospheric pressure in hPa.
         condition (str): The general weather condition (e.g., 'Clear', 'Clouds').
         wind_speed (float): The wind speed in m/s.
+        observed_at (datetime | None): The time of the upstream observation as a naive UTC datetime, if known.
     """
+    __slots__ = ('city', 'temperature', 'humidity', 'pressure', 'condition', 'wind_speed', 'observed_at')
 
-    def __init__(self, city: City, temperature: float, humidity: int, pressure: int, condition: str, wind_speed: float):
+    def __init__(self, city: City, temperature: float, humidity: int, pressure: int, condition: str, wind_speed: float,
+                 observed_at: datetime = None):
         """
         Initializes the Weather object with weather data for a specific city.
 
@@ -36,6 +42,7 @@ class Weather:
             pressure (int): The current atmospheric pressure in hPa.
             condition (str): The general weather condition.
             wind_speed (float): The wind speed in m/s.
+            observed_at (datetime): The time of the upstream observation as a naive UTC datetime (optional).
         """
         self.city = city
         self.temperature = temperature
@@ -43,6 +50,7 @@ class Weather:
         self.pressure = pressure
         self.condition = condition
         self.wind_speed = wind_speed
+        self.observed_at = observed_at
 
     @classmethod
     def from_api_response(cls, response: dict):
@@ -57,15 +65,57 @@ class Weather:
         """
         city_name = response['name']
         country = response.get('sys', {}).get('country', 'Unknown')
-        city = City(city_name, country)  # Use the City model to create a City instance
+        coord = response.get('coord', {})
+        # Use the City model to create a City instance
+        city = City(city_name, country, coord.get('lat'), coord.get('lon'))
 
-        temperature = response['main']['temp']
-        humidity = response['main']['humidity']
-        pressure = response['main']['pressure']
+        # Only these fields are read; the rest of the payload is ignored
+        main = response['main']
+        temperature = main['temp']
+        humidity = main['humidity']
+        pressure = main['pressure']
         condition = response['weather'][0]['main']
         wind_speed = response['wind']['speed']
 
-        return cls(city, temperature, humidity, pressure, condition, wind_speed)
+        # 'dt' is the Unix time of the observation; naive UTC keeps it comparable with the database values
+        observed_at = None
+        if 'dt' in response:
+            observed_at = datetime.fromtimestamp(response['dt'], timezone.utc).replace(tzinfo=None)
+
+        return cls(city, temperature, humidity, pressure, condition, wind_speed, observed_at)
+
+    @classmethod
+    def from_json(cls, raw: bytes):
+        """
+        Creates a Weather object from the raw body of an OpenWeatherMap API response.
+
+        The body is decoded with the fastest available JSON decoder (see utils.json_decoder), straight
+        from the bytes.
+
+        Args:
+            raw (bytes): The response body.
+
+        Returns:
+            Weather: A Weather object populated with the data from the API response.
+        """
+        return cls.from_api_response(loads(raw))
+
+    @classmethod
+    def list_from_json(cls, raw: bytes) -> list:
+        """
+        Creates Weather objects from the raw body of a single-city or multi-city (group) API response.
+
+        Args:
+            raw (bytes): The response body; multi-city responses carry their cities in a 'list' array.
+
+        Returns:
+            list[Weather]: The observations in response order.
+        """
+        data = loads(raw)
+        from_api_response = cls.from_api_response
+        if 'list' in data:
+            return [from_api_response(item) for item in data['list']]
+        return [from_api_response(data)]
 
     def __repr__(self) -> str:
         """
@@ -0,0 +1,255 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import math
+import sys
+from array import array
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from models.city import City
+from models.weather import Weather
+from utils.json_decoder import loads
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class WeatherBatch:
+    """
+    Stores many weather observations column by column in typed arrays.
+
+    Measurements live in compact machine-typed arrays instead of one object per observation. Cities
+    and condition strings are interned: every distinct value is kept once and the columns store its
+    index. Observation times are stored as Unix seconds, with NaN for unknown times.
+
+    Attributes:
+        cities (list[City]): The distinct cities, indexed by city_index.
+        conditions (list[str]): The distinct weather conditions, indexed by condition_index.
+        city_index (array): The index into cities of every observation.
+        condition_index (array): The index into conditions of every observation.
+        temperature (array): The temperatures (float64).
+        humidity (array): The humidities in percent (int32).
+        pressure (array): The pressures in hPa (int32).
+        wind_speed (array): The wind speeds in m/s (float64).
+        observed_at (array): The observation times in Unix seconds (float64, NaN if unknown).
+    """
+    __slots__ = ('cities', 'conditions', 'city_index', 'condition_index', 'temperature', 'humidity', 'pressure',
+                 'wind_speed', 'observed_at', '_city_ids', '_condition_ids')
+
+    def __init__(self):
+        """
+        Initializes an empty WeatherBatch.
+        """
+        self.cities = []
+        self.conditions = []
+        self.city_index = array('I')
+        self.condition_index = array('I')
+        self.temperature = array('d')
+        self.humidity = array('i')
+        self.pressure = array('i')
+        self.wind_speed = array('d')
+        self.observed_at = array('d')
+        self._city_ids = {}
+        self._condition_ids = {}
+
+    def __len__(self) -> int:
+        return len(self.temperature)
+
+    def __getitem__(self, index: int) -> Weather:
+        return Weather(
+            self.cities[self.city_index[index]],
+            self.temperature[index],
+            self.humidity[index],
+            self.pressure[index],
+            self.conditions[self.condition_index[index]],
+            self.wind_speed[index],
+            _from_timestamp(self.observed_at[index])
+        )
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def __repr__(self) -> str:
+        return f"WeatherBatch(observations={len(self)}, cities={len(self.cities)})"
+
+    def _intern_city(self, name: str, country: str, lat: float = None, lon: float = None) -> int:
+        key = (name, country)
+        city_id = self._city_ids.get(key)
+        if city_id is None:
+            city_id = self._city_ids[key] = len(self.cities)
+            self.cities.append(City(sys.intern(name), sys.intern(country), lat, lon))
+        elif lat is not None and self.cities[city_id].lat is None:
+            self.cities[city_id].lat, self.cities[city_id].lon = lat, lon
+        return city_id
+
+    def _intern_condition(self, condition: str) -> int:
+        condition_id = self._condition_ids.get(condition)
+        if condition_id is None:
+            condition_id = self._condition_ids[condition] = len(self.conditions)
+            self.conditions.append(sys.intern(condition))
+        return condition_id
+
+    def append_values(self, city_name: str, country: str, temperature: float, humidity: int, pressure: int,
+                      condition: str, wind_speed: float, observed_at: datetime = None, lat: float = None,
+                      lon: float = None):
+        """
+        Appends one observation given as plain values.
+
+        Args:
+            city_name (str): The name of the city.
+            country (str): The country code of the city.
+            temperature (float): The temperature.
+            humidity (int): The humidity (percentage).
+            pressure (int): The atmospheric pressure in hPa.
+            condition (str): The general weather condition.
+            wind_speed (float): The wind speed in m/s.
+            observed_at (datetime): The observation time as a naive UTC datetime (optional).
+            lat (float): The latitude of the city in degrees (optional).
+            lon (float): The longitude of the city in degrees (optional).
+        """
+        self.city_index.append(self._intern_city(city_name, country, lat, lon))
+        self.condition_index.append(self._intern_condition(condition))
+        self.temperature.append(temperature)
+        self.humidity.append(humidity)
+        self.pressure.append(pressure)
+        self.wind_speed.append(wind_speed)
+        self.observed_at.append(_to_timestamp(observed_at))
+
+    def append(self, weather: Weather):
+        """
+        Appends one Weather object.
+
+        Args:
+            weather (Weather): The observation to append.
+        """
+        self.append_values(weather.city.name, weather.city.country, weather.temperature, weather.humidity,
+                           weather.pressure, weather.condition, weather.wind_speed, weather.observed_at,
+                           weather.city.lat, weather.city.lon)
+
+    def append_api_response(self, response: dict):
+        """
+        Appends one OpenWeatherMap API response without building an intermediate Weather object.
+
+        Args:
+            response (dict): The JSON response from the OpenWeatherMap API containing weather data.
+        """
+        main = response['main']
+        coord = response.get('coord', {})
+        self.append_values(
+            response['name'],
+            response.get('sys', {}).get('country', 'Unknown'),
+            main['temp'],
+            main['humidity'],
+            main['pressure'],
+            response['weather'][0]['main'],
+            response['wind']['speed'],
+            _EPOCH + timedelta(seconds=response['dt']) if 'dt' in response else None,
+            coord.get('lat'),
+            coord.get('lon')
+        )
+
+    @classmethod
+    def from_weathers(cls, weathers: Iterable[Weather]):
+        """
+        Creates a WeatherBatch from Weather objects.
+
+        Args:
+            weathers (Iterable[Weather]): The observations.
+
+        Returns:
+            WeatherBatch: The batch holding the observations in input order.
+        """
+        batch = cls()
+        for weather in weathers:
+            batch.append(weather)
+        return batch
+
+    @classmethod
+    def from_api_responses(cls, responses: Iterable[dict]):
+        """
+        Creates a WeatherBatch from OpenWeatherMap API responses.
+
+        Args:
+            responses (Iterable[dict]): The JSON responses from the OpenWeatherMap API.
+
+        Returns:
+            WeatherBatch: The batch holding the observations in input order.
+        """
+        batch = cls()
+        for response in responses:
+            batch.append_api_response(response)
+        return batch
+
+    @classmethod
+    def from_json(cls, raw: bytes):
+        """
+        Creates a WeatherBatch from the raw body of a single-city or multi-city (group) API response.
+
+        The body is decoded once and every city is appended straight into the columns, without
+        intermediate Weather objects.
+
+        Args:
+            raw (bytes): The response body; multi-city responses carry their cities in a 'list' array.
+
+        Returns:
+            WeatherBatch: The batch holding the observations in response order.
+        """
+        data = loads(raw)
+        return cls.from_api_responses(data['list'] if 'list' in data else (data,))
+
+    @classmethod
+    def from_records(cls, records: Iterable):
+        """
+        Creates a WeatherBatch from weather records loaded from the database.
+
+        Args:
+            records (Iterable[WeatherRecord]): The records, with their city relationship loaded.
+
+        Returns:
+            WeatherBatch: The batch holding the observations in input order.
+        """
+        batch = cls()
+        for record in records:
+            batch.append_values(record.city.name, record.city.country, record.temperature, record.humidity,
+                                record.pressure, record.condition, record.wind_speed, record.observed_at)
+        return batch
+
+    def to_weathers(self) -> list[Weather]:
+        """
+        Converts the batch to a list of Weather objects.
+
+        Returns:
+            list[Weather]: The observations in batch order.
+        """
+        return list(self)
+
+    def nbytes(self) -> int:
+        """
+        Returns the number of bytes used by the column arrays, excluding the interned cities and conditions.
+
+        Returns:
+            int: The size of the column data in bytes.
+        """
+        columns = (self.city_index, self.condition_index, self.temperature, self.humidity, self.pressure,
+                   self.wind_speed, self.observed_at)
+        return sum(column.itemsize * len(column) for column in columns)
+
+
+def _to_timestamp(observed_at: datetime) -> float:
+    if observed_at is None:
+        return math.nan
+    return (observed_at - _EPOCH).total_seconds()
+
+
+def _from_timestamp(timestamp: float) -> datetime | None:
+    if math.isnan(timestamp):
+        return None
+    return _EPOCH + timedelta(seconds=timestamp)
@@ -4,13 +4,43 @@ Address: Gradišćanska 24, 10000 Zagreb, Croatia
 Web: www.algebra.hr
 VAT-ID: 10750578045
 
-Last modified: 2024-09-29
+Last modified: 2026-10-18
 
 NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
 """
 
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from models.city import City
 from models.weather import Weather
+from services.metrics import metrics
+from services.rate_limiter import RetryPolicy, TokenBucket, parse_retry_after
+from utils.json_decoder import loads
+
+DEFAULT_BASE_URL = "http://api.openweathermap.org/data/2.5/weather"
+
+# The maximum number of city ids the group endpoint accepts per request
+GROUP_MAX_CITIES = 20
+
+
+class WeatherApiError(Exception):
+    """
+    Raised when the OpenWeatherMap API answers with an error status.
+
+    Attributes:
+        status_code (int): The HTTP status of the response.
+        retry_after (float | None): The delay in seconds requested through a Retry-After header, if any.
+    """
+
+    def __init__(self, status_code: int, text: str, retry_after: float = None):
+        super().__init__(f"Error fetching weather data: {status_code}, {text}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
 
 class OpenWeatherMapService:
     """
@@ -19,44 +49,184 @@ class OpenWeatherMapService:
     Attributes:
         api_key (str): The API key used for authentication with the OpenWeatherMap API.
         base_url (str): The base URL for OpenWeatherMap API.
+        group_url (str): The URL of the group endpoint, which returns the weather of several cities by id.
+        units (str): The units of measurement requested from the API ('metric', 'imperial' or 'standard').
+        timeout (float): The timeout in seconds applied to every API request.
+        max_workers (int): The maximum number of concurrent requests made by batch lookups.
+        session (requests.Session | None): The pooled keep-alive session, or None when session mode is disabled.
+        rate_limiter (TokenBucket | None): The rate limiter every request waits on, if any.
+        retry_policy (RetryPolicy | None): The policy for retrying throttled and failed requests, if any.
     """
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: str = DEFAULT_BASE_URL, use_session: bool = True,
+                 max_workers: int = 8, timeout: float = 10.0, units: str = "metric",
+                 rate_limiter: TokenBucket = None, retry_policy: RetryPolicy = None):
         """
         Initializes the OpenWeatherMapService with the provided API key.
 
         Args:
             api_key (str): The API key for OpenWeatherMap API.
+            base_url (str): The base URL for OpenWeatherMap API (default is the public current weather endpoint).
+            use_session (bool): Whether to reuse pooled keep-alive connections through a requests.Session.
+            max_workers (int): The maximum number of concurrent requests made by get_weather_for_cities.
+            timeout (float): The timeout in seconds applied to every API request.
+            units (str): The units of measurement requested from the API (default is 'metric', i.e. Celsius).
+            rate_limiter (TokenBucket): A rate limiter, possibly shared with other services, that paces
+                every request including retries (optional).
+            retry_policy (RetryPolicy): The policy for retrying 429, 5xx and connection errors (optional;
+                without it failures are raised immediately).
         """
         self.api_key = api_key
-        self.base_url = "http://api.openweathermap.org/data/2.5/weather"
+        self.base_url = base_url
+        self.group_url = base_url.rsplit("/", 1)[0] + "/group"
+        self.units = units
+        self.timeout = timeout
+        self.max_workers = max(1, max_workers)
+        self.session = None
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
 
-    def get_weather_by_city(self, city_name: str) -> Weather:
+        if use_session:
+            # One connection per worker thread, so a batch never waits for a free connection
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+            self.session = requests.Session()
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+
+    def close(self):
         """
-        Fetches weather data for a specific city from OpenWeatherMap and returns a Weather object.
+        Closes the pooled session and releases its connections.
+        """
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get(self, url: str, params: dict) -> requests.Response:
+        """
+        Sends a GET request to the API, pacing and retrying it as configured.
 
         Args:
-            city_name (str): The name of the city to fetch weather data for.
+            url (str): The endpoint URL.
+            params (dict): The query parameters; the API key and units are added automatically.
 
         Returns:
-            Weather: A Weather object containing the weather data for the specified city.
+            requests.Response: The successful response.
 
         Raises:
-            Exception: If the API request fails or if the city is not found.
+            WeatherApiError: If the API answers with an error status after all retries.
+            requests.RequestException: If the API cannot be reached after all retries.
         """
         params = {
-            "q": city_name,
+            **params,
             "appid": self.api_key,
-            "units": "metric"  # To get the temperature in Celsius
+            "units": self.units
         }
 
-        response = requests.get(self.base_url, params=params)
+        http = self.session if self.session is not None else requests
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            if metrics.enabled:
+                start = time.perf_counter()
+            try:
+                response = http.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if metrics.enabled:
+                    self._record_request(url, "error", start)
+                if self.retry_policy is None or not self.retry_policy.should_retry(attempt):
+                    raise
+                if metrics.enabled:
+                    metrics.inc("weather_http_retries_total", reason="connection")
+                time.sleep(self.retry_policy.delay(attempt))
+                attempt += 1
+                continue
+
+            if metrics.enabled:
+                self._record_request(url, response.status_code, start)
+            if response.status_code == 200:
+                return response
+
+            error = WeatherApiError(response.status_code, response.text,
+                                    parse_retry_after(response.headers.get("Retry-After")))
+            if (self.retry_policy is None
+                    or not self.retry_policy.should_retry(attempt, response.status_code, error.retry_after)):
+                raise error
+            if metrics.enabled:
+                metrics.inc("weather_http_retries_total", reason=response.status_code)
+            time.sleep(self.retry_policy.delay(attempt, error.retry_after))
+            attempt += 1
+
+    def _record_request(self, url: str, status, start: float):
+        """
+        Records the outcome and latency of one HTTP attempt in the metrics registry.
+
+        Args:
+            url (str): The endpoint URL.
+            status (int | str): The HTTP status, or 'error' if no response was received.
+            start (float): The perf_counter value taken before the request was sent.
+        """
+        elapsed = time.perf_counter() - start
+        endpoint = "group" if url == self.group_url else "weather"
+        metrics.inc("weather_http_requests_total", endpoint=endpoint, status=status)
+        metrics.observe("weather_http_request_seconds", elapsed, endpoint=endpoint)
+
+    def _get_json(self, url: str, params: dict) -> dict:
+        """
+        Sends a GET request to the API and returns the decoded JSON response.
+
+        Args:
+            url (str): The endpoint URL.
+            params (dict): The query parameters; the API key and units are added automatically.
+
+        Returns:
+            dict: The decoded response.
+
+        Raises:
+            WeatherApiError: If the API answers with an error status after all retries.
+            requests.RequestException: If the API cannot be reached after all retries.
+        """
+        response = self._get(url, params)
+        # Decoded from the raw bytes; response.json() would first guess the encoding and build a str
+        with metrics.timer("weather_json_parse_seconds", source="http"):
+            return loads(response.content)
+
+    def _fetch_weather(self, query: str) -> Weather:
+        """
+        Requests the current weather for a query string and parses the response.
+
+        Args:
+            query (str): The value of the 'q' parameter (e.g., 'Zagreb' or 'Zagreb,HR').
+
+        Returns:
+            Weather: A Weather object containing the weather data for the query.
+
+        Raises:
+            Exception: If the API request fails or if the city is not found.
+        """
+        return Weather.from_api_response(self._get_json(self.base_url, {"q": query}))
+
+    def get_weather_by_city(self, city_name: str) -> Weather:
+        """
+        Fetches weather data for a specific city from OpenWeatherMap and returns a Weather object.
+
+        Args:
+            city_name (str): The name of the city to fetch weather data for.
 
-        if response.status_code != 200:
-            raise Exception(f"Error fetching weather data: {response.status_code}, {response.text}")
+        Returns:
+            Weather: A Weather object containing the weather data for the specified city.
 
-        data = response.json()
-        return Weather.from_api_response(data)
+        Raises:
+            Exception: If the API request fails or if the city is not found.
+        """
+        return self._fetch_weather(city_name)
 
     def get_weather_by_city_and_country(self, city_name: str, country_code: str) -> Weather:
         """
@@ -72,16 +242,105 @@ class OpenWeatherMapService:
         Raises:
             Exception: If the API request fails or if the city is not found.
         """
-        params = {
-            "q": f"{city_name},{country_code}",
-            "appid": self.api_key,
-            "units": "metric"  # To get the temperature in Celsius
-        }
+        return self._fetch_weather(f"{city_name},{country_code}")
+
+    def get_weather_by_coordinates(self, lat: float, lon: float) -> Weather:
+        """
+        Fetches weather data for the location nearest to a point from OpenWeatherMap and returns a Weather object.
+
+        Args:
+            lat (float): The latitude in degrees.
+            lon (float): The longitude in degrees.
+
+        Returns:
+            Weather: A Weather object for the city the API associates with the point, with its coordinates.
+
+        Raises:
+            Exception: If the API request fails.
+        """
+        return Weather.from_api_response(self._get_json(self.base_url, {"lat": lat, "lon": lon}))
+
+    def get_raw_weather(self, city_name: str, country_code: str = None) -> bytes:
+        """
+        Fetches the current weather for a city and returns the undecoded response body.
+
+        Used by pipelines that parse responses in a separate stage from fetching them.
+
+        Args:
+            city_name (str): The name of the city to fetch weather data for.
+            country_code (str): The country code (ISO 3166) for the city (optional).
+
+        Returns:
+            bytes: The JSON response body.
+
+        Raises:
+            Exception: If the API request fails or if the city is not found.
+        """
+        query = f"{city_name},{country_code}" if country_code else city_name
+        return self._get(self.base_url, {"q": query}).content
 
-        response = requests.get(self.base_url, params=params)
+    def get_weather_and_city_id(self, city_name: str, country_code: str = None) -> tuple[Weather, int]:
+        """
+        Fetches weather data for a city by name and also returns the city's upstream id.
+
+        Args:
+            city_name (str): The name of the city to fetch weather data for.
+            country_code (str): The country code (ISO 3166) for the city (optional).
+
+        Returns:
+            tuple[Weather, int]: The weather data and the OpenWeatherMap id of the city.
+
+        Raises:
+            Exception: If the API request fails or if the city is not found.
+        """
+        query = f"{city_name},{country_code}" if country_code else city_name
+        data = self._get_json(self.base_url, {"q": query})
+        return Weather.from_api_response(data), data['id']
+
+    def get_weather_by_city_ids(self, city_ids: list[int]) -> dict[int, Weather]:
+        """
+        Fetches weather data for up to GROUP_MAX_CITIES cities with one request to the group endpoint.
+
+        Args:
+            city_ids (list[int]): The OpenWeatherMap ids of the cities.
+
+        Returns:
+            dict[int, Weather]: The weather data by city id. Ids unknown upstream are missing.
+
+        Raises:
+            ValueError: If more than GROUP_MAX_CITIES ids are requested.
+            Exception: If the API request fails.
+        """
+        if len(city_ids) > GROUP_MAX_CITIES:
+            raise ValueError(f"The group endpoint accepts at most {GROUP_MAX_CITIES} cities, got {len(city_ids)}")
+        if not city_ids:
+            return {}
+
+        data = self._get_json(self.group_url, {"id": ",".join(str(city_id) for city_id in city_ids)})
+        return {item['id']: Weather.from_api_response(item) for item in data['list']}
+
+    def get_weather_for_cities(self, cities: list[City], max_workers: int = None) -> list[tuple]:
+        """
+        Fetches weather data for many cities concurrently over a bounded thread pool.
+
+        A failed lookup does not abort the batch; its exception is returned in place of the result.
+
+        Args:
+            cities (list[City]): The cities to fetch weather data for.
+            max_workers (int): Overrides the service's max_workers for this batch.
+
+        Returns:
+            list[tuple[Weather | None, Exception | None]]: One (weather, error) pair per city, in input order.
+        """
+        if not cities:
+            return []
 
-        if response.status_code != 200:
-            raise Exception(f"Error fetching weather data: {response.status_code}, {response.text}")
+        def fetch(city: City) -> tuple:
+            try:
+                return self.get_weather_by_city_and_country(city.name, city.country), None
+            except Exception as e:
+                return None, e
 
-        data = response.json()
-        return Weather.from_api_response(data)
+        workers = min(max_workers or self.max_workers, len(cities))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(fetch, cities))
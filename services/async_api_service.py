@@ -0,0 +1,219 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import asyncio
+import time
+
+import aiohttp
+
+from models.city import City
+from models.weather import Weather
+from services.api_service import DEFAULT_BASE_URL, WeatherApiError
+from services.metrics import metrics
+from services.rate_limiter import RetryPolicy, TokenBucket, parse_retry_after
+
+
+class AsyncOpenWeatherMapService:
+    """
+    Asyncio counterpart of OpenWeatherMapService that keeps many lookups in flight on one event loop.
+
+    The service must be used as an async context manager (or closed with close()) so that its
+    connection pool is released.
+
+    Attributes:
+        api_key (str): The API key used for authentication with the OpenWeatherMap API.
+        base_url (str): The base URL for OpenWeatherMap API.
+        units (str): The units of measurement requested from the API ('metric', 'imperial' or 'standard').
+        max_concurrency (int): The maximum number of requests in flight at once.
+        timeout (float): The total timeout in seconds applied to every API request.
+        rate_limiter (TokenBucket | None): The rate limiter every request waits on, if any.
+        retry_policy (RetryPolicy | None): The policy for retrying throttled and failed requests, if any.
+    """
+
+    def __init__(self, api_key: str, base_url: str = DEFAULT_BASE_URL, max_concurrency: int = 100,
+                 timeout: float = 10.0, units: str = "metric", rate_limiter: TokenBucket = None,
+                 retry_policy: RetryPolicy = None):
+        """
+        Initializes the AsyncOpenWeatherMapService with the provided API key.
+
+        Args:
+            api_key (str): The API key for OpenWeatherMap API.
+            base_url (str): The base URL for OpenWeatherMap API (default is the public current weather endpoint).
+            max_concurrency (int): The maximum number of requests in flight at once.
+            timeout (float): The total timeout in seconds applied to every API request.
+            units (str): The units of measurement requested from the API (default is 'metric', i.e. Celsius).
+            rate_limiter (TokenBucket): A rate limiter, possibly shared with threads and other services, that
+                paces every request including retries (optional).
+            retry_policy (RetryPolicy): The policy for retrying 429, 5xx and connection errors (optional;
+                without it failures are raised immediately).
+        """
+        self.api_key = api_key
+        self.base_url = base_url
+        self.units = units
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # The session has to be created inside the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def close(self):
+        """
+        Closes the underlying HTTP session and its connection pool.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _fetch_weather(self, query: str) -> Weather:
+        """
+        Requests the current weather for a query string and parses the response.
+
+        Args:
+            query (str): The value of the 'q' parameter (e.g., 'Zagreb' or 'Zagreb,HR').
+
+        Returns:
+            Weather: A Weather object containing the weather data for the query.
+
+        Raises:
+            WeatherApiError: If the API answers with an error status after all retries.
+            aiohttp.ClientError, asyncio.TimeoutError: If the API cannot be reached after all retries.
+        """
+        params = {
+            "q": query,
+            "appid": self.api_key,
+            "units": self.units
+        }
+
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+
+            if metrics.enabled:
+                start = time.perf_counter()
+            try:
+                async with self._get_session().get(self.base_url, params=params) as response:
+                    if metrics.enabled:
+                        metrics.inc("weather_http_requests_total", endpoint="weather", status=response.status)
+                        metrics.observe("weather_http_request_seconds", time.perf_counter() - start,
+                                        endpoint="weather")
+                    if response.status == 200:
+                        return Weather.from_json(await response.read())
+                    error = WeatherApiError(response.status, await response.text(),
+                                            parse_retry_after(response.headers.get("Retry-After")))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if metrics.enabled:
+                    metrics.inc("weather_http_requests_total", endpoint="weather", status="error")
+                if self.retry_policy is None or not self.retry_policy.should_retry(attempt):
+                    raise
+                if metrics.enabled:
+                    metrics.inc("weather_http_retries_total", reason="connection")
+                await asyncio.sleep(self.retry_policy.delay(attempt))
+                attempt += 1
+                continue
+
+            if (self.retry_policy is None
+                    or not self.retry_policy.should_retry(attempt, error.status_code, error.retry_after)):
+                raise error
+            if metrics.enabled:
+                metrics.inc("weather_http_retries_total", reason=error.status_code)
+            await asyncio.sleep(self.retry_policy.delay(attempt, error.retry_after))
+            attempt += 1
+
+    async def get_weather_by_city(self, city_name: str) -> Weather:
+        """
+        Fetches weather data for a specific city from OpenWeatherMap and returns a Weather object.
+
+        Args:
+            city_name (str): The name of the city to fetch weather data for.
+
+        Returns:
+            Weather: A Weather object containing the weather data for the specified city.
+
+        Raises:
+            Exception: If the API request fails or if the city is not found.
+        """
+        return await self._fetch_weather(city_name)
+
+    async def get_weather_by_city_and_country(self, city_name: str, country_code: str) -> Weather:
+        """
+        Fetches weather data for a specific city and country from OpenWeatherMap and returns a Weather object.
+
+        Args:
+            city_name (str): The name of the city to fetch weather data for.
+            country_code (str): The country code (ISO 3166) for the city.
+
+        Returns:
+            Weather: A Weather object containing the weather data for the specified city and country.
+
+        Raises:
+            Exception: If the API request fails or if the city is not found.
+        """
+        return await self._fetch_weather(f"{city_name},{country_code}")
+
+    async def _fetch_bounded(self, semaphore: asyncio.Semaphore, city: City) -> tuple:
+        async with semaphore:
+            try:
+                return city, await self.get_weather_by_city_and_country(city.name, city.country), None
+            except Exception as e:
+                return city, None, e
+
+    async def gather_weather(self, cities: list[City], max_concurrency: int = None) -> list[tuple]:
+        """
+        Fetches weather data for many cities concurrently, bounded by a semaphore.
+
+        A failed lookup does not abort the batch; its exception is returned in place of the result.
+
+        Args:
+            cities (list[City]): The cities to fetch weather data for.
+            max_concurrency (int): Overrides the service's max_concurrency for this batch.
+
+        Returns:
+            list[tuple[Weather | None, Exception | None]]: One (weather, error) pair per city, in input order.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+        results = await asyncio.gather(*(self._fetch_bounded(semaphore, city) for city in cities))
+        return [(weather, error) for _, weather, error in results]
+
+    async def iter_weather(self, cities: list[City], max_concurrency: int = None):
+        """
+        Fetches weather data for many cities concurrently and yields results as they complete.
+
+        Args:
+            cities (list[City]): The cities to fetch weather data for.
+            max_concurrency (int): Overrides the service's max_concurrency for this batch.
+
+        Yields:
+            tuple[City, Weather | None, Exception | None]: The city with its weather or the error, in completion order.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+        tasks = [asyncio.create_task(self._fetch_bounded(semaphore, city)) for city in cities]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
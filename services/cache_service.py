@@ -0,0 +1,291 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from models.city import City
+from models.weather import Weather
+from services.metrics import metrics
+
+if TYPE_CHECKING:
+    # Only needed for type hints; DatabaseService uses TTLCache without the HTTP client
+    from services.api_service import OpenWeatherMapService
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    A thread-safe cache whose entries expire after a fixed time and which evicts the least recently used entry when full.
+
+    Concurrent misses for the same key share a single load: the first caller runs the loader and
+    the others wait for its result (or its exception) instead of loading the value again.
+
+    Attributes:
+        ttl (float): The number of seconds an entry stays fresh.
+        maxsize (int): The maximum number of entries kept in memory.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that had to run the loader.
+        coalesced (int): The number of misses that waited on a load already in progress.
+        evictions (int): The number of entries dropped because the cache was full.
+        expirations (int): The number of entries dropped because they were stale.
+    """
+
+    def __init__(self, ttl: float = 600.0, maxsize: int = 1024, clock=time.monotonic):
+        """
+        Initializes an empty TTLCache.
+
+        Args:
+            ttl (float): The number of seconds an entry stays fresh (default is 10 minutes).
+            maxsize (int): The maximum number of entries kept in memory.
+            clock (callable): The function returning the current time in seconds.
+        """
+        self.ttl = ttl
+        self.maxsize = max(1, maxsize)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._loading = {}  # key -> Future shared by callers waiting on the same load
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Returns the fresh value cached under a key without loading it.
+
+        Args:
+            key (Hashable): The cache key.
+            default (Any): The value returned when the key is missing or stale.
+
+        Returns:
+            Any: The cached value, or the default.
+        """
+        with self._lock:
+            value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the value cached under a key, calling the loader on a miss.
+
+        Args:
+            key (Hashable): The cache key.
+            loader (callable): A function without arguments that produces the value.
+
+        Returns:
+            Any: The cached or freshly loaded value.
+
+        Raises:
+            Exception: Whatever the loader raised. Failures are not cached.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = self._loading[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            # Waiting callers must be released even if the loading thread is interrupted
+            future.set_exception(e)
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+    def put(self, key, value):
+        """
+        Stores a value under a key, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to store.
+        """
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """
+        Removes the entry cached under a key, if any.
+
+        Args:
+            key (Hashable): The cache key.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Removes all entries. Counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The hits, misses, coalesced misses, evictions, expirations and current size of the cache.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._entries),
+            }
+
+    def _lookup(self, key):
+        # Must be called with the lock held
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+
+class CachedWeatherService:
+    """
+    Puts a TTLCache in front of an OpenWeatherMapService.
+
+    It offers the same lookup methods as OpenWeatherMapService, so it can be used in its place.
+    Entries are keyed on the normalized city name, country code and units, so 'zagreb, hr' and
+    'Zagreb, HR' share one entry.
+
+    Attributes:
+        service (OpenWeatherMapService): The service used on cache misses.
+        cache (TTLCache): The cache holding Weather objects.
+    """
+
+    def __init__(self, service: 'OpenWeatherMapService', ttl: float = 600.0, maxsize: int = 1024):
+        """
+        Initializes the CachedWeatherService.
+
+        Args:
+            service (OpenWeatherMapService): The service used on cache misses.
+            ttl (float): The number of seconds a weather lookup is reused (default is 10 minutes,
+                how often OpenWeatherMap refreshes its data).
+            maxsize (int): The maximum number of cities kept in memory.
+        """
+        self.service = service
+        self.cache = TTLCache(ttl=ttl, maxsize=maxsize)
+        metrics.register_cache("weather", self.cache)
+
+    def _cache_key(self, city_name: str, country_code: str = None) -> tuple:
+        return city_name.strip().casefold(), (country_code or "").strip().upper(), self.service.units
+
+    def get_weather_by_city(self, city_name: str) -> Weather:
+        """
+        Returns the cached weather for a city, fetching it from OpenWeatherMap on a miss.
+
+        Args:
+            city_name (str): The name of the city to fetch weather data for.
+
+        Returns:
+            Weather: A Weather object containing the weather data for the specified city.
+
+        Raises:
+            Exception: If the API request fails or if the city is not found.
+        """
+        return self.cache.get_or_load(
+            self._cache_key(city_name),
+            lambda: self.service.get_weather_by_city(city_name)
+        )
+
+    def get_weather_by_city_and_country(self, city_name: str, country_code: str) -> Weather:
+        """
+        Returns the cached weather for a city and country, fetching it from OpenWeatherMap on a miss.
+
+        Args:
+            city_name (str): The name of the city to fetch weather data for.
+            country_code (str): The country code (ISO 3166) for the city.
+
+        Returns:
+            Weather: A Weather object containing the weather data for the specified city and country.
+
+        Raises:
+            Exception: If the API request fails or if the city is not found.
+        """
+        return self.cache.get_or_load(
+            self._cache_key(city_name, country_code),
+            lambda: self.service.get_weather_by_city_and_country(city_name, country_code)
+        )
+
+    def get_weather_for_cities(self, cities: list[City], max_workers: int = None) -> list[tuple]:
+        """
+        Returns the weather for many cities, fetching the cities that are not cached concurrently.
+
+        Args:
+            cities (list[City]): The cities to fetch weather data for.
+            max_workers (int): Overrides the wrapped service's max_workers for this batch.
+
+        Returns:
+            list[tuple[Weather | None, Exception | None]]: One (weather, error) pair per city, in input order.
+        """
+        if not cities:
+            return []
+
+        def fetch(city: City) -> tuple:
+            try:
+                return self.get_weather_by_city_and_country(city.name, city.country), None
+            except Exception as e:
+                return None, e
+
+        workers = min(max_workers or self.service.max_workers, len(cities))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(fetch, cities))
+
+    def cache_stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The hits, misses, coalesced misses, evictions, expirations and current size of the cache.
+        """
+        return self.cache.stats()
@@ -0,0 +1,232 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from models.city import City
+from models.weather import Weather
+from services.api_service import GROUP_MAX_CITIES, OpenWeatherMapService
+
+
+class CoalescingWeatherService:
+    """
+    Fetches weather data through the OpenWeatherMap group endpoint, combining lookups of many cities into one request.
+
+    The first lookup of a city goes by name and remembers the city's upstream id; concurrent callers
+    of a city that is still being resolved share that name request. Later lookups by
+    concurrent callers are collected for a short window and sent as one group request of up to
+    max_group_size ids; the response is split back into one Weather object per caller.
+
+    It offers the same lookup methods as OpenWeatherMapService, so it can be used in its place.
+
+    Attributes:
+        service (OpenWeatherMapService): The service used to send requests.
+        window (float): The number of seconds lookups are collected before a group request is sent.
+        max_group_size (int): The maximum number of cities per group request.
+        city_ids (dict[tuple[str, str], int]): The upstream id of every resolved city, keyed on the
+            normalized (name, country). May be seeded from a previous run.
+    """
+
+    def __init__(self, service: OpenWeatherMapService, window: float = 0.05, max_group_size: int = GROUP_MAX_CITIES):
+        """
+        Initializes the CoalescingWeatherService.
+
+        Args:
+            service (OpenWeatherMapService): The service used to send requests.
+            window (float): The number of seconds lookups are collected before a group request is sent.
+            max_group_size (int): The maximum number of cities per group request (at most GROUP_MAX_CITIES).
+        """
+        self.service = service
+        self.window = window
+        self.max_group_size = max(1, min(max_group_size, GROUP_MAX_CITIES))
+        self.city_ids = {}
+        self._pending = {}  # upstream id -> futures of the callers waiting for it, in arrival order
+        self._resolving = {}  # city key -> future of the name request in flight for it
+        self._lock = threading.Lock()
+        self._timer = None
+
+    @staticmethod
+    def _city_key(city_name: str, country_code: str = None) -> tuple[str, str]:
+        return city_name.strip().casefold(), (country_code or "").strip().upper()
+
+    def _lookup(self, city_name: str, country_code: str = None) -> Weather:
+        key = self._city_key(city_name, country_code)
+        city_id = self.city_ids.get(key)
+        if city_id is not None:
+            return self._submit(city_id).result()
+
+        with self._lock:
+            # The id may have been resolved since the unlocked check
+            city_id = self.city_ids.get(key)
+            future = self._resolving.get(key)
+            owner = city_id is None and future is None
+            if owner:
+                future = self._resolving[key] = Future()
+        if city_id is not None:
+            return self._submit(city_id).result()
+        if not owner:
+            return future.result()
+
+        try:
+            weather, city_id = self.service.get_weather_and_city_id(city_name, country_code)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.city_ids[key] = city_id
+            future.set_result(weather)
+            return weather
+        finally:
+            with self._lock:
+                self._resolving.pop(key, None)
+
+    def get_weather_by_city(self, city_name: str) -> Weather:
+        """
+        Fetches weather data for a specific city, sharing a group request with concurrent lookups.
+
+        Args:
+            city_name (str): The name of the city to fetch weather data for.
+
+        Returns:
+            Weather: A Weather object containing the weather data for the specified city.
+
+        Raises:
+            Exception: If the API request fails or if the city is not found.
+        """
+        return self._lookup(city_name)
+
+    def get_weather_by_city_and_country(self, city_name: str, country_code: str) -> Weather:
+        """
+        Fetches weather data for a specific city and country, sharing a group request with concurrent lookups.
+
+        Args:
+            city_name (str): The name of the city to fetch weather data for.
+            country_code (str): The country code (ISO 3166) for the city.
+
+        Returns:
+            Weather: A Weather object containing the weather data for the specified city and country.
+
+        Raises:
+            Exception: If the API request fails or if the city is not found.
+        """
+        return self._lookup(city_name, country_code)
+
+    def get_weather_for_cities(self, cities: list[City], max_workers: int = None) -> list[tuple]:
+        """
+        Fetches weather data for many cities, sending cities with known ids as group requests right away.
+
+        Args:
+            cities (list[City]): The cities to fetch weather data for.
+            max_workers (int): Overrides the wrapped service's max_workers for this batch.
+
+        Returns:
+            list[tuple[Weather | None, Exception | None]]: One (weather, error) pair per city, in input order.
+        """
+        results = [None] * len(cities)
+        known = {}  # upstream id -> indices of the cities with that id
+        unknown = []
+        for index, city in enumerate(cities):
+            city_id = self.city_ids.get(self._city_key(city.name, city.country))
+            if city_id is None:
+                unknown.append(index)
+            else:
+                known.setdefault(city_id, []).append(index)
+
+        ids = list(known)
+        groups = [ids[start:start + self.max_group_size] for start in range(0, len(ids), self.max_group_size)]
+
+        def fetch_group(group: list[int]) -> tuple:
+            try:
+                return self.service.get_weather_by_city_ids(group), None
+            except Exception as e:
+                return {}, e
+
+        def resolve(city: City) -> tuple:
+            try:
+                return self._lookup(city.name, city.country), None
+            except Exception as e:
+                return None, e
+
+        workers = max(1, min(max_workers or self.service.max_workers, len(groups) + len(unknown)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            group_results = executor.map(fetch_group, groups)
+            unknown_results = executor.map(resolve, [cities[index] for index in unknown])
+
+            for group, (weathers, error) in zip(groups, group_results):
+                for city_id in group:
+                    result = (weathers[city_id], None) if city_id in weathers else (None, error or _missing(city_id))
+                    for index in known[city_id]:
+                        results[index] = result
+            for index, result in zip(unknown, unknown_results):
+                results[index] = result
+
+        return results
+
+    def _submit(self, city_id: int) -> Future:
+        """
+        Queues a lookup by upstream id and returns the future that receives its Weather object.
+        """
+        future = Future()
+        group = None
+        with self._lock:
+            self._pending.setdefault(city_id, []).append(future)
+            if len(self._pending) >= self.max_group_size:
+                group = self._take_group()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        # A full group is sent right away by the caller that filled it
+        if group:
+            self._send_group(group)
+        return future
+
+    def _take_group(self) -> dict[int, list[Future]]:
+        # Must be called with the lock held
+        ids = list(self._pending)[:self.max_group_size]
+        return {city_id: self._pending.pop(city_id) for city_id in ids}
+
+    def _send_group(self, group: dict[int, list[Future]]):
+        try:
+            weathers = self.service.get_weather_by_city_ids(list(group))
+        except Exception as e:
+            weathers = {}
+            error = e
+        else:
+            error = None
+
+        for city_id, futures in group.items():
+            for future in futures:
+                if city_id in weathers:
+                    future.set_result(weathers[city_id])
+                else:
+                    future.set_exception(error or _missing(city_id))
+
+    def flush(self):
+        """
+        Sends all queued lookups immediately instead of waiting for the window to end.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            groups = []
+            while self._pending:
+                groups.append(self._take_group())
+
+        for group in groups:
+            self._send_group(group)
+
+
+def _missing(city_id: int) -> Exception:
+    return Exception(f"Error fetching weather data: city id {city_id} missing from the group response")
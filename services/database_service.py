@@ -4,19 +4,71 @@ Address: Gradišćanska 24, 10000 Zagreb, Croatia
 Web: www.algebra.hr
 VAT-ID: 10750578045
 
-Last modified: 2024-09-29
+Last modified: 2026-10-18
 
 NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey
-from sqlalchemy.orm import declarative_base, sessionmaker, relationship, joinedload
+import threading
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Iterable
+
+from sqlalchemy import (
+    create_engine, event, make_url, Column, Integer, String, Float, DateTime, ForeignKey, Index, and_, func, or_,
+    select, update
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import aliased, column_property, declarative_base, sessionmaker, relationship, joinedload
 from models.city import City
 from models.weather import Weather
+from services.cache_service import TTLCache
+from services.metrics import metrics
+from services.partitions import MonthlyPartitions
+from services.spatial_index import SpatialIndex
+from services.migrations import SCHEMA_VERSION, get_schema_version, rebuild_weather_rollups, run_migrations
 
 Base = declarative_base()
 
 
+_EPOCH = datetime(1970, 1, 1)
+
+
+def utc_now() -> datetime:
+    """
+    Returns the current time as a naive UTC datetime, the form in which times are stored in the database.
+
+    Returns:
+        datetime: The current UTC time without tzinfo, in whole seconds like the stored observation times.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+class UnixTime(TypeDecorator):
+    """
+    Stores a naive UTC datetime as whole Unix seconds in an INTEGER column.
+
+    SQLAlchemy's DateTime is stored by SQLite as a 26-character string; an integer takes at most
+    8 bytes (4 until 2038) in the row and in every index containing the column, and compares faster.
+    Fractions of a second are dropped, which the upstream observation times never have.
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value: datetime, dialect) -> int | None:
+        if value is None:
+            return None
+        return (value - _EPOCH) // timedelta(seconds=1)
+
+    def process_result_value(self, value: int, dialect) -> datetime | None:
+        if value is None:
+            return None
+        return _EPOCH + timedelta(seconds=value)
+
+
 class CityRecord(Base):
     """
     Represents a city in the database.
@@ -25,14 +77,21 @@ class CityRecord(Base):
         id (int): The unique identifier of the city.
         name (str): The name of the city.
         country (str): The country where the city is located.
+        lat (float | None): The latitude of the city in degrees, once an observation has reported it.
+        lon (float | None): The longitude of the city in degrees, once an observation has reported it.
     """
     __tablename__ = 'city_records'
+    __table_args__ = (
+        Index('ix_city_records_name_country', 'name', 'country', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     country = Column(String, nullable=False)
+    lat = Column(Float)
+    lon = Column(Float)
 
-    weather_records = relationship("WeatherRecord", back_populates="city")
+    weather_records = relationship("WeatherRecord", back_populates="city", foreign_keys="WeatherRecord.city_id")
 
     def __init__(self, city: City):
         """
@@ -43,6 +102,27 @@ class CityRecord(Base):
         """
         self.name = city.name
         self.country = city.country
+        self.lat = city.lat
+        self.lon = city.lon
+
+
+class WeatherCondition(Base):
+    """
+    Represents a distinct weather condition, referenced by id from the weather records.
+
+    The API reports a handful of conditions, so storing each name once keeps the weather records narrow.
+
+    Attributes:
+        id (int): The unique identifier of the condition.
+        name (str): The condition name (e.g., 'Clear', 'Clouds').
+    """
+    __tablename__ = 'weather_conditions'
+    __table_args__ = (
+        Index('ix_weather_conditions_name', 'name', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
 
 
 class WeatherRecord(Base):
@@ -54,40 +134,300 @@ class WeatherRecord(Base):
         temperature (float): The recorded temperature.
         humidity (int): The recorded humidity (percentage).
         pressure (int): The recorded atmospheric pressure (hPa).
-        condition (str): The weather condition (e.g., 'Clear', 'Clouds').
+        condition_id (int): Foreign key that links the weather record to its weather condition.
+        condition (str): The weather condition (e.g., 'Clear', 'Clouds'), loaded from weather_conditions.
         wind_speed (float): The recorded wind speed (m/s).
+        observed_at (datetime): The time of the upstream observation (naive UTC, stored as Unix seconds).
+            Rows stored before this column existed have no value.
         city_id (int): Foreign key that links the weather record to a city.
+
+    A city has at most one record per observation time; storing the same upstream observation again is
+    ignored (see DatabaseService.add_weather_records).
     """
     __tablename__ = 'weather_records'
+    __table_args__ = (
+        Index('ix_weather_records_city_id_observed_at', 'city_id', 'observed_at', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     temperature = Column(Float, nullable=False)
     humidity = Column(Integer, nullable=False)
     pressure = Column(Integer, nullable=False)
-    condition = Column(String, nullable=False)
+    condition_id = Column(Integer, ForeignKey('weather_conditions.id'), nullable=False)
     wind_speed = Column(Float, nullable=False)
+    observed_at = Column(UnixTime)
     city_id = Column(Integer, ForeignKey('city_records.id'), nullable=False)
-    city_name = Column(String, ForeignKey('city_records.name'))
-    city_country = Column(String, ForeignKey('city_records.country'))
 
-    city = relationship("CityRecord", back_populates="weather_records")
+    city = relationship("CityRecord", back_populates="weather_records", foreign_keys=[city_id])
+    # A primary key lookup in a table of a few rows, evaluated by SQLite while it reads the records
+    condition = column_property(
+        select(WeatherCondition.name).where(WeatherCondition.id == condition_id).scalar_subquery().label("condition")
+    )
 
-    def __init__(self, weather: Weather, city_record: CityRecord):
+    def __init__(self, weather: Weather, city_record: CityRecord, condition_id: int):
         """
         Initializes the WeatherRecord object with data from a Weather instance and its associated CityRecord.
 
         Args:
             weather (Weather): The Weather object containing weather data.
             city_record (CityRecord): The CityRecord object representing the city associated with the weather data.
+            condition_id (int): The id of the weather condition of the observation.
         """
         self.temperature = weather.temperature
         self.humidity = weather.humidity
         self.pressure = weather.pressure
-        self.condition = weather.condition
+        self.condition_id = condition_id
         self.wind_speed = weather.wind_speed
+        self.observed_at = weather.observed_at or utc_now()
         self.city = city_record
 
 
+# Rollup granularities and how an observation time is truncated to the start of its bucket
+ROLLUP_GRANULARITIES = {
+    'hour': lambda observed_at: observed_at.replace(minute=0, second=0, microsecond=0),
+    'day': lambda observed_at: observed_at.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+
+# The measurements aggregated by the rollup tables
+ROLLUP_MEASURES = ('temperature', 'humidity', 'pressure', 'wind_speed')
+
+
+class WeatherRollup(Base):
+    """
+    Represents aggregated weather data of a city over one hour or one day.
+
+    Rows are maintained incrementally whenever weather records are added, so summaries never have
+    to scan the weather records themselves. Means are derived from the stored sums.
+
+    Attributes:
+        city_id (int): Foreign key that links the rollup to a city.
+        granularity (str): The bucket size, 'hour' or 'day'.
+        bucket_start (datetime): The start of the bucket (naive UTC).
+        count (int): The number of weather records in the bucket.
+        temperature_min, temperature_max, temperature_sum (float): Temperature aggregates.
+        humidity_min, humidity_max, humidity_sum (float): Humidity aggregates.
+        pressure_min, pressure_max, pressure_sum (float): Pressure aggregates.
+        wind_speed_min, wind_speed_max, wind_speed_sum (float): Wind speed aggregates.
+    """
+    __tablename__ = 'weather_rollups'
+
+    city_id = Column(Integer, ForeignKey('city_records.id'), primary_key=True)
+    granularity = Column(String, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False)
+    temperature_min = Column(Float, nullable=False)
+    temperature_max = Column(Float, nullable=False)
+    temperature_sum = Column(Float, nullable=False)
+    humidity_min = Column(Float, nullable=False)
+    humidity_max = Column(Float, nullable=False)
+    humidity_sum = Column(Float, nullable=False)
+    pressure_min = Column(Float, nullable=False)
+    pressure_max = Column(Float, nullable=False)
+    pressure_sum = Column(Float, nullable=False)
+    wind_speed_min = Column(Float, nullable=False)
+    wind_speed_max = Column(Float, nullable=False)
+    wind_speed_sum = Column(Float, nullable=False)
+
+    @property
+    def temperature_mean(self) -> float:
+        return self.temperature_sum / self.count
+
+    @property
+    def humidity_mean(self) -> float:
+        return self.humidity_sum / self.count
+
+    @property
+    def pressure_mean(self) -> float:
+        return self.pressure_sum / self.count
+
+    @property
+    def wind_speed_mean(self) -> float:
+        return self.wind_speed_sum / self.count
+
+
+def aggregate_rollups(rows: Iterable[dict]) -> list[dict]:
+    """
+    Aggregates weather record rows into rollup rows for every granularity.
+
+    Args:
+        rows (Iterable[dict]): Weather record values with at least city_id, observed_at and the rollup measures.
+
+    Returns:
+        list[dict]: One rollup row per (city_id, granularity, bucket_start), ready to be merged into weather_rollups.
+    """
+    rollups = {}
+    for row in rows:
+        observed_at = row['observed_at']
+        if observed_at is None:
+            continue
+        for granularity, truncate in ROLLUP_GRANULARITIES.items():
+            key = (row['city_id'], granularity, truncate(observed_at))
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollup = rollups[key] = {'city_id': key[0], 'granularity': granularity, 'bucket_start': key[2],
+                                         'count': 0}
+                for measure in ROLLUP_MEASURES:
+                    rollup[f'{measure}_min'] = rollup[f'{measure}_max'] = row[measure]
+                    rollup[f'{measure}_sum'] = 0
+            rollup['count'] += 1
+            for measure in ROLLUP_MEASURES:
+                value = row[measure]
+                rollup[f'{measure}_sum'] += value
+                if value < rollup[f'{measure}_min']:
+                    rollup[f'{measure}_min'] = value
+                if value > rollup[f'{measure}_max']:
+                    rollup[f'{measure}_max'] = value
+    return list(rollups.values())
+
+
+def merge_rollups(session, rollups: list[dict]):
+    """
+    Merges rollup rows into weather_rollups, combining them with the rows already stored for the same bucket.
+
+    Args:
+        session (Session): The session of the current transaction.
+        rollups (list[dict]): Rollup rows as produced by aggregate_rollups.
+    """
+    if not rollups:
+        return
+    statement = sqlite_insert(WeatherRollup)
+    excluded = statement.excluded
+    update = {'count': WeatherRollup.count + excluded.count}
+    for measure in ROLLUP_MEASURES:
+        # Two-argument min()/max() are SQLite's scalar functions
+        update[f'{measure}_min'] = func.min(getattr(WeatherRollup, f'{measure}_min'), excluded[f'{measure}_min'])
+        update[f'{measure}_max'] = func.max(getattr(WeatherRollup, f'{measure}_max'), excluded[f'{measure}_max'])
+        update[f'{measure}_sum'] = getattr(WeatherRollup, f'{measure}_sum') + excluded[f'{measure}_sum']
+    session.execute(
+        statement.on_conflict_do_update(index_elements=['city_id', 'granularity', 'bucket_start'], set_=update),
+        rollups
+    )
+
+
+class SQLiteProfile:
+    """
+    Connection settings applied to every SQLite connection of a DatabaseService.
+
+    The defaults let history readers run alongside a writer: in WAL mode readers never block the
+    writer or each other, synchronous=NORMAL only syncs at checkpoints (still safe against
+    corruption, though the last transactions can be lost on power failure), and busy_timeout makes
+    a connection wait for a lock instead of failing with 'database is locked'. Incremental
+    auto-vacuum lets the retention job hand the pages of deleted rows back to the file system a few at
+    a time (it only takes effect on databases created with it, or after a VACUUM).
+
+    Attributes:
+        auto_vacuum (str | None): The auto-vacuum mode, e.g. 'INCREMENTAL' or 'NONE'.
+        journal_mode (str | None): The journal mode, e.g. 'WAL' or 'DELETE' (None keeps the database's mode).
+        synchronous (str | None): The synchronous setting, e.g. 'NORMAL' or 'FULL'.
+        mmap_size (int | None): The number of bytes of the database file read through memory mapping.
+        cache_size (int | None): The page cache size; negative values are in KiB, positive values in pages.
+        busy_timeout (int | None): The number of milliseconds to wait for a lock.
+        temp_store (str | None): Where temporary tables and indexes are kept, e.g. 'MEMORY'.
+        pool_size (int): The number of connections kept open for concurrent readers.
+        max_overflow (int): The number of extra connections opened under load.
+    """
+
+    def __init__(self, journal_mode: str = 'WAL', synchronous: str = 'NORMAL', mmap_size: int = 256 * 1024 * 1024,
+                 cache_size: int = -64 * 1024, busy_timeout: int = 5000, temp_store: str = 'MEMORY',
+                 pool_size: int = 8, max_overflow: int = 8, auto_vacuum: str = 'INCREMENTAL'):
+        """
+        Initializes the SQLiteProfile. Settings given as None are left at SQLite's defaults.
+        """
+        self.auto_vacuum = auto_vacuum
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.busy_timeout = busy_timeout
+        self.temp_store = temp_store
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+
+    def pragmas(self) -> list[str]:
+        """
+        Returns the PRAGMA statements that apply the profile to a connection.
+
+        Returns:
+            list[str]: The statements, in the order they are executed.
+        """
+        settings = [
+            ('busy_timeout', self.busy_timeout),
+            # Must precede the creation of the first table to have an effect
+            ('auto_vacuum', self.auto_vacuum),
+            ('journal_mode', self.journal_mode),
+            ('synchronous', self.synchronous),
+            ('mmap_size', self.mmap_size),
+            ('cache_size', self.cache_size),
+            ('temp_store', self.temp_store),
+        ]
+        return [f"PRAGMA {name} = {value}" for name, value in settings if value is not None]
+
+    def apply(self, engine: Engine):
+        """
+        Applies the profile to every connection the engine opens.
+
+        Args:
+            engine (Engine): The engine of an SQLite database.
+        """
+        statements = self.pragmas()
+
+        @event.listens_for(engine, "connect")
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for statement in statements:
+                    cursor.execute(statement)
+            finally:
+                cursor.close()
+
+
+# The profile used unless another one is passed to DatabaseService
+PERFORMANCE_PROFILE = SQLiteProfile()
+
+
+class ChangeThresholds:
+    """
+    The deltas within which a new observation counts as unchanged from the last stored one.
+
+    Used by DatabaseService in 'store only on change' mode: an observation is skipped when its
+    condition is the same as before and every measurement differs by no more than its delta.
+
+    Attributes:
+        temperature (float): The temperature delta in °C.
+        humidity (int): The humidity delta in percentage points.
+        pressure (int): The pressure delta in hPa.
+        wind_speed (float): The wind speed delta in m/s.
+    """
+
+    def __init__(self, temperature: float = 0.5, humidity: int = 2, pressure: int = 1, wind_speed: float = 0.5):
+        """
+        Initializes the ChangeThresholds. Zero deltas skip only exact repeats.
+        """
+        self.temperature = temperature
+        self.humidity = humidity
+        self.pressure = pressure
+        self.wind_speed = wind_speed
+
+    def changed(self, previous: Weather, current: Weather) -> bool:
+        """
+        Compares an observation with the last stored observation of the same city.
+
+        Args:
+            previous (Weather): The last stored observation.
+            current (Weather): The new observation.
+
+        Returns:
+            bool: True if the new observation differs by more than the deltas and should be stored.
+        """
+        return (
+            current.condition != previous.condition
+            or abs(current.temperature - previous.temperature) > self.temperature
+            or abs(current.humidity - previous.humidity) > self.humidity
+            or abs(current.pressure - previous.pressure) > self.pressure
+            or abs(current.wind_speed - previous.wind_speed) > self.wind_speed
+        )
+
+
 class DatabaseService:
     """
     A service for interacting with the SQLite database using SQLAlchemy.
@@ -96,18 +436,141 @@ class DatabaseService:
         db_url (str): The URL of the SQLite database.
         engine (Engine): The SQLAlchemy engine for the database.
         Session (sessionmaker): The SQLAlchemy sessionmaker for creating sessions.
+        city_ids (TTLCache): The (name, country) -> city id cache used to skip city lookups on writes.
+        condition_ids (dict[str, int]): The condition name -> condition id cache used on writes.
+        change_thresholds (ChangeThresholds | None): Enables 'store only on change' mode when set.
+        last_values (dict[tuple[str, str], Weather]): The latest observation stored by this service for every
+            (name, country), with its observation time filled in. warm_last_values() adds the latest stored ones.
+        city_coordinates (dict[tuple[str, str], tuple[float, float]]): The known (lat, lon) of every
+            (name, country), used to store coordinates only when they are new.
+        skipped_duplicates (int): The observations not stored because they were already in the database.
+        skipped_unchanged (int): The observations not stored because they had not changed enough.
+        partitions (MonthlyPartitions | None): The archive of old weather records, if one is configured.
     """
 
-    def __init__(self, db_url="sqlite:///data/weather.db"):
+    def __init__(self, db_url="sqlite:///data/weather.db", city_cache_size: int = 10000,
+                 profile: SQLiteProfile = PERFORMANCE_PROFILE, change_thresholds: ChangeThresholds = None,
+                 archive_dir: str = None):
         """
         Initializes the DatabaseService with a connection to the SQLite database.
 
         Args:
             db_url (str): The URL for connecting to the SQLite database (default is 'sqlite:///data/weather.db').
+            city_cache_size (int): The maximum number of city ids kept in memory.
+            profile (SQLiteProfile): The connection settings (default is PERFORMANCE_PROFILE, WAL mode with a
+                connection pool for concurrent readers). None keeps SQLite's and SQLAlchemy's defaults.
+            change_thresholds (ChangeThresholds): Store an observation only if it differs from the last one
+                stored for its city by more than these deltas (default is to store every new observation).
+            archive_dir (str): The directory of the monthly partition files that the retention job moves old
+                weather records to; history queries read them as well (default is no archive).
         """
-        self.engine = create_engine(db_url)
+        # No connection is opened here; the schema is checked on first use
+        url = make_url(db_url)
+        if profile is not None and url.database not in (None, '', ':memory:'):
+            # A pool of connections lets readers work in parallel; SQLite itself serializes the writers
+            self.engine = create_engine(url, poolclass=QueuePool, pool_size=profile.pool_size,
+                                        max_overflow=profile.max_overflow)
+        else:
+            # In-memory databases live in a single connection and keep SQLAlchemy's default pool
+            self.engine = create_engine(url)
+        if profile is not None:
+            profile.apply(self.engine)
         self.Session = sessionmaker(bind=self.engine)
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+        # Cities are never renamed or deleted, so cached ids only need to expire to make room
+        self.city_ids = TTLCache(ttl=float("inf"), maxsize=city_cache_size)
+        metrics.register_cache("city_ids", self.city_ids)
+        self._city_ids_warm = False
+        # The API reports a handful of conditions, so all of them stay cached
+        self.condition_ids = {}
+
+        self.change_thresholds = change_thresholds
+        self.last_values = {}
+        self._last_values_lock = threading.Lock()
+        self._last_values_warm = False
+        self.city_coordinates = {}
+        # Built on the first nearest-city query and dropped whenever a city gets new coordinates
+        self._spatial_index = None
+        self._spatial_lock = threading.Lock()
+        self.skipped_duplicates = 0
+        self.skipped_unchanged = 0
+
+        self.partitions = None
+        if archive_dir is not None:
+            self.partitions = MonthlyPartitions(
+                archive_dir, [CityRecord.__table__, WeatherCondition.__table__, WeatherRecord.__table__]
+            )
+
+    def create_schema(self):
+        """
+        Creates missing tables and applies pending migrations.
+
+        Run once per database, e.g. with 'python main.py init-db'. Services that find an outdated
+        schema on first use run it themselves.
+        """
         Base.metadata.create_all(self.engine)
+        run_migrations(self.engine)
+        self._schema_ready = True
+
+    def ensure_schema(self):
+        """
+        Makes sure the schema is current, at the cost of one PRAGMA query on the first call.
+        """
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            with self.engine.connect() as connection:
+                current = get_schema_version(connection) >= SCHEMA_VERSION
+            if not current:
+                self.create_schema()
+            self._schema_ready = True
+
+    def warm_city_cache(self):
+        """
+        Loads the ids of the stored cities into the city id cache, up to its maximum size.
+        """
+        self.ensure_schema()
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(CityRecord.id, CityRecord.name, CityRecord.country, CityRecord.lat, CityRecord.lon)
+                .limit(self.city_ids.maxsize)
+            )
+            for city_id, name, country, lat, lon in rows:
+                self.city_ids.put((name, country), city_id)
+                if lat is not None:
+                    self.city_coordinates[(name, country)] = (lat, lon)
+        self._city_ids_warm = True
+
+    def invalidate_city_cache(self):
+        """
+        Empties the city id cache and the spatial index. Needed only when cities are changed outside of
+        this service.
+        """
+        self.city_ids.clear()
+        self._city_ids_warm = False
+        self.city_coordinates.clear()
+        self._spatial_index = None
+
+    def get_city_id(self, city: City) -> int | None:
+        """
+        Returns the id of a stored city, consulting the city id cache first.
+
+        Args:
+            city (City): The City object to look up.
+
+        Returns:
+            int | None: The id of the city, or None if the city is not in the database.
+        """
+        key = (city.name, city.country)
+        with self.Session() as session:
+            city_id = self._resolve_city_ids(session, {key}, insert_missing=False).get(key)
+        if city_id is not None:
+            self.city_ids.put(key, city_id)
+        return city_id
 
     def add_city(self, city: City) -> CityRecord:
         """
@@ -119,6 +582,7 @@ class DatabaseService:
         Returns:
             CityRecord: The CityRecord object representing the city.
         """
+        self.ensure_schema()
         session = self.Session()
         try:
             # Check if city already exists
@@ -127,6 +591,9 @@ class DatabaseService:
                 city_record = CityRecord(city)
                 session.add(city_record)
                 session.commit()
+                if city.lat is not None:
+                    self._spatial_index = None
+            self.city_ids.put((city.name, city.country), city_record.id)
             return city_record
         except Exception as e:
             session.rollback()
@@ -134,6 +601,25 @@ class DatabaseService:
         finally:
             session.close()
 
+    def get_cities(self) -> list[City]:
+        """
+        Retrieves all cities stored in the database.
+
+        Returns:
+            list[City]: The stored cities, ordered by name and country, with their coordinates if known.
+        """
+        self.ensure_schema()
+        try:
+            with self.engine.connect() as connection:
+                rows = connection.execute(
+                    select(CityRecord.name, CityRecord.country, CityRecord.lat, CityRecord.lon)
+                    .order_by(CityRecord.name, CityRecord.country)
+                )
+                return [City(name, country, lat, lon) for name, country, lat, lon in rows]
+        except Exception as e:
+            print(f"Error retrieving cities: {e}")
+            return []
+
     def add_weather_record(self, weather: Weather):
         """
         Adds a weather record to the database, linked to the corresponding city.
@@ -141,24 +627,284 @@ class DatabaseService:
         Args:
             weather (Weather): The Weather object containing the weather data to store.
         """
-        session = self.Session()
-        try:
-            # Add or get the city record
-            city_record = self.add_city(weather.city)
+        # The bulk path resolves the city through the city id cache, so a cached city costs no SELECT
+        self.add_weather_records([weather])
 
-            # Create and add the weather record linked to the city
-            weather_record = WeatherRecord(weather, city_record)
-            session.add(weather_record)
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            print(f"Error adding weather record: {e}")
-        finally:
-            session.close()
+    def add_weather_records(self, weathers: Iterable[Weather], chunk_size: int = 500) -> int:
+        """
+        Adds many weather records to the database using bulk inserts, one transaction per chunk.
+
+        The cities of a chunk are resolved with a single query, missing cities are inserted together,
+        and the weather records are written with one executemany-style INSERT. The hourly and daily
+        rollups are updated in the same transaction. A chunk that fails is rolled back and reported
+        without affecting the other chunks.
+
+        Observations already stored for the same city and observation time are skipped (the unique
+        (city_id, observed_at) index guarantees it), so polling faster than upstream refreshes stores
+        nothing twice and the rollups count every observation once. Observations without an observation
+        time are stored at the current time in whole seconds, so of several such observations of one
+        city within the same second only the first is stored; the others count as skipped duplicates.
+        With change_thresholds set, observations within the deltas of the last stored value of their
+        city are skipped before they reach the database. City coordinates reported by the observations
+        are stored on the city when they are new.
+
+        Args:
+            weathers (Iterable[Weather]): The Weather objects to store. Consumed lazily, one chunk at a time.
+            chunk_size (int): The maximum number of weather records written per transaction.
+
+        Returns:
+            int: The number of weather records stored, not counting skipped observations.
+        """
+        self.ensure_schema()
+        stored = 0
+        weathers = iter(weathers)
+        while chunk := list(islice(weathers, max(1, chunk_size))):
+            if self.change_thresholds is not None:
+                chunk = self._changed_only(chunk)
+                if not chunk:
+                    continue
+            try:
+                with metrics.timer("weather_db_session_seconds", operation="add_weather_records"), \
+                        self.Session() as session:
+                    city_ids = self._resolve_city_ids(session, {(w.city.name, w.city.country) for w in chunk})
+                    condition_ids = self._resolve_condition_ids(session, {weather.condition for weather in chunk})
+                    coordinates = self._store_coordinates(session, chunk, city_ids)
+                    rows = [
+                        {
+                            "temperature": weather.temperature,
+                            "humidity": weather.humidity,
+                            "pressure": weather.pressure,
+                            "condition_id": condition_ids[weather.condition],
+                            "wind_speed": weather.wind_speed,
+                            "observed_at": weather.observed_at or utc_now(),
+                            "city_id": city_ids[(weather.city.name, weather.city.country)],
+                        }
+                        for weather in chunk
+                    ]
+                    inserted = self._new_observations(session, rows)
+                    if inserted:
+                        # The conflict clause only matters if another writer stored the same observation meanwhile
+                        statement = sqlite_insert(WeatherRecord)
+                        session.execute(
+                            statement.on_conflict_do_nothing(index_elements=['city_id', 'observed_at']), inserted
+                        )
+                        merge_rollups(session, aggregate_rollups(inserted))
+                    # Closing the session without reaching the commit rolls the chunk back
+                    with metrics.timer("weather_db_commit_seconds", operation="add_weather_records"):
+                        session.commit()
+            except Exception as e:
+                print(f"Error adding weather records: {e}")
+                continue
+
+            # The chunk is committed; from here on only the in-memory state follows it
+            stored += len(inserted)
+            self.skipped_duplicates += len(chunk) - len(inserted)
+            if metrics.enabled:
+                metrics.inc("weather_db_rows_total", len(inserted), operation="add_weather_records")
+                metrics.inc("weather_db_skipped_rows_total", len(chunk) - len(inserted), reason="duplicate")
+            for key, city_id in city_ids.items():
+                self.city_ids.put(key, city_id)
+            self.condition_ids.update(condition_ids)
+            if coordinates:
+                self.city_coordinates.update(coordinates)
+                self._spatial_index = None
+            self._remember(chunk, rows)
+        return stored
+
+    @staticmethod
+    def _new_observations(session, rows: list[dict]) -> list[dict]:
+        """
+        Drops the rows whose city and observation time are already stored, or repeated earlier in the rows.
+
+        The stored keys are read with one range query over the unique (city_id, observed_at) index,
+        which for new observations finds nothing and costs next to nothing.
+
+        Args:
+            session (Session): The session of the chunk.
+            rows (list[dict]): The weather_records rows of the chunk.
+
+        Returns:
+            list[dict]: The rows to insert.
+        """
+        observed = [row["observed_at"] for row in rows]
+        seen = set(session.execute(
+            select(WeatherRecord.city_id, WeatherRecord.observed_at).where(
+                WeatherRecord.city_id.in_({row["city_id"] for row in rows}),
+                WeatherRecord.observed_at.between(min(observed), max(observed))
+            )
+        ).all())
+        new_rows = []
+        for row in rows:
+            key = (row["city_id"], row["observed_at"])
+            if key not in seen:
+                seen.add(key)
+                new_rows.append(row)
+        return new_rows
+
+    def _changed_only(self, chunk: list[Weather]) -> list[Weather]:
+        """
+        Drops the observations that are within change_thresholds of the last stored value of their city.
+
+        Observations of the same city within the chunk are compared with each other in order.
+
+        Args:
+            chunk (list[Weather]): The observations to filter.
+
+        Returns:
+            list[Weather]: The observations to store.
+        """
+        changed = []
+        latest = {}
+        with self._last_values_lock:
+            for weather in chunk:
+                key = (weather.city.name, weather.city.country)
+                previous = latest.get(key) or self.last_values.get(key)
+                if previous is not None and not self.change_thresholds.changed(previous, weather):
+                    continue
+                latest[key] = weather
+                changed.append(weather)
+        skipped = len(chunk) - len(changed)
+        self.skipped_unchanged += skipped
+        if metrics.enabled and skipped:
+            metrics.inc("weather_db_skipped_rows_total", skipped, reason="unchanged")
+        return changed
+
+    def _remember(self, chunk: list[Weather], rows: list[dict]):
+        """
+        Records the newest observation of every city of a committed chunk in last_values.
+
+        Args:
+            chunk (list[Weather]): The observations of the chunk.
+            rows (list[dict]): The inserted row values, in chunk order, with the observation times used.
+        """
+        with self._last_values_lock:
+            for weather, row in zip(chunk, rows):
+                key = (weather.city.name, weather.city.country)
+                if weather.observed_at is None:
+                    weather = Weather(weather.city, weather.temperature, weather.humidity, weather.pressure,
+                                      weather.condition, weather.wind_speed, row["observed_at"])
+                previous = self.last_values.get(key)
+                # Observations can arrive out of order; an older one never replaces a newer one
+                if previous is None or previous.observed_at is None or weather.observed_at >= previous.observed_at:
+                    self.last_values[key] = weather
+
+    def _resolve_city_ids(self, session, keys: set[tuple[str, str]],
+                          insert_missing: bool = True) -> dict[tuple[str, str], int]:
+        """
+        Maps (name, country) pairs to city ids, using the city id cache and querying only the pairs it misses.
+
+        Args:
+            session (Session): The session of the current transaction.
+            keys (set[tuple[str, str]]): The (name, country) pairs to resolve.
+            insert_missing (bool): Whether cities that do not exist yet are inserted.
+
+        Returns:
+            dict[tuple[str, str], int]: The city id for every resolved pair.
+        """
+        if not self._city_ids_warm:
+            self.warm_city_cache()
+
+        city_ids = {}
+        for key in keys:
+            city_id = self.city_ids.get(key)
+            if city_id is not None:
+                city_ids[key] = city_id
+        missing = keys - city_ids.keys()
+        if not missing:
+            return city_ids
+
+        def lookup() -> dict[tuple[str, str], int]:
+            rows = session.execute(
+                select(CityRecord.id, CityRecord.name, CityRecord.country)
+                .where(CityRecord.name.in_({name for name, _ in missing}))
+            )
+            return {(name, country): city_id for city_id, name, country in rows if (name, country) in missing}
+
+        found = lookup()
+        if insert_missing and len(found) < len(missing):
+            # Another writer may have added the same city in the meantime
+            session.execute(
+                sqlite_insert(CityRecord).on_conflict_do_nothing(),
+                [{"name": name, "country": country} for name, country in missing - found.keys()]
+            )
+            found = lookup()
+
+        # Newly inserted ids are cached by the caller once the transaction has committed
+        city_ids.update(found)
+        return city_ids
+
+    def _store_coordinates(self, session, chunk: list[Weather],
+                           city_ids: dict[tuple[str, str], int]) -> dict[tuple[str, str], tuple[float, float]]:
+        """
+        Updates the coordinates of the cities of a chunk whose observations report new ones.
+
+        Args:
+            session (Session): The session of the chunk.
+            chunk (list[Weather]): The observations of the chunk.
+            city_ids (dict[tuple[str, str], int]): The city id of every (name, country) of the chunk.
+
+        Returns:
+            dict[tuple[str, str], tuple[float, float]]: The updated (lat, lon) by (name, country), cached
+            by the caller once the transaction has committed.
+        """
+        updated = {}
+        for weather in chunk:
+            city = weather.city
+            key = (city.name, city.country)
+            if city.lat is not None and self.city_coordinates.get(key) != (city.lat, city.lon):
+                updated[key] = (city.lat, city.lon)
+        if updated:
+            session.execute(
+                update(CityRecord),
+                [{"id": city_ids[key], "lat": lat, "lon": lon} for key, (lat, lon) in updated.items()]
+            )
+        return updated
+
+    def _resolve_condition_ids(self, session, names: set[str]) -> dict[str, int]:
+        """
+        Maps condition names to condition ids, inserting the conditions that are not stored yet.
+
+        Args:
+            session (Session): The session of the current transaction.
+            names (set[str]): The condition names to resolve.
+
+        Returns:
+            dict[str, int]: The condition id for every name.
+        """
+        condition_ids = {name: self.condition_ids[name] for name in names if name in self.condition_ids}
+        missing = names - condition_ids.keys()
+        if missing:
+            session.execute(sqlite_insert(WeatherCondition).on_conflict_do_nothing(),
+                            [{"name": name} for name in missing])
+            rows = session.execute(
+                select(WeatherCondition.id, WeatherCondition.name).where(WeatherCondition.name.in_(missing))
+            )
+            # Newly inserted ids are cached by the caller once the transaction has committed
+            condition_ids.update((name, condition_id) for condition_id, name in rows)
+        return condition_ids
+
+    def history_engines(self, since: datetime = None, until: datetime = None) -> list[Engine]:
+        """
+        Returns the databases that can hold weather records observed in [since, until).
+
+        Args:
+            since (datetime): The start of the time range (naive UTC, default is unbounded).
+            until (datetime): The end of the time range, exclusive (naive UTC, default is unbounded).
+
+        Returns:
+            list[Engine]: The archived undated records if the range is unbounded (they sort first and
+            fail every time filter), the overlapping monthly partitions, oldest first, and the main database.
+        """
+        if self.partitions is None:
+            return [self.engine]
+        engines = [self.partitions.engine(month) for month in self.partitions.overlapping(since, until)]
+        if since is None and until is None and self.partitions.has_undated():
+            engines.insert(0, self.partitions.engine(None))
+        return engines + [self.engine]
 
     def get_weather_records_for_city(self, city: City):
         """
-        Retrieves all weather records for a specific city from the database.
+        Retrieves all weather records for a specific city from the database and its archive.
 
         Args:
             city (City): The City object representing the city to retrieve weather data for.
@@ -166,20 +912,385 @@ class DatabaseService:
         Returns:
             List[WeatherRecord]: A list of WeatherRecord objects for the specified city.
         """
+        self.ensure_schema()
         # session = self.Session()
         try:
-            with self.Session() as session:
-                return (
-                    session.query(WeatherRecord)
-                    .filter(
-                            WeatherRecord.city_name == city.name,
-                            WeatherRecord.city_country == city.country
+            # Records are linked to their city by city_id; city_name and city_country are never filled in
+            city_id = self.get_city_id(city)
+            if city_id is None:
+                return []
+
+            records = []
+            for engine in self.history_engines():
+                with metrics.timer("weather_db_session_seconds", operation="get_weather_records_for_city"), \
+                        self.Session(bind=engine) as session:
+                    records += (
+                        session.query(WeatherRecord)
+                        .filter(WeatherRecord.city_id == city_id)
+                        .options(joinedload(WeatherRecord.city))
+                        .all()
                     )
-                    .options(joinedload(WeatherRecord.city))
-                    .all()
-                )
+            if metrics.enabled:
+                metrics.inc("weather_db_rows_total", len(records), operation="get_weather_records_for_city")
+            return records
         except Exception as e:
             print(f"Error retrieving weather records: {e}")
             return []
         # finally:
         #     session.close()
+
+    def get_weather_history(self, city: City, since: datetime = None, until: datetime = None, limit: int = 100,
+                            after_cursor: tuple = None) -> tuple[list, tuple]:
+        """
+        Retrieves one page of weather records for a city, ordered by observation time.
+
+        Pages are addressed with keyset pagination on (observed_at, id), so every page is an index range
+        scan no matter how deep into the history it is. Records stored before observation times were
+        recorded have no observed_at; they sort first and are excluded by since/until filters. Archived
+        months are read before the main database, starting with the month of the cursor.
+
+        Args:
+            city (City): The City object representing the city to retrieve weather data for.
+            since (datetime): Only return records observed at or after this time (naive UTC, optional).
+            until (datetime): Only return records observed before this time (naive UTC, optional).
+            limit (int): The maximum number of records returned.
+            after_cursor (tuple): The cursor returned with the previous page, or None for the first page.
+
+        Returns:
+            tuple[list[WeatherRecord], tuple | None]: The records of the page and the cursor of the next
+            page, which is None when there are no more records.
+        """
+        try:
+            city_id = self.get_city_id(city)
+            if city_id is None:
+                return [], None
+
+            query = (
+                select(WeatherRecord)
+                .where(WeatherRecord.city_id == city_id)
+                .options(joinedload(WeatherRecord.city))
+                .order_by(WeatherRecord.observed_at, WeatherRecord.id)
+            )
+            if since is not None:
+                query = query.where(WeatherRecord.observed_at >= since)
+            if until is not None:
+                query = query.where(WeatherRecord.observed_at < until)
+            if after_cursor is not None:
+                query = query.where(_after_cursor(*after_cursor))
+
+            if after_cursor is None or after_cursor[0] is None:
+                # Record ids are kept when records are archived, so the cursor holds across the files
+                engines = self.history_engines(since, until)
+            else:
+                engines = self.history_engines(after_cursor[0], until)
+
+            records = []
+            for engine in engines:
+                with metrics.timer("weather_db_session_seconds", operation="get_weather_history"), \
+                        self.Session(bind=engine) as session:
+                    records += session.scalars(query.limit(limit - len(records))).all()
+                if len(records) == limit:
+                    break
+        except Exception as e:
+            print(f"Error retrieving weather history: {e}")
+            return [], None
+
+        if metrics.enabled:
+            metrics.inc("weather_db_rows_total", len(records), operation="get_weather_history")
+        next_cursor = None
+        if len(records) == limit:
+            next_cursor = (records[-1].observed_at, records[-1].id)
+        return records, next_cursor
+
+    def iter_weather_history(self, city: City, since: datetime = None, until: datetime = None,
+                             chunk_size: int = 500):
+        """
+        Streams the weather records of a city in observation order, loading a fixed-size chunk at a time.
+
+        Args:
+            city (City): The City object representing the city to retrieve weather data for.
+            since (datetime): Only return records observed at or after this time (naive UTC, optional).
+            until (datetime): Only return records observed before this time (naive UTC, optional).
+            chunk_size (int): The number of records loaded per query.
+
+        Yields:
+            WeatherRecord: The weather records of the city.
+        """
+        cursor = None
+        while True:
+            records, cursor = self.get_weather_history(city, since, until, chunk_size, cursor)
+            yield from records
+            if cursor is None:
+                return
+
+    def iter_weather_history_rows(self, city: City, since: datetime = None, until: datetime = None,
+                                  chunk_size: int = 500):
+        """
+        Streams the measurements of a city in observation order as plain rows instead of ORM objects.
+
+        Only the record columns are read (id, observed_at, temperature, humidity, pressure, condition and
+        wind_speed), which makes this the cheaper choice for display and export. Archived months are read
+        before the main database.
+
+        Args:
+            city (City): The City object representing the city to retrieve weather data for.
+            since (datetime): Only return records observed at or after this time (naive UTC, optional).
+            until (datetime): Only return records observed before this time (naive UTC, optional).
+            chunk_size (int): The number of rows loaded per query.
+
+        Yields:
+            Row: The measurements, with the columns accessible as attributes.
+        """
+        try:
+            self.ensure_schema()
+            city_id = self.get_city_id(city)
+        except Exception as e:
+            print(f"Error retrieving weather history: {e}")
+            return
+        if city_id is None:
+            return
+
+        query = (
+            select(
+                WeatherRecord.id,
+                WeatherRecord.observed_at,
+                WeatherRecord.temperature,
+                WeatherRecord.humidity,
+                WeatherRecord.pressure,
+                WeatherRecord.condition,
+                WeatherRecord.wind_speed,
+            )
+            .where(WeatherRecord.city_id == city_id)
+            .order_by(WeatherRecord.observed_at, WeatherRecord.id)
+            .limit(chunk_size)
+        )
+        if since is not None:
+            query = query.where(WeatherRecord.observed_at >= since)
+        if until is not None:
+            query = query.where(WeatherRecord.observed_at < until)
+
+        for engine in self.history_engines(since, until):
+            page = query
+            while True:
+                try:
+                    with metrics.timer("weather_db_session_seconds", operation="iter_weather_history_rows"), \
+                            engine.connect() as connection:
+                        rows = connection.execute(page).all()
+                except Exception as e:
+                    print(f"Error retrieving weather history: {e}")
+                    return
+                if metrics.enabled:
+                    metrics.inc("weather_db_rows_total", len(rows), operation="iter_weather_history_rows")
+                yield from rows
+                if len(rows) < chunk_size:
+                    break
+                page = query.where(_after_cursor(rows[-1].observed_at, rows[-1].id))
+
+    def get_weather_summary(self, city: City, granularity: str = 'day', since: datetime = None,
+                            until: datetime = None) -> list[WeatherRollup]:
+        """
+        Retrieves hourly or daily weather aggregates for a city from the rollup table.
+
+        Args:
+            city (City): The City object representing the city to summarize.
+            granularity (str): The bucket size, 'hour' or 'day'.
+            since (datetime): Only return buckets starting at or after this time (naive UTC, optional).
+            until (datetime): Only return buckets starting before this time (naive UTC, optional).
+
+        Returns:
+            list[WeatherRollup]: The buckets in chronological order, with min, max, mean and count of every measure.
+        """
+        if granularity not in ROLLUP_GRANULARITIES:
+            raise ValueError(f"Unknown granularity '{granularity}', expected one of {', '.join(ROLLUP_GRANULARITIES)}")
+
+        try:
+            city_id = self.get_city_id(city)
+            if city_id is None:
+                return []
+
+            with metrics.timer("weather_db_session_seconds", operation="get_weather_summary"), \
+                    self.Session() as session:
+                query = (
+                    select(WeatherRollup)
+                    .where(WeatherRollup.city_id == city_id, WeatherRollup.granularity == granularity)
+                    .order_by(WeatherRollup.bucket_start)
+                )
+                if since is not None:
+                    query = query.where(WeatherRollup.bucket_start >= since)
+                if until is not None:
+                    query = query.where(WeatherRollup.bucket_start < until)
+                rollups = session.scalars(query).all()
+            if metrics.enabled:
+                metrics.inc("weather_db_rows_total", len(rollups), operation="get_weather_summary")
+            return rollups
+        except Exception as e:
+            print(f"Error retrieving weather summary: {e}")
+            return []
+
+    def rebuild_rollups(self):
+        """
+        Recomputes the rollup table from all weather records.
+
+        Incremental maintenance keeps the rollups current, so this is only needed after weather
+        records were changed outside of this service.
+        """
+        self.ensure_schema()
+        with self.engine.begin() as connection:
+            rebuild_weather_rollups(connection)
+
+    def warm_last_values(self):
+        """
+        Loads the latest stored observation of every city into last_values.
+
+        The latest record of a city is found with one backward step of the (city_id, observed_at)
+        index, so this reads one row per city however long the history is. Records without an
+        observation time are not considered. Observations stored by this service since are newer and
+        are kept. Called on the first nearest-city query; call it again to pick up observations stored
+        by other processes.
+        """
+        self.ensure_schema()
+        latest = aliased(WeatherRecord)
+        latest_id = (
+            select(latest.id)
+            .where(latest.city_id == CityRecord.id, latest.observed_at.is_not(None))
+            .order_by(latest.observed_at.desc())
+            .limit(1)
+            .correlate(CityRecord)
+            .scalar_subquery()
+        )
+        with metrics.timer("weather_db_session_seconds", operation="warm_last_values"), \
+                self.Session() as session:
+            rows = session.execute(
+                select(CityRecord.name, CityRecord.country, CityRecord.lat, CityRecord.lon, WeatherRecord.temperature,
+                       WeatherRecord.humidity, WeatherRecord.pressure, WeatherRecord.condition,
+                       WeatherRecord.wind_speed, WeatherRecord.observed_at)
+                .join(WeatherRecord, WeatherRecord.id == latest_id)
+            ).all()
+        with self._last_values_lock:
+            for name, country, lat, lon, temperature, humidity, pressure, condition, wind_speed, observed_at in rows:
+                previous = self.last_values.get((name, country))
+                if previous is None or observed_at > previous.observed_at:
+                    self.last_values[(name, country)] = Weather(City(name, country, lat, lon), temperature, humidity,
+                                                                pressure, condition, wind_speed, observed_at)
+        self._last_values_warm = True
+        if metrics.enabled:
+            metrics.inc("weather_db_rows_total", len(rows), operation="warm_last_values")
+
+    def spatial_index(self) -> SpatialIndex:
+        """
+        Returns the spatial index of the cities with known coordinates, building it if needed.
+
+        Returns:
+            SpatialIndex: The index, keyed by (name, country).
+        """
+        index = self._spatial_index
+        if index is not None:
+            return index
+        self.ensure_schema()
+        with self._spatial_lock:
+            if self._spatial_index is None:
+                with self.engine.connect() as connection:
+                    rows = connection.execute(
+                        select(CityRecord.name, CityRecord.country, CityRecord.lat, CityRecord.lon)
+                        .where(CityRecord.lat.is_not(None), CityRecord.lon.is_not(None))
+                    ).all()
+                self.city_coordinates.update(((name, country), (lat, lon)) for name, country, lat, lon in rows)
+                self._spatial_index = SpatialIndex(((name, country), lat, lon) for name, country, lat, lon in rows)
+            if not self._last_values_warm:
+                self.warm_last_values()
+            return self._spatial_index
+
+    def nearest_cities(self, lat: float, lon: float, k: int = 10) -> list[tuple[Weather, float]]:
+        """
+        Finds the k tracked cities nearest to a location, with their latest observations.
+
+        Only cities with known coordinates and an observation in last_values are considered; no
+        weather history is read.
+
+        Args:
+            lat (float): The latitude of the location in degrees.
+            lon (float): The longitude of the location in degrees.
+            k (int): The number of cities to return.
+
+        Returns:
+            list[tuple[Weather, float]]: The latest observation of each city and its distance in km, nearest first.
+        """
+        try:
+            index = self.spatial_index()
+            last_values = self.last_values
+            return [(last_values[key], distance)
+                    for key, distance in index.nearest(lat, lon, k, accept=last_values.__contains__)]
+        except Exception as e:
+            print(f"Error finding nearest cities: {e}")
+            return []
+
+    def cities_within_radius(self, lat: float, lon: float, radius_km: float) -> list[tuple[Weather, float]]:
+        """
+        Finds the tracked cities within a distance of a location, with their latest observations.
+
+        Args:
+            lat (float): The latitude of the location in degrees.
+            lon (float): The longitude of the location in degrees.
+            radius_km (float): The maximum great-circle distance in km.
+
+        Returns:
+            list[tuple[Weather, float]]: The latest observation of each city and its distance in km, nearest first.
+        """
+        try:
+            index = self.spatial_index()
+            last_values = self.last_values
+            return [(last_values[key], distance)
+                    for key, distance in index.within_radius(lat, lon, radius_km) if key in last_values]
+        except Exception as e:
+            print(f"Error finding cities within radius: {e}")
+            return []
+
+    def cities_in_bbox(self, south: float, west: float, north: float, east: float) -> list[Weather]:
+        """
+        Finds the tracked cities inside a latitude/longitude box, such as a map tile, with their latest
+        observations.
+
+        Args:
+            south (float): The minimum latitude in degrees.
+            west (float): The western longitude in degrees.
+            north (float): The maximum latitude in degrees.
+            east (float): The eastern longitude in degrees; a box with east < west crosses the antimeridian.
+
+        Returns:
+            list[Weather]: The latest observation of each city, from south to north.
+        """
+        try:
+            index = self.spatial_index()
+            last_values = self.last_values
+            return [last_values[key] for key in index.within_bbox(south, west, north, east) if key in last_values]
+        except Exception as e:
+            print(f"Error finding cities in bounding box: {e}")
+            return []
+
+
+def _after_cursor(observed_at: datetime, record_id: int):
+    """
+    Builds the keyset condition selecting the weather records that sort after (observed_at, id).
+
+    Args:
+        observed_at (datetime | None): The observation time of the last record of the previous page.
+        record_id (int): The id of the last record of the previous page.
+
+    Returns:
+        ColumnElement: The filter condition.
+    """
+    # NULL observation times sort first in SQLite and never compare equal, so they need their own branch
+    if observed_at is None:
+        return or_(
+            and_(WeatherRecord.observed_at.is_(None), WeatherRecord.id > record_id),
+            WeatherRecord.observed_at.is_not(None)
+        )
+    # The redundant lower bound lets SQLite seek the (city_id, observed_at) index; with bound
+    # parameters it does not derive a range from the OR alone and scans the city from its start
+    return and_(
+        WeatherRecord.observed_at >= observed_at,
+        or_(
+            WeatherRecord.observed_at > observed_at,
+            and_(WeatherRecord.observed_at == observed_at, WeatherRecord.id > record_id)
+        )
+    )
@@ -0,0 +1,240 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import csv
+import json
+import sys
+from datetime import datetime
+
+from sqlalchemy import select
+
+from services.database_service import CityRecord, DatabaseService, WeatherRecord
+
+# The exported columns, in file order
+EXPORT_COLUMNS = ('id', 'city', 'country', 'observed_at', 'temperature', 'humidity', 'pressure', 'condition',
+                  'wind_speed')
+
+# The supported file formats; Parquet additionally needs pyarrow
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+
+
+class ExportService:
+    """
+    Writes the weather history to CSV, JSON Lines or Parquet files.
+
+    Rows are read with plain Core SELECTs, one chunk at a time, and written before the next chunk
+    is loaded, so memory use depends on the chunk size and not on the size of the table. Chunks are
+    addressed by record id (keyset pagination), so every query is a short primary key range scan
+    and no read transaction is held open for the whole export.
+
+    Attributes:
+        db_service (DatabaseService): The database the history is read from.
+    """
+
+    def __init__(self, db_service: DatabaseService):
+        """
+        Initializes the ExportService.
+
+        Args:
+            db_service (DatabaseService): The database the history is read from.
+        """
+        self.db_service = db_service
+
+    def iter_chunks(self, city: str = None, country: str = None, since: datetime = None, until: datetime = None,
+                    chunk_size: int = 5000):
+        """
+        Streams the weather history as lists of rows: archived months first, each database in record id order.
+
+        Args:
+            city (str): Only export records of cities with this name (optional).
+            country (str): Only export records of cities in this country (optional).
+            since (datetime): Only export records observed at or after this time (naive UTC, optional).
+            until (datetime): Only export records observed before this time (naive UTC, optional).
+            chunk_size (int): The number of rows loaded per query.
+
+        Yields:
+            list[Row]: Up to chunk_size rows with the values of EXPORT_COLUMNS.
+        """
+        self.db_service.ensure_schema()
+        query = (
+            select(
+                WeatherRecord.id,
+                CityRecord.name.label('city'),
+                CityRecord.country,
+                WeatherRecord.observed_at,
+                WeatherRecord.temperature,
+                WeatherRecord.humidity,
+                WeatherRecord.pressure,
+                WeatherRecord.condition,
+                WeatherRecord.wind_speed,
+            )
+            .join(CityRecord, CityRecord.id == WeatherRecord.city_id)
+            .order_by(WeatherRecord.id)
+            .limit(chunk_size)
+        )
+        if city is not None:
+            query = query.where(CityRecord.name == city)
+        if country is not None:
+            query = query.where(CityRecord.country == country)
+        if since is not None:
+            query = query.where(WeatherRecord.observed_at >= since)
+        if until is not None:
+            query = query.where(WeatherRecord.observed_at < until)
+
+        for engine in self.db_service.history_engines(since, until):
+            last_id = 0
+            while True:
+                with engine.connect() as connection:
+                    rows = connection.execute(query.where(WeatherRecord.id > last_id)).all()
+                if rows:
+                    yield rows
+                if len(rows) < chunk_size:
+                    break
+                last_id = rows[-1].id
+
+    def export(self, destination, fmt: str = None, city: str = None, country: str = None, since: datetime = None,
+               until: datetime = None, chunk_size: int = 5000) -> int:
+        """
+        Exports the weather history to a file.
+
+        Args:
+            destination (str | file): The path of the output file, '-' for standard output (CSV and JSON
+                Lines only), or an open file (a text file for CSV and JSON Lines, a binary file for Parquet).
+            fmt (str): 'csv', 'jsonl' or 'parquet' (default is derived from the file extension, else 'csv').
+            city (str): Only export records of cities with this name (optional).
+            country (str): Only export records of cities in this country (optional).
+            since (datetime): Only export records observed at or after this time (naive UTC, optional).
+            until (datetime): Only export records observed before this time (naive UTC, optional).
+            chunk_size (int): The number of rows loaded and written at a time.
+
+        Returns:
+            int: The number of exported rows.
+
+        Raises:
+            ValueError: If the format is not supported, or Parquet is requested for standard output.
+            ImportError: If Parquet is requested and pyarrow is not installed.
+        """
+        fmt = fmt or _format_from_path(destination)
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}', expected one of {', '.join(EXPORT_FORMATS)}")
+
+        if fmt == 'parquet' and destination == '-':
+            # Parquet writes its footer last and is read from the end, so it is not streamed
+            raise ValueError("Parquet cannot be written to standard output; give an output file")
+
+        chunks = self.iter_chunks(city, country, since, until, chunk_size)
+        if fmt == 'parquet':
+            return _write_parquet(chunks, destination)
+
+        write = _write_csv if fmt == 'csv' else _write_jsonl
+        if destination == '-':
+            return write(chunks, sys.stdout)
+        if isinstance(destination, str):
+            with open(destination, 'w', newline='', encoding='utf-8') as file:
+                return write(chunks, file)
+        return write(chunks, destination)
+
+
+def _format_from_path(destination) -> str:
+    """
+    Derives the export format from the extension of the output path.
+
+    Args:
+        destination (str | file): The output path or file.
+
+    Returns:
+        str: The format, 'csv' when the extension is not recognized.
+    """
+    if isinstance(destination, str):
+        extension = destination.rsplit('.', 1)[-1].lower()
+        if extension in ('jsonl', 'ndjson'):
+            return 'jsonl'
+        if extension == 'parquet':
+            return 'parquet'
+    return 'csv'
+
+
+def _write_csv(chunks, file) -> int:
+    """
+    Writes the chunks as CSV with a header line. Missing observation times are left empty.
+
+    Returns:
+        int: The number of written rows.
+    """
+    writer = csv.writer(file)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for rows in chunks:
+        writer.writerows(
+            (row.id, row.city, row.country, row.observed_at.isoformat() if row.observed_at else '',
+             row.temperature, row.humidity, row.pressure, row.condition, row.wind_speed)
+            for row in rows
+        )
+        count += len(rows)
+    return count
+
+
+def _write_jsonl(chunks, file) -> int:
+    """
+    Writes the chunks as JSON Lines, one object per row. Missing observation times are written as null.
+
+    Returns:
+        int: The number of written rows.
+    """
+    count = 0
+    for rows in chunks:
+        lines = []
+        for row in rows:
+            values = row._asdict()
+            if row.observed_at is not None:
+                values['observed_at'] = row.observed_at.isoformat()
+            lines.append(json.dumps(values, ensure_ascii=False))
+        lines.append('')
+        file.write('\n'.join(lines))
+        count += len(rows)
+    return count
+
+
+def _write_parquet(chunks, destination) -> int:
+    """
+    Writes the chunks to a Parquet file, one row group per chunk.
+
+    Returns:
+        int: The number of written rows.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow)") from None
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('city', pa.string()),
+        ('country', pa.string()),
+        ('observed_at', pa.timestamp('us')),
+        ('temperature', pa.float64()),
+        ('humidity', pa.int32()),
+        ('pressure', pa.int32()),
+        ('condition', pa.string()),
+        ('wind_speed', pa.float64()),
+    ])
+    count = 0
+    with pq.ParquetWriter(destination, schema) as writer:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays([pa.array(column, type=field.type)
+                                                     for column, field in zip(columns, schema)], schema=schema))
+            count += len(rows)
+    return count
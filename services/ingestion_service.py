@@ -0,0 +1,342 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import asyncio
+import csv
+import os
+import queue
+import threading
+import time
+import zlib
+from typing import TYPE_CHECKING
+
+from models.city import City
+from models.weather import Weather
+from services.api_service import OpenWeatherMapService
+from services.database_service import DatabaseService
+from services.metrics import metrics
+from services.scheduler import PollingScheduler
+from utils.helpers import validate_city_name, validate_country_code
+
+if TYPE_CHECKING:
+    # aiohttp is only needed by the async entry point, whose callers import it themselves
+    from services.async_api_service import AsyncOpenWeatherMapService
+
+# Marks the end of a stage's output in the pipeline queues
+_DONE = object()
+
+
+async def ingest_weather_async(weather_service: 'AsyncOpenWeatherMapService', db_service: DatabaseService,
+                               cities: list[City], batch_size: int = 100) -> int:
+    """
+    Fetches weather data for all cities on one event loop and stores it in the database in batches.
+
+    Parsed Weather objects are written as soon as a batch fills up, so memory stays bounded by the
+    batch size rather than the number of cities. Database writes run in a worker thread so the
+    event loop keeps fetching while a batch is being stored.
+
+    Args:
+        weather_service (AsyncOpenWeatherMapService): The async API client used for fetching.
+        db_service (DatabaseService): The database service the weather data is stored in.
+        cities (list[City]): The cities to fetch weather data for.
+        batch_size (int): The number of Weather objects written to the database at once.
+
+    Returns:
+        int: The number of weather records passed to the database.
+    """
+    batch = []
+    stored = 0
+    pending_write = None
+
+    async for city, weather, error in weather_service.iter_weather(cities):
+        if error is not None:
+            print(f"Error retrieving weather data for {city.get_full_name()}: {error}")
+            continue
+
+        batch.append(weather)
+        if len(batch) >= batch_size:
+            # Only one write in flight at a time; SQLite has a single writer anyway
+            if pending_write is not None:
+                await pending_write
+            pending_write = asyncio.create_task(asyncio.to_thread(db_service.add_weather_records, batch))
+            stored += len(batch)
+            batch = []
+
+    if pending_write is not None:
+        await pending_write
+    if batch:
+        await asyncio.to_thread(db_service.add_weather_records, batch)
+        stored += len(batch)
+
+    return stored
+
+
+def load_cities(path: str) -> list[City]:
+    """
+    Reads the cities to poll from a CSV file with one 'name,country' pair per line.
+
+    A header line and lines with an invalid city name or country code are skipped with a message.
+
+    Args:
+        path (str): The path of the CSV file.
+
+    Returns:
+        list[City]: The cities in file order.
+    """
+    cities = []
+    with open(path, newline='', encoding='utf-8') as file:
+        for line_number, row in enumerate(csv.reader(file), start=1):
+            if not row or row[0].startswith('#'):
+                continue
+            name = row[0].strip()
+            country = row[1].strip().upper() if len(row) > 1 else ''
+            if line_number == 1 and name.casefold() in ('name', 'city'):
+                continue
+            if not validate_city_name(name) or not validate_country_code(country):
+                print(f"Skipping invalid city on line {line_number} of {path}: {','.join(row)}")
+                continue
+            cities.append(City(name, country))
+    return cities
+
+
+def shard_of(city: City, shards: int) -> int:
+    """
+    Assigns a city to one of a number of shards.
+
+    The hash is stable across processes and runs (unlike hash(), which is salted per process), so
+    every worker agrees on the partitioning without coordination.
+
+    Args:
+        city (City): The city.
+        shards (int): The number of shards.
+
+    Returns:
+        int: The shard index, from 0 to shards - 1.
+    """
+    return zlib.crc32(f"{city.name.casefold()},{city.country.upper()}".encode('utf-8')) % shards
+
+
+class IngestionPipeline:
+    """
+    Continuously polls the weather of a set of cities and stores it, without user interaction.
+
+    The work is split into stages connected by bounded queues, so a slow stage holds back the
+    stages before it instead of letting memory grow:
+
+        scheduler -> cities -> fetch workers -> raw responses -> parser -> Weather objects -> writer
+
+    The scheduler spreads the cities of every cycle evenly over the interval. Fetch workers only do
+    network I/O, the parser turns response bodies into Weather objects, and a single writer stores
+    them with bulk inserts. stop() ends the current cycle early and lets every stage drain its queue,
+    so no fetched observation is lost on shutdown.
+
+    Attributes:
+        weather_service (OpenWeatherMapService): The API client used by the fetch workers.
+        db_service (DatabaseService): The database the observations are written to.
+        cities_path (str | None): The CSV file listing the cities, or None to poll the city_records table.
+        interval (float): The length of one polling cycle in seconds.
+        workers (int): The number of fetch workers.
+        batch_size (int): The maximum number of observations per database write.
+        flush_interval (float): The maximum number of seconds an observation waits for its batch to fill.
+        shard (tuple[int, int] | None): (index, count) when this pipeline polls only one shard of the cities.
+        write_lock (threading.Lock): Held by the writer while it stores a batch.
+        fetched (int): The number of responses fetched so far.
+        failed (int): The number of fetches or parses that failed so far.
+        stored (int): The number of observations stored so far.
+    """
+
+    def __init__(self, weather_service: OpenWeatherMapService, db_service: DatabaseService, cities_path: str = None,
+                 interval: float = 600.0, workers: int = 4, batch_size: int = 100, flush_interval: float = 5.0,
+                 queue_size: int = 1000, shard: tuple[int, int] = None, write_lock: threading.Lock = None):
+        """
+        Initializes the IngestionPipeline.
+
+        Args:
+            weather_service (OpenWeatherMapService): The API client used by the fetch workers.
+            db_service (DatabaseService): The database the observations are written to.
+            cities_path (str): The CSV file listing the cities (default is the city_records table).
+            interval (float): The length of one polling cycle in seconds (default is 10 minutes).
+            workers (int): The number of fetch workers.
+            batch_size (int): The maximum number of observations per database write.
+            flush_interval (float): The maximum number of seconds an observation waits for its batch to fill.
+            queue_size (int): The capacity of each queue between stages.
+            shard (tuple[int, int]): (index, count) to poll only the cities for which shard_of() returns
+                index (default is all cities).
+            write_lock (threading.Lock): A lock shared with other writers of the database, such as a
+                CompactionJob, so they take turns (default is a lock of the pipeline's own).
+        """
+        self.weather_service = weather_service
+        self.db_service = db_service
+        self.cities_path = cities_path
+        self.interval = interval
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.shard = shard
+        self.write_lock = write_lock or threading.Lock()
+        self.fetched = 0
+        self.failed = 0
+        self.stored = 0
+        self._scheduler = PollingScheduler(interval=interval)
+        self._city_queue = queue.Queue(queue_size)
+        self._raw_queue = queue.Queue(queue_size)
+        self._weather_queue = queue.Queue(queue_size)
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._cities_mtime = None
+
+    def stop(self):
+        """
+        Asks the pipeline to stop. Safe to call from signal handlers and other threads.
+        """
+        self._stop_event.set()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _refresh_cities(self):
+        """
+        Reloads the city list so cities added while the pipeline runs are polled from the next cycle on.
+
+        A cities file that cannot be read is reported and the previous list is kept; it is read again
+        on the next cycle.
+        """
+        if self.cities_path:
+            try:
+                mtime = os.stat(self.cities_path).st_mtime
+                if mtime == self._cities_mtime:
+                    return
+                cities = load_cities(self.cities_path)
+            except (OSError, ValueError) as e:
+                print(f"Error reading cities from {self.cities_path}: {e}")
+                return
+            self._cities_mtime = mtime
+        else:
+            cities = self.db_service.get_cities()
+        if self.shard is not None:
+            index, count = self.shard
+            cities = [city for city in cities if shard_of(city, count) == index]
+
+        current = {(city.name, city.country) for city in cities}
+        for city in self._scheduler.plan():
+            if (city.name, city.country) not in current:
+                self._scheduler.remove_city(city)
+        for city in cities:
+            self._scheduler.add_city(city)
+
+    def _schedule(self, cycles: int = None):
+        """
+        The first stage: queues every city once per cycle, spread over the interval.
+        """
+        cycle = 0
+        try:
+            while not self._stop_event.is_set() and (cycles is None or cycle < cycles):
+                cycle_start = time.monotonic()
+                self._refresh_cities()
+                if not len(self._scheduler):
+                    print("No cities to poll. Add cities to the database or pass a cities file.")
+                self._scheduler.run_cycle(self._city_queue.put, self._stop_event)
+                cycle += 1
+                if cycles is None or cycle < cycles:
+                    # Cycles never start more often than once per interval, even when the city list is short
+                    self._stop_event.wait(max(0.0, cycle_start + self.interval - time.monotonic()))
+        finally:
+            for _ in range(self.workers):
+                self._city_queue.put(_DONE)
+
+    def _fetch(self):
+        """
+        The second stage: fetches the raw response of every queued city.
+        """
+        try:
+            while (city := self._city_queue.get()) is not _DONE:
+                try:
+                    raw = self.weather_service.get_raw_weather(city.name, city.country)
+                except Exception as e:
+                    self._count('failed')
+                    print(f"Error retrieving weather data for {city.get_full_name()}: {e}")
+                    continue
+                self._count('fetched')
+                self._raw_queue.put((city, raw))
+        finally:
+            self._raw_queue.put(_DONE)
+
+    def _parse(self):
+        """
+        The third stage: turns raw responses into Weather objects.
+        """
+        running_fetchers = self.workers
+        try:
+            while running_fetchers:
+                item = self._raw_queue.get()
+                if item is _DONE:
+                    running_fetchers -= 1
+                    continue
+                city, raw = item
+                try:
+                    if metrics.enabled:
+                        start = time.perf_counter()
+                        weather = Weather.from_json(raw)
+                        metrics.observe("weather_json_parse_seconds", time.perf_counter() - start, source="ingest")
+                    else:
+                        weather = Weather.from_json(raw)
+                except Exception as e:
+                    self._count('failed')
+                    print(f"Error parsing weather data for {city.get_full_name()}: {e}")
+                    continue
+                self._weather_queue.put(weather)
+        finally:
+            self._weather_queue.put(_DONE)
+
+    def _write(self):
+        """
+        The last stage: stores Weather objects in batches of up to batch_size, at least every flush_interval.
+        """
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._weather_queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is not None and item is not _DONE:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch and (item is None or item is _DONE or len(batch) >= self.batch_size):
+                with self.write_lock:
+                    stored = self.db_service.add_weather_records(batch, chunk_size=self.batch_size)
+                self._count('stored', stored)
+                batch = []
+                deadline = None
+
+            if item is _DONE:
+                return
+
+    def run(self, cycles: int = None):
+        """
+        Runs the pipeline until stop() is called or the given number of cycles has completed.
+
+        Args:
+            cycles (int): The number of polling cycles to run (default is until stopped).
+        """
+        threads = [threading.Thread(target=self._schedule, args=(cycles,), name='ingest-scheduler')]
+        threads += [threading.Thread(target=self._fetch, name=f'ingest-fetch-{i}') for i in range(self.workers)]
+        threads += [threading.Thread(target=self._parse, name='ingest-parse'),
+                    threading.Thread(target=self._write, name='ingest-write')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
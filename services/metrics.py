@@ -0,0 +1,422 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import json
+import sys
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (in seconds) of the latency histogram buckets, from sub-millisecond parsing to slow HTTP calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The help texts of the metrics recorded by the services, shown in the Prometheus output
+METRIC_HELP = {
+    'weather_http_requests_total': 'HTTP requests to the weather API by endpoint and status.',
+    'weather_http_request_seconds': 'Latency of HTTP requests to the weather API.',
+    'weather_http_retries_total': 'Retried HTTP requests to the weather API by reason.',
+    'weather_json_parse_seconds': 'Time spent decoding and parsing API responses.',
+    'weather_db_session_seconds': 'Time database sessions were open, by operation.',
+    'weather_db_commit_seconds': 'Time spent committing database transactions, by operation.',
+    'weather_db_rows_total': 'Rows written or returned by database operations.',
+    'weather_db_skipped_rows_total': 'Observations not stored, by reason (duplicate or unchanged).',
+    'weather_db_compacted_rows_total': 'Rows and partition files removed or archived by the retention job, by kind.',
+    'weather_cache_events_total': 'Cache lookups and removals by cache and event.',
+    'weather_cache_entries': 'Entries currently held by a cache.',
+}
+
+
+class _Histogram:
+    """
+    Cumulative latency histogram in the Prometheus layout: per-bucket counts, a sum and a count.
+    """
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is the +Inf bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Timer:
+    """
+    Context manager behind MetricsRegistry.timer; the duration is recorded even if the block raises.
+    """
+    __slots__ = ('registry', 'name', 'labels', 'start')
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, labels: dict):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+_NO_TIMER = nullcontext()
+
+
+class MetricsRegistry:
+    """
+    Collects counters and latency histograms, labelled by a few low-cardinality values.
+
+    Recording is guarded by the `enabled` flag: call sites check it before reading the clock, so
+    a disabled registry costs one attribute lookup per instrumented operation. Cache statistics are
+    not recorded on the hot path at all; registered caches are read when the metrics are exported.
+
+    Attributes:
+        enabled (bool): Whether measurements are recorded.
+        buckets (tuple[float]): The upper bounds of the histogram buckets in seconds.
+    """
+
+    def __init__(self, enabled: bool = False, buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Initializes an empty MetricsRegistry.
+
+        Args:
+            enabled (bool): Whether measurements are recorded (default is disabled).
+            buckets (tuple[float]): The upper bounds of the histogram buckets in seconds.
+        """
+        self.enabled = enabled
+        self.buckets = tuple(sorted(buckets))
+        self._counters = {}
+        self._histograms = {}
+        self._caches = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """
+        Adds to a counter.
+
+        Args:
+            name (str): The metric name.
+            amount (float): The value to add.
+            **labels: The label values of the series.
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Records a measurement in a histogram.
+
+        Args:
+            name (str): The metric name.
+            value (float): The measured value, usually a duration in seconds.
+            **labels: The label values of the series.
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def timer(self, name: str, **labels):
+        """
+        Returns a context manager that records the duration of a with block in a histogram.
+
+        When the registry is disabled a shared no-op context manager is returned, so nothing is
+        allocated or measured.
+
+        Args:
+            name (str): The metric name.
+            **labels: The label values of the series.
+
+        Returns:
+            ContextManager: The timer.
+        """
+        if not self.enabled:
+            return _NO_TIMER
+        return _Timer(self, name, labels)
+
+    def register_cache(self, name: str, cache):
+        """
+        Reports the statistics of a TTLCache with every export.
+
+        The cache is held by a weak reference, so registering it does not keep it alive.
+
+        Args:
+            name (str): The value of the 'cache' label.
+            cache (TTLCache): The cache to report.
+        """
+        with self._lock:
+            self._caches[name] = weakref.ref(cache)
+
+    def reset(self):
+        """
+        Discards all recorded measurements. Registered caches stay registered.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def drain(self) -> tuple[dict, dict]:
+        """
+        Returns the measurements recorded since the last drain and discards them.
+
+        Used by worker processes to ship their measurements to the registry of the parent process,
+        which adds them up with merge().
+
+        Returns:
+            tuple[dict, dict]: The counters by (name, labels), and the histograms by (name, labels) as
+            (bucket counts, sum, count) tuples.
+        """
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            histograms, self._histograms = self._histograms, {}
+        return counters, {key: (histogram.counts, histogram.sum, histogram.count)
+                          for key, histogram in histograms.items()}
+
+    def merge(self, counters: dict, histograms: dict):
+        """
+        Adds measurements returned by drain(), e.g. in another process, to this registry.
+
+        Args:
+            counters (dict): The counters by (name, labels).
+            histograms (dict): The histograms by (name, labels) as (bucket counts, sum, count) tuples;
+                they must have been recorded with the same buckets.
+        """
+        with self._lock:
+            for key, value in counters.items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, (counts, total, count) in histograms.items():
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = _Histogram(self.buckets)
+                histogram.counts = [mine + theirs for mine, theirs in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+
+    def _cache_samples(self) -> list[tuple]:
+        """
+        Reads the statistics of the registered caches.
+
+        Returns:
+            list[tuple]: (name, labels, value) samples.
+        """
+        samples = []
+        with self._lock:
+            caches = list(self._caches.items())
+        for name, ref in caches:
+            cache = ref()
+            if cache is None:
+                continue
+            stats = cache.stats()
+            for event in ('hits', 'misses', 'coalesced', 'evictions', 'expirations'):
+                samples.append(('weather_cache_events_total', (('cache', name), ('event', event)), stats[event]))
+            samples.append(('weather_cache_entries', (('cache', name),), stats['size']))
+        return samples
+
+    def snapshot(self) -> dict:
+        """
+        Returns the current values in a JSON-friendly form.
+
+        Histograms are summarized by count, sum and mean; the bucket counts are only part of the
+        Prometheus export.
+
+        Returns:
+            dict: Metric names mapped to lists of {'labels': ..., 'value': ...} or
+            {'labels': ..., 'count': ..., 'sum': ..., 'mean': ...} entries.
+        """
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = [(key, histogram.count, histogram.sum) for key, histogram in self._histograms.items()]
+        result = {}
+        for (name, labels), value in counters:
+            result.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        for name, labels, value in self._cache_samples():
+            result.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        for (name, labels), count, total in histograms:
+            result.setdefault(name, []).append({'labels': dict(labels), 'count': count, 'sum': round(total, 6),
+                                                'mean': round(total / count, 6) if count else 0.0})
+        return result
+
+    def render_prometheus(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text, ending with a newline.
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, list(histogram.counts), histogram.sum, histogram.count)
+                for key, histogram in self._histograms.items()
+            )
+        # Samples of one metric must be adjacent, so the cache samples are merged in by name
+        samples = sorted([(name, labels, value) for (name, labels), value in counters] + self._cache_samples())
+
+        lines = []
+        described = set()
+
+        def describe(name: str, kind: str):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for name, labels, value in samples:
+            describe(name, 'gauge' if name == 'weather_cache_entries' else 'counter')
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), counts, total, count in histograms:
+            describe(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def log_line(self) -> str:
+        """
+        Returns the current values as one structured (JSON) log line.
+
+        Returns:
+            str: A JSON object with a timestamp and the snapshot of all metrics.
+        """
+        return json.dumps({'ts': round(time.time(), 3), 'metrics': self.snapshot()}, separators=(',', ':'))
+
+
+def _label_key(labels: dict) -> tuple:
+    """
+    Turns label keyword arguments into a hashable, sortable series key.
+
+    Args:
+        labels (dict): The label names and values; values are converted to strings.
+
+    Returns:
+        tuple: The sorted (name, value) pairs.
+    """
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: tuple) -> str:
+    """
+    Formats label pairs as a Prometheus label set.
+
+    Args:
+        labels (tuple): (name, value) pairs.
+
+    Returns:
+        str: The label set, e.g. '{status="200"}', or an empty string without labels.
+    """
+    if not labels:
+        return ''
+    escaped = (
+        name + '="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    """
+    Formats a sample value without a trailing '.0' for whole numbers.
+    """
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class PeriodicMetricsLogger:
+    """
+    Writes the metrics of a registry as a structured log line at a fixed interval, on a daemon thread.
+
+    Attributes:
+        registry (MetricsRegistry): The registry to report.
+        interval (float): The number of seconds between log lines.
+    """
+
+    def __init__(self, registry: 'MetricsRegistry', interval: float = 60.0, write=None):
+        """
+        Initializes the logger; call start() to begin logging.
+
+        Args:
+            registry (MetricsRegistry): The registry to report.
+            interval (float): The number of seconds between log lines.
+            write (callable): The function receiving each line (default prints to standard error).
+        """
+        self.registry = registry
+        self.interval = interval
+        self._write = write or (lambda line: print(line, file=sys.stderr, flush=True))
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-logger', daemon=True)
+
+    def start(self) -> 'PeriodicMetricsLogger':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops logging after writing a final line with the latest values.
+        """
+        self._stop_event.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._write(self.registry.log_line())
+        self._write(self.registry.log_line())
+
+
+def serve_metrics(registry: 'MetricsRegistry', port: int, host: str = '') -> ThreadingHTTPServer:
+    """
+    Serves the Prometheus text export at /metrics on a daemon thread.
+
+    Args:
+        registry (MetricsRegistry): The registry to export.
+        port (int): The TCP port to listen on (0 picks a free port).
+        host (str): The interface to bind to (default is all interfaces).
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+
+# The registry the services record into; disabled until metrics.enabled is set
+metrics = MetricsRegistry()
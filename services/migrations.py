@@ -0,0 +1,232 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+
+Schema migrations for existing SQLite databases.
+
+Base.metadata.create_all only creates missing tables, so columns and indexes added to existing
+tables are applied here. The applied version is kept in SQLite's 'user_version' pragma. Every
+migration is idempotent, because on a new database create_all has already built the latest schema.
+
+Usage (from the project root):
+
+    python -m services.migrations [db_url]
+
+Migrations that rebuild a table leave the freed pages inside the file for reuse; run VACUUM on the
+database afterwards to shrink the file itself.
+"""
+
+import sys
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.engine import Connection, Engine
+
+
+def _column_names(connection: Connection, table_name: str) -> set[str]:
+    return {column["name"] for column in inspect(connection).get_columns(table_name)}
+
+
+def _add_observed_at_and_indexes(connection: Connection):
+    """
+    Adds weather_records.observed_at, the unique (name, country) index on city_records and the
+    (city_id, observed_at) index on weather_records.
+    """
+    if "observed_at" not in _column_names(connection, "weather_records"):
+        connection.exec_driver_sql("ALTER TABLE weather_records ADD COLUMN observed_at DATETIME")
+
+    # Duplicate cities would violate the unique index; point their weather records at the oldest copy first
+    connection.exec_driver_sql(
+        "UPDATE weather_records SET city_id = ("
+        "  SELECT MIN(duplicate.id) FROM city_records AS city"
+        "  JOIN city_records AS duplicate ON duplicate.name = city.name AND duplicate.country = city.country"
+        "  WHERE city.id = weather_records.city_id"
+        ") WHERE city_id IN (SELECT id FROM city_records)"
+    )
+    connection.exec_driver_sql(
+        "DELETE FROM city_records WHERE id NOT IN (SELECT MIN(id) FROM city_records GROUP BY name, country)"
+    )
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_city_records_name_country ON city_records (name, country)"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_weather_records_city_id_observed_at ON weather_records (city_id, observed_at)"
+    )
+
+
+def _time_value(column: str) -> str:
+    """
+    Returns SQL reading a weather_records.observed_at value as an SQLite time value: it is stored as
+    Unix seconds since schema version 4 and as text before.
+    """
+    return f"CASE typeof({column}) WHEN 'integer' THEN datetime({column}, 'unixepoch') ELSE {column} END"
+
+
+def rebuild_weather_rollups(connection: Connection):
+    """
+    Recomputes weather_rollups from weather_records. Records without an observation time are skipped.
+
+    Buckets before the first day of a city that still has weather records are kept: the retention job
+    deletes old weather records but keeps their rollups, so those cannot be recomputed.
+
+    Args:
+        connection (Connection): A connection inside the transaction that performs the rebuild.
+    """
+    connection.exec_driver_sql(
+        "DELETE FROM weather_rollups WHERE bucket_start >= ("
+        f"  SELECT strftime('%Y-%m-%d 00:00:00.000000', {_time_value('first')}) FROM ("
+        "    SELECT MIN(observed_at) AS first FROM weather_records WHERE city_id = weather_rollups.city_id"
+        "  )"
+        ")"
+    )
+    # Bucket starts use the same text format SQLAlchemy stores DateTime values in
+    for granularity, bucket_format in (("hour", "%Y-%m-%d %H:00:00.000000"), ("day", "%Y-%m-%d 00:00:00.000000")):
+        bucket_start = f"strftime('{bucket_format}', {_time_value('observed_at')})"
+        connection.exec_driver_sql(
+            "INSERT INTO weather_rollups ("
+            "  city_id, granularity, bucket_start, count,"
+            "  temperature_min, temperature_max, temperature_sum,"
+            "  humidity_min, humidity_max, humidity_sum,"
+            "  pressure_min, pressure_max, pressure_sum,"
+            "  wind_speed_min, wind_speed_max, wind_speed_sum"
+            ") SELECT"
+            f"  city_id, '{granularity}', {bucket_start}, COUNT(*),"
+            "  MIN(temperature), MAX(temperature), SUM(temperature),"
+            "  MIN(humidity), MAX(humidity), SUM(humidity),"
+            "  MIN(pressure), MAX(pressure), SUM(pressure),"
+            "  MIN(wind_speed), MAX(wind_speed), SUM(wind_speed)"
+            " FROM weather_records WHERE observed_at IS NOT NULL"
+            f" GROUP BY city_id, {bucket_start}"
+        )
+
+
+def _deduplicate_observations(connection: Connection):
+    """
+    Removes repeated observations (same city and observation time), makes the (city_id, observed_at)
+    index unique and recomputes the rollups, which counted the repeats.
+    """
+    connection.exec_driver_sql(
+        "DELETE FROM weather_records WHERE observed_at IS NOT NULL AND id NOT IN ("
+        "  SELECT MIN(id) FROM weather_records WHERE observed_at IS NOT NULL GROUP BY city_id, observed_at"
+        ")"
+    )
+    connection.exec_driver_sql("DROP INDEX IF EXISTS ix_weather_records_city_id_observed_at")
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX ix_weather_records_city_id_observed_at ON weather_records (city_id, observed_at)"
+    )
+    rebuild_weather_rollups(connection)
+
+
+def _normalize_weather_records(connection: Connection):
+    """
+    Rebuilds weather_records in its narrow form: the condition becomes an id into weather_conditions,
+    observed_at becomes whole Unix seconds and the unused city_name and city_country columns are dropped.
+
+    SQLite cannot change column types or drop columns that are part of a foreign key, so the table is
+    copied. Observations that only differed in fractions of a second collapse into the oldest one.
+    """
+    if "condition_id" in _column_names(connection, "weather_records"):
+        return
+
+    connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO weather_conditions (name) SELECT DISTINCT condition FROM weather_records"
+    )
+    connection.exec_driver_sql(
+        "CREATE TABLE weather_records_new ("
+        "  id INTEGER NOT NULL,"
+        "  temperature FLOAT NOT NULL,"
+        "  humidity INTEGER NOT NULL,"
+        "  pressure INTEGER NOT NULL,"
+        "  condition_id INTEGER NOT NULL,"
+        "  wind_speed FLOAT NOT NULL,"
+        "  observed_at INTEGER,"
+        "  city_id INTEGER NOT NULL,"
+        "  PRIMARY KEY (id),"
+        "  FOREIGN KEY(condition_id) REFERENCES weather_conditions (id),"
+        "  FOREIGN KEY(city_id) REFERENCES city_records (id)"
+        ")"
+    )
+    connection.exec_driver_sql(
+        "INSERT INTO weather_records_new"
+        "  (id, temperature, humidity, pressure, condition_id, wind_speed, observed_at, city_id)"
+        " SELECT record.id, record.temperature, record.humidity, record.pressure, condition.id,"
+        "  record.wind_speed, CAST(strftime('%s', record.observed_at) AS INTEGER), record.city_id"
+        " FROM weather_records AS record JOIN weather_conditions AS condition ON condition.name = record.condition"
+        " WHERE record.observed_at IS NULL OR record.id IN ("
+        "  SELECT MIN(id) FROM weather_records WHERE observed_at IS NOT NULL"
+        "  GROUP BY city_id, strftime('%s', observed_at)"
+        " )"
+    )
+    connection.exec_driver_sql("DROP TABLE weather_records")
+    connection.exec_driver_sql("ALTER TABLE weather_records_new RENAME TO weather_records")
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX ix_weather_records_city_id_observed_at ON weather_records (city_id, observed_at)"
+    )
+    rebuild_weather_rollups(connection)
+
+
+def _add_city_coordinates(connection: Connection):
+    """
+    Adds the lat and lon columns of city_records, filled in as the cities are next observed.
+    """
+    columns = _column_names(connection, "city_records")
+    for column in ("lat", "lon"):
+        if column not in columns:
+            connection.exec_driver_sql(f"ALTER TABLE city_records ADD COLUMN {column} FLOAT")
+
+
+# MIGRATIONS[n] upgrades a database from schema version n to n + 1
+MIGRATIONS = [
+    _add_observed_at_and_indexes,
+    rebuild_weather_rollups,  # weather_rollups itself is created by create_all
+    _deduplicate_observations,
+    _normalize_weather_records,  # weather_conditions itself is created by create_all
+    _add_city_coordinates,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(connection: Connection) -> int:
+    """
+    Returns the schema version stored in the database.
+
+    Args:
+        connection (Connection): A connection to the SQLite database.
+
+    Returns:
+        int: The number of migrations applied to the database.
+    """
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def run_migrations(engine: Engine) -> int:
+    """
+    Applies all pending migrations to the database, each in its own transaction.
+
+    Args:
+        engine (Engine): The engine of the SQLite database to migrate.
+
+    Returns:
+        int: The number of migrations applied.
+    """
+    with engine.connect() as connection:
+        version = get_schema_version(connection)
+
+    for target_version in range(version + 1, SCHEMA_VERSION + 1):
+        with engine.begin() as connection:
+            MIGRATIONS[target_version - 1](connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {target_version}")
+
+    return max(0, SCHEMA_VERSION - version)
+
+
+if __name__ == "__main__":
+    db_url = sys.argv[1] if len(sys.argv) > 1 else "sqlite:///data/weather.db"
+    applied = run_migrations(create_engine(db_url))
+    print(f"Applied {applied} migration(s); schema version is {SCHEMA_VERSION}.")
@@ -0,0 +1,213 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import os
+import re
+import threading
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.schema import Table
+
+from services.migrations import SCHEMA_VERSION, get_schema_version
+
+# weather-2026-01.db holds the observations of January 2026 (UTC)
+_FILE_NAME = re.compile(r'^weather-(\d{4})-(\d{2})\.db$')
+# Records stored before observation times were recorded have no month
+_UNDATED_FILE_NAME = 'weather-undated.db'
+
+
+def month_start(value: datetime) -> datetime:
+    """
+    Returns the start of the calendar month of a time.
+
+    Args:
+        value (datetime): A naive UTC datetime.
+
+    Returns:
+        datetime: Midnight of the first day of the month.
+    """
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(month: datetime) -> datetime:
+    """
+    Returns the start of the month after a month start.
+    """
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+
+class MonthlyPartitions:
+    """
+    Per-month SQLite files holding raw weather records that were moved out of the main database.
+
+    Every file contains the records observed in one calendar month together with copies of the cities
+    and conditions they reference, so a month can be opened, backed up or deleted on its own. Closed
+    months never change again, which keeps backups incremental and the main database small. Records
+    without an observation time go to a file of their own, addressed with month None.
+
+    Files are opened on demand, one connection per use, so an archive of many months does not hold
+    file handles open. Files written by older versions get the columns added since when they are
+    first opened.
+
+    Attributes:
+        directory (str): The directory of the partition files.
+        tables (list[Table]): The tables created in every partition file.
+    """
+
+    def __init__(self, directory: str, tables: list[Table]):
+        """
+        Initializes the MonthlyPartitions. The directory is created when the first month is archived.
+
+        Args:
+            directory (str): The directory of the partition files.
+            tables (list[Table]): The tables created in every partition file, referenced tables first.
+        """
+        self.directory = directory
+        self.tables = tables
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def path(self, month: datetime) -> str:
+        """
+        Returns the file path of a month.
+
+        Args:
+            month (datetime | None): Any time within the month, or None for the undated records.
+
+        Returns:
+            str: The path of the partition file, whether it exists or not.
+        """
+        if month is None:
+            return os.path.join(self.directory, _UNDATED_FILE_NAME)
+        return os.path.join(self.directory, f"weather-{month.year:04d}-{month.month:02d}.db")
+
+    def months(self) -> list[datetime]:
+        """
+        Lists the months that have a partition file, not counting the undated records.
+
+        Returns:
+            list[datetime]: The month starts in chronological order.
+        """
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        matches = (_FILE_NAME.match(name) for name in names)
+        return sorted(datetime(int(match[1]), int(match[2]), 1) for match in matches if match)
+
+    def overlapping(self, since: datetime = None, until: datetime = None) -> list[datetime]:
+        """
+        Lists the months with a partition file that can hold observations in [since, until).
+
+        Args:
+            since (datetime): The start of the time range (default is unbounded).
+            until (datetime): The end of the time range, exclusive (default is unbounded).
+
+        Returns:
+            list[datetime]: The month starts in chronological order.
+        """
+        return [
+            month for month in self.months()
+            if (since is None or next_month(month) > since) and (until is None or month < until)
+        ]
+
+    def has_undated(self) -> bool:
+        """
+        Returns whether records without an observation time have been archived.
+        """
+        return os.path.exists(self.path(None))
+
+    def engine(self, month: datetime) -> Engine:
+        """
+        Returns the engine of a month's partition file.
+
+        Args:
+            month (datetime | None): Any time within the month, or None for the undated records.
+
+        Returns:
+            Engine: An engine that opens a new connection for every use.
+        """
+        if month is not None:
+            month = month_start(month)
+        with self._lock:
+            engine = self._engines.get(month)
+            if engine is None:
+                path = self.path(month)
+                engine = create_engine(f"sqlite:///{path}", poolclass=NullPool)
+                if os.path.exists(path):
+                    self._upgrade(engine)
+                self._engines[month] = engine
+            return engine
+
+    def _upgrade(self, engine: Engine):
+        """
+        Brings an existing partition file to the current schema by adding the missing tables and columns.
+
+        Partitions only ever receive copies of rows, so columns added to the tables since the file was
+        written are nullable and can simply be appended.
+        """
+        with engine.begin() as connection:
+            if get_schema_version(connection) >= SCHEMA_VERSION:
+                return
+            self.tables[0].metadata.create_all(connection, tables=self.tables)
+            for table in self.tables:
+                existing = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+                for column in table.columns:
+                    if column.name not in existing:
+                        connection.exec_driver_sql(
+                            f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+                            f"{column.type.compile(dialect=connection.dialect)}"
+                        )
+            connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def create(self, month: datetime) -> str:
+        """
+        Creates the partition file of a month with its tables, if it does not exist yet.
+
+        Args:
+            month (datetime | None): Any time within the month, or None for the undated records.
+
+        Returns:
+            str: The path of the partition file.
+        """
+        path = self.path(month)
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            engine = self.engine(month)
+            self.tables[0].metadata.create_all(engine, tables=self.tables)
+            with engine.begin() as connection:
+                connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        else:
+            # Opening the file upgrades it if an older version wrote it
+            self.engine(month)
+        return path
+
+    def drop(self, month: datetime):
+        """
+        Deletes the partition file of a month.
+
+        Args:
+            month (datetime): Any time within the month.
+        """
+        month = month_start(month)
+        with self._lock:
+            engine = self._engines.pop(month, None)
+        if engine is not None:
+            engine.dispose()
+        path = self.path(month)
+        for suffix in ('', '-journal', '-wal', '-shm'):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
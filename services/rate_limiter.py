@@ -0,0 +1,198 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """
+    A token bucket rate limiter that can be shared by threads and asyncio tasks.
+
+    Tokens are added continuously at 'rate' per second, up to 'capacity'. Every request takes one
+    token. Callers reserve their token up front, so waiting callers are served in arrival order and
+    a burst never exceeds the capacity.
+
+    Attributes:
+        rate (float): The number of tokens added per second (the sustained request rate).
+        capacity (float): The maximum number of tokens (the largest allowed burst).
+    """
+
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic):
+        """
+        Initializes a full TokenBucket.
+
+        Args:
+            rate (float): The number of requests allowed per second on average.
+            capacity (float): The largest allowed burst (default is one second's worth of tokens, at least 1).
+            clock (callable): The function returning the current time in seconds.
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, calls: int, capacity: float = None):
+        """
+        Creates a TokenBucket from a per-minute quota, the form in which OpenWeatherMap states its limits.
+
+        Args:
+            calls (int): The number of calls allowed per minute.
+            capacity (float): The largest allowed burst (optional).
+
+        Returns:
+            TokenBucket: The rate limiter.
+        """
+        return cls(calls / 60.0, capacity)
+
+    def _reserve(self) -> float:
+        """
+        Takes one token, going into debt if none is available, and returns how long the caller must wait.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def try_acquire(self) -> bool:
+        """
+        Takes one token if one is available right now.
+
+        Returns:
+            bool: True if a token was taken, False if the caller would have to wait.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def acquire(self):
+        """
+        Takes one token, blocking the calling thread until it is available.
+        """
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """
+        Takes one token, suspending the calling task until it is available.
+        """
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class RetryPolicy:
+    """
+    Decides which failed requests are retried and how long to wait before each retry.
+
+    Delays grow exponentially with "full jitter" (a random delay between zero and the exponential
+    bound), which keeps many clients from retrying in lockstep. A Retry-After header sent by the
+    server takes precedence and is waited out in full; if it asks for more than max_delay, the
+    request is not retried and the error is raised instead.
+
+    Attributes:
+        max_retries (int): The maximum number of retries per request.
+        base_delay (float): The bound of the first retry delay in seconds.
+        max_delay (float): The largest delay in seconds.
+        retry_statuses (frozenset[int]): The HTTP status codes that are retried.
+    """
+
+    def __init__(self, max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 30.0,
+                 retry_statuses=(429, 500, 502, 503, 504)):
+        """
+        Initializes the RetryPolicy.
+
+        Args:
+            max_retries (int): The maximum number of retries per request.
+            base_delay (float): The bound of the first retry delay in seconds.
+            max_delay (float): The largest delay in seconds.
+            retry_statuses (Iterable[int]): The HTTP status codes that are retried (default is 429 and 5xx).
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = frozenset(retry_statuses)
+
+    def should_retry(self, attempt: int, status_code: int = None, retry_after: float = None) -> bool:
+        """
+        Returns whether a failed attempt is retried.
+
+        Args:
+            attempt (int): The number of the failed attempt, starting at 0.
+            status_code (int): The HTTP status of the response, or None if no response arrived.
+            retry_after (float): The delay requested by the server through Retry-After, if any.
+
+        Returns:
+            bool: True if the request should be retried.
+        """
+        if attempt >= self.max_retries:
+            return False
+        if retry_after is not None and retry_after > self.max_delay:
+            return False
+        return status_code is None or status_code in self.retry_statuses
+
+    def delay(self, attempt: int, retry_after: float = None) -> float:
+        """
+        Returns the number of seconds to wait before retrying a failed attempt.
+
+        Args:
+            attempt (int): The number of the failed attempt, starting at 0.
+            retry_after (float): The delay requested by the server through Retry-After, if any; it is
+                returned as is, since should_retry() refuses delays longer than max_delay.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def parse_retry_after(value: str) -> float | None:
+    """
+    Parses a Retry-After header, which holds either a number of seconds or an HTTP date.
+
+    Args:
+        value (str): The header value.
+
+    Returns:
+        float | None: The number of seconds to wait, or None if the header is missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,331 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, literal_column, select
+
+from services.database_service import (
+    CityRecord, DatabaseService, WeatherRecord, WeatherRollup, utc_now
+)
+from services.metrics import metrics
+from services.partitions import month_start
+
+
+class RetentionPolicy:
+    """
+    How long weather records and rollups are kept.
+
+    Raw weather records are the bulk of the database; the hourly and daily rollups summarize them in a
+    fraction of the space, so they can be kept much longer. Rollups are maintained when records are
+    stored, so deleting old records does not change them.
+
+    Attributes:
+        raw_days (int | None): Days weather records stay in the main database (None keeps them forever).
+        hourly_days (int | None): Days hourly rollups are kept (None keeps them forever).
+        daily_days (int | None): Days daily rollups are kept (None keeps them forever).
+        archive_months (int | None): Months archived partition files are kept (None keeps them forever).
+    """
+
+    def __init__(self, raw_days: int = 30, hourly_days: int = 365, daily_days: int = None,
+                 archive_months: int = None):
+        """
+        Initializes the RetentionPolicy. The defaults keep raw records for 30 days, hourly rollups for a
+        year and daily rollups and archives forever.
+        """
+        self.raw_days = raw_days
+        self.hourly_days = hourly_days
+        self.daily_days = daily_days
+        self.archive_months = archive_months
+
+    def cutoffs(self, now: datetime) -> dict[str, datetime | None]:
+        """
+        Returns the time before which data expires, per kind of data.
+
+        Cutoffs are rounded down to midnight, so whole days expire at once and the rollups of the
+        remaining days can always be recomputed from their weather records.
+
+        Args:
+            now (datetime): The current time (naive UTC).
+
+        Returns:
+            dict[str, datetime | None]: The cutoffs of 'raw', 'hour', 'day' and 'archive' data (None
+            where the data never expires).
+        """
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        cutoffs = {
+            kind: None if days is None else today - timedelta(days=days)
+            for kind, days in (('raw', self.raw_days), ('hour', self.hourly_days), ('day', self.daily_days))
+        }
+        cutoffs['archive'] = None
+        if self.archive_months is not None:
+            month = month_start(now)
+            total = month.year * 12 + month.month - 1 - self.archive_months
+            cutoffs['archive'] = month.replace(year=total // 12, month=total % 12 + 1)
+        return cutoffs
+
+
+class CompactionJob:
+    """
+    Enforces a RetentionPolicy on a database, in small batches so it never holds a long write lock.
+
+    Every batch is a short transaction touching at most batch_size rows of one city, found through the
+    (city_id, observed_at) index, and the job pauses between batches so the ingestion writer gets the
+    lock in between. With an archive configured on the DatabaseService, expired weather records are
+    moved to their monthly partition file instead of being deleted. Records stored before observation
+    times were recorded have no age; they are moved to the archive's undated file, and without an
+    archive they are kept. Freed pages are returned to the file system with incremental vacuum steps.
+
+    Attributes:
+        db_service (DatabaseService): The database to compact.
+        policy (RetentionPolicy): What to keep.
+        interval (float): The number of seconds between runs of the background thread.
+        batch_size (int): The maximum number of rows changed per transaction.
+        pause (float): The number of seconds to wait between batches.
+        vacuum_pages (int): The maximum number of free pages released per incremental vacuum step.
+        write_lock (threading.Lock): Held during every transaction of the job.
+        totals (dict[str, int]): The rows removed per kind of data by all runs.
+    """
+
+    def __init__(self, db_service: DatabaseService, policy: RetentionPolicy = None, interval: float = 3600.0,
+                 batch_size: int = 1000, pause: float = 0.05, vacuum_pages: int = 2000,
+                 write_lock: threading.Lock = None):
+        """
+        Initializes the CompactionJob; call run_once() for a single run or start() to run periodically.
+
+        Args:
+            db_service (DatabaseService): The database to compact.
+            policy (RetentionPolicy): What to keep (default is RetentionPolicy()).
+            interval (float): The number of seconds between runs of the background thread.
+            batch_size (int): The maximum number of rows changed per transaction.
+            pause (float): The number of seconds to wait between batches.
+            vacuum_pages (int): The maximum number of free pages released per incremental vacuum step.
+            write_lock (threading.Lock): A lock shared with the thread that writes the observations, so the
+                two never write at the same time (default is a lock of the job's own).
+        """
+        self.db_service = db_service
+        self.policy = policy or RetentionPolicy()
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self.write_lock = write_lock or threading.Lock()
+        self.totals = {'raw': 0, 'archived': 0, 'hour': 0, 'day': 0, 'partitions': 0}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'CompactionJob':
+        """
+        Starts running the job every interval seconds on a daemon thread, beginning immediately.
+        """
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='compaction', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the background thread after its current batch.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error compacting the database: {e}")
+            self._stop_event.wait(self.interval)
+
+    def run_once(self, now: datetime = None) -> dict[str, int]:
+        """
+        Removes the data that has expired under the policy.
+
+        Args:
+            now (datetime): The current time (naive UTC, default is now).
+
+        Returns:
+            dict[str, int]: The number of weather records deleted ('raw') and archived ('archived'),
+            hourly and daily rollups deleted ('hour', 'day') and partition files deleted ('partitions').
+        """
+        self.db_service.ensure_schema()
+        cutoffs = self.policy.cutoffs(now or utc_now())
+        with self.db_service.engine.connect() as connection:
+            city_ids = connection.execute(select(CityRecord.id).order_by(CityRecord.id)).scalars().all()
+
+        counts = dict.fromkeys(self.totals, 0)
+        for city_id in city_ids:
+            if cutoffs['raw'] is not None:
+                if self.db_service.partitions is not None:
+                    counts['archived'] += self._archive_records(city_id, cutoffs['raw'])
+                counts['raw'] += self._delete_records(city_id, cutoffs['raw'])
+            for granularity in ('hour', 'day'):
+                if cutoffs[granularity] is not None:
+                    counts[granularity] += self._delete_rollups(city_id, granularity, cutoffs[granularity])
+            if self._stop_event.is_set():
+                break
+
+        if cutoffs['archive'] is not None and self.db_service.partitions is not None:
+            for month in self.db_service.partitions.months():
+                if month < cutoffs['archive']:
+                    self.db_service.partitions.drop(month)
+                    counts['partitions'] += 1
+        self._release_free_pages()
+
+        for kind, count in counts.items():
+            self.totals[kind] += count
+            if metrics.enabled and count:
+                metrics.inc("weather_db_compacted_rows_total", count, kind=kind)
+        return counts
+
+    def _batches(self, statement_for_batch) -> int:
+        """
+        Executes batch statements, each in its own transaction, until one affects fewer than batch_size rows.
+
+        Args:
+            statement_for_batch (callable): Returns the statement of the next batch.
+
+        Returns:
+            int: The number of affected rows.
+        """
+        total = 0
+        while True:
+            with self.write_lock, self.db_service.engine.begin() as connection:
+                count = connection.execute(statement_for_batch()).rowcount
+            total += count
+            if count < self.batch_size or self._stop_event.wait(self.pause):
+                return total
+
+    def _delete_records(self, city_id: int, cutoff: datetime) -> int:
+        """
+        Deletes the weather records of a city observed before the cutoff. Records without an
+        observation time are not touched.
+        """
+        expired = (
+            select(WeatherRecord.id)
+            .where(WeatherRecord.city_id == city_id, WeatherRecord.observed_at < cutoff)
+            .limit(self.batch_size)
+        )
+        return self._batches(lambda: delete(WeatherRecord).where(WeatherRecord.id.in_(expired.scalar_subquery())))
+
+    def _delete_rollups(self, city_id: int, granularity: str, cutoff: datetime) -> int:
+        """
+        Deletes the rollups of a city and granularity whose buckets start before the cutoff.
+        """
+        rowid = literal_column('rowid')
+        expired = (
+            select(rowid)
+            .select_from(WeatherRollup)
+            .where(WeatherRollup.city_id == city_id, WeatherRollup.granularity == granularity,
+                   WeatherRollup.bucket_start < cutoff)
+            .limit(self.batch_size)
+        )
+        return self._batches(lambda: delete(WeatherRollup).where(rowid.in_(expired.scalar_subquery())))
+
+    def _archive_records(self, city_id: int, cutoff: datetime) -> int:
+        """
+        Moves the weather records of a city observed before the cutoff to their monthly partition files,
+        and those without an observation time to the undated file.
+
+        Each batch is copied with INSERT OR IGNORE before it is deleted, so a batch interrupted between
+        the two databases is completed by the next run without duplicates.
+        """
+        moved = 0
+        # Separate conditions keep each batch query a range scan of the (city_id, observed_at) index
+        for condition in (WeatherRecord.observed_at.is_(None), WeatherRecord.observed_at < cutoff):
+            moved += self._archive_batches(
+                select(WeatherRecord.id, WeatherRecord.observed_at)
+                .where(WeatherRecord.city_id == city_id, condition)
+                .order_by(WeatherRecord.observed_at, WeatherRecord.id)
+                .limit(self.batch_size),
+                city_id
+            )
+            if self._stop_event.is_set():
+                break
+        return moved
+
+    def _archive_batches(self, expired, city_id: int) -> int:
+        """
+        Moves the records selected by a query, one batch at a time, until the query finds fewer than batch_size.
+
+        Args:
+            expired (Select): Selects the id and observation time of the next batch of records of the city.
+            city_id (int): The city of the records.
+
+        Returns:
+            int: The number of moved records.
+        """
+        partitions = self.db_service.partitions
+        columns = ', '.join(column.name for column in WeatherRecord.__table__.columns)
+        moved = 0
+        while True:
+            with self.db_service.engine.connect() as connection:
+                batch = connection.execute(expired).all()
+            if not batch:
+                return moved
+
+            months = {}
+            for record_id, observed_at in batch:
+                month = None if observed_at is None else month_start(observed_at)
+                months.setdefault(month, []).append(record_id)
+            for month, ids in months.items():
+                path = partitions.create(month)
+                placeholders = ', '.join('?' * len(ids))
+                with self.write_lock, self.db_service.engine.connect() as connection:
+                    # ATTACH is not allowed inside a transaction, so it precedes the first write
+                    connection.exec_driver_sql("ATTACH DATABASE ? AS archive", (path,))
+                    try:
+                        # Named columns, so the copy does not depend on the column order of the archive file
+                        connection.exec_driver_sql(
+                            "INSERT OR IGNORE INTO archive.city_records (id, name, country)"
+                            " SELECT id, name, country FROM main.city_records WHERE id = ?",
+                            (city_id,)
+                        )
+                        connection.exec_driver_sql(
+                            "INSERT OR IGNORE INTO archive.weather_conditions SELECT * FROM main.weather_conditions"
+                        )
+                        connection.exec_driver_sql(
+                            f"INSERT OR IGNORE INTO archive.weather_records ({columns})"
+                            f" SELECT {columns} FROM main.weather_records WHERE id IN ({placeholders})",
+                            tuple(ids)
+                        )
+                        connection.exec_driver_sql(
+                            f"DELETE FROM main.weather_records WHERE id IN ({placeholders})", tuple(ids)
+                        )
+                        connection.commit()
+                    except Exception:
+                        connection.rollback()
+                        raise
+                    finally:
+                        connection.exec_driver_sql("DETACH DATABASE archive")
+                moved += len(ids)
+            if len(batch) < self.batch_size or self._stop_event.wait(self.pause):
+                return moved
+
+    def _release_free_pages(self):
+        """
+        Returns free pages to the file system if the database uses incremental auto-vacuum.
+        """
+        with self.db_service.engine.connect() as connection:
+            # 2 is INCREMENTAL; databases created without it need a one-time VACUUM to switch
+            if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+                return
+            driver_connection = connection.connection.driver_connection
+            while connection.exec_driver_sql("PRAGMA freelist_count").scalar():
+                # A single step of the pragma frees one page; executescript runs it to completion
+                with self.write_lock:
+                    driver_connection.executescript(f"PRAGMA incremental_vacuum({self.vacuum_pages})")
+                if self._stop_event.wait(self.pause):
+                    return
@@ -0,0 +1,160 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import threading
+import time
+
+from models.city import City
+
+
+class PollingScheduler:
+    """
+    Spreads the refreshes of a set of cities evenly over a polling interval.
+
+    Instead of requesting every city at the start of a cycle, which exhausts the API quota in one
+    burst, each city gets its own time slot. The order puts cities that were never refreshed or have
+    been stale the longest first, weighted by how popular they are.
+
+    Attributes:
+        interval (float): The length of one polling cycle in seconds, usually the quota window.
+    """
+
+    def __init__(self, cities: list[City] = (), interval: float = 600.0, clock=time.monotonic):
+        """
+        Initializes the PollingScheduler.
+
+        Args:
+            cities (list[City]): The cities to refresh.
+            interval (float): The length of one polling cycle in seconds (default is 10 minutes).
+            clock (callable): The function returning the current time in seconds.
+        """
+        self.interval = interval
+        self._clock = clock
+        self._cities = {}
+        self._last_refreshed = {}
+        self._popularity = {}
+        self._lock = threading.Lock()
+        for city in cities:
+            self.add_city(city)
+
+    @staticmethod
+    def _city_key(city: City) -> tuple[str, str]:
+        return city.name.casefold(), city.country.upper()
+
+    def __len__(self) -> int:
+        return len(self._cities)
+
+    def add_city(self, city: City):
+        """
+        Adds a city to the schedule. It is refreshed first in the next cycle.
+
+        Args:
+            city (City): The city to refresh.
+        """
+        with self._lock:
+            self._cities.setdefault(self._city_key(city), city)
+
+    def remove_city(self, city: City):
+        """
+        Removes a city from the schedule.
+
+        Args:
+            city (City): The city to stop refreshing.
+        """
+        key = self._city_key(city)
+        with self._lock:
+            self._cities.pop(key, None)
+            self._last_refreshed.pop(key, None)
+            self._popularity.pop(key, None)
+
+    def record_request(self, city: City, weight: float = 1.0):
+        """
+        Records that users asked for a city, which moves it forward in the following cycles.
+
+        Args:
+            city (City): The requested city.
+            weight (float): How much the request counts.
+        """
+        key = self._city_key(city)
+        with self._lock:
+            self._popularity[key] = self._popularity.get(key, 0.0) + weight
+
+    def mark_refreshed(self, city: City, when: float = None):
+        """
+        Records that a city's weather was fetched.
+
+        Args:
+            city (City): The refreshed city.
+            when (float): The time of the refresh on the scheduler's clock (default is now).
+        """
+        with self._lock:
+            self._last_refreshed[self._city_key(city)] = self._clock() if when is None else when
+
+    def plan(self) -> list[City]:
+        """
+        Returns the cities in the order they are refreshed in the next cycle.
+
+        Returns:
+            list[City]: Never refreshed cities first, then by staleness multiplied by (1 + popularity).
+        """
+        with self._lock:
+            now = self._clock()
+
+            def priority(key) -> tuple:
+                last = self._last_refreshed.get(key)
+                popularity = self._popularity.get(key, 0.0)
+                if last is None:
+                    return 1, popularity
+                return 0, (now - last) * (1.0 + popularity)
+
+            return [self._cities[key] for key in sorted(self._cities, key=priority, reverse=True)]
+
+    def run_cycle(self, fetch, stop_event: threading.Event = None) -> int:
+        """
+        Refreshes every city once, each in its own evenly spaced slot of the interval.
+
+        A city whose fetch fails is reported and stays stale, so it moves to the front of the next cycle.
+        Popularity is halved after every cycle so old demand fades out.
+
+        Args:
+            fetch (callable): The function called with each City to refresh it.
+            stop_event (threading.Event): Ends the cycle early when set (optional).
+
+        Returns:
+            int: The number of cities refreshed.
+        """
+        cities = self.plan()
+        if not cities:
+            return 0
+
+        slot = self.interval / len(cities)
+        start = self._clock()
+        refreshed = 0
+        for index, city in enumerate(cities):
+            wait = start + index * slot - self._clock()
+            if stop_event is not None:
+                if stop_event.wait(max(0.0, wait)):
+                    break
+            elif wait > 0:
+                time.sleep(wait)
+
+            try:
+                fetch(city)
+            except Exception as e:
+                print(f"Error refreshing {city.get_full_name()}: {e}")
+                continue
+            self.mark_refreshed(city)
+            refreshed += 1
+
+        with self._lock:
+            for key in self._popularity:
+                self._popularity[key] /= 2
+        return refreshed
@@ -0,0 +1,252 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import multiprocessing
+import queue
+import signal
+import threading
+from typing import Iterable
+
+from models.weather import Weather
+from models.weather_batch import WeatherBatch
+from services.api_service import DEFAULT_BASE_URL, OpenWeatherMapService
+from services.database_service import ChangeThresholds, DatabaseService
+from services.ingestion_service import IngestionPipeline
+from services.metrics import metrics
+from services.rate_limiter import RetryPolicy, TokenBucket
+from services.retention import CompactionJob, RetentionPolicy
+
+# Message kinds sent from the shard workers to the writer
+_BATCH = 'batch'
+_METRICS = 'metrics'
+_DONE = 'done'
+
+# The number of seconds between the metrics messages of a worker
+_METRICS_INTERVAL = 5.0
+
+
+class _ShardSink:
+    """
+    Stands in for the DatabaseService of a shard worker's pipeline.
+
+    Cities are read from the database directly (reads do not conflict in WAL mode), but observations
+    are handed to the writer process as WeatherBatch objects, which pickle to a fraction of the size
+    of a list of Weather objects.
+    """
+
+    def __init__(self, db_url: str, results):
+        self._db_service = DatabaseService(db_url)
+        self._results = results
+
+    def get_cities(self):
+        return self._db_service.get_cities()
+
+    def add_weather_records(self, weathers: Iterable[Weather], chunk_size: int = 500) -> int:
+        batch = WeatherBatch.from_weathers(weathers)
+        self._results.put((_BATCH, batch))
+        return len(batch)
+
+
+def _run_shard(index: int, shards: int, options: dict, results, stop_event, cycles: int | None):
+    """
+    The entry point of a shard worker process: runs an ingestion pipeline over one shard of the cities.
+
+    Args:
+        index (int): The shard polled by this worker.
+        shards (int): The number of shards.
+        options (dict): The ShardedIngestion settings needed to build the API client and the pipeline.
+        results (multiprocessing.Queue): Receives the observation batches and the final counters.
+        stop_event (multiprocessing.Event): Set by the parent to stop all workers.
+        cycles (int | None): The number of polling cycles to run (None runs until stopped).
+    """
+    # Ctrl+C reaches the whole process group; the parent decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # The parent exports the metrics, so the worker sends what it recorded there every few seconds
+    metrics.enabled = options['metrics']
+    metrics_done = threading.Event()
+    if metrics.enabled:
+        def forward_metrics():
+            while not metrics_done.wait(_METRICS_INTERVAL):
+                results.put((_METRICS,) + metrics.drain())
+
+        metrics_forwarder = threading.Thread(target=forward_metrics, daemon=True)
+        metrics_forwarder.start()
+
+    rate_limiter = None
+    if options['rate_limit']:
+        # The API limit applies to the account, so every worker gets an equal part of it
+        rate_limiter = TokenBucket.per_minute(options['rate_limit'] / shards)
+    weather_service = OpenWeatherMapService(
+        options['api_key'],
+        options['base_url'],
+        max_workers=options['fetch_workers'],
+        rate_limiter=rate_limiter,
+        retry_policy=RetryPolicy()
+    )
+    pipeline = IngestionPipeline(
+        weather_service,
+        _ShardSink(options['db_url'], results),
+        cities_path=options['cities_path'],
+        interval=options['interval'],
+        workers=options['fetch_workers'],
+        batch_size=options['batch_size'],
+        flush_interval=options['flush_interval'],
+        shard=(index, shards)
+    )
+    threading.Thread(target=lambda: (stop_event.wait(), pipeline.stop()), daemon=True).start()
+    try:
+        pipeline.run(cycles)
+    finally:
+        weather_service.close()
+        if metrics.enabled:
+            metrics_done.set()
+            metrics_forwarder.join()
+            results.put((_METRICS,) + metrics.drain())
+        results.put((_DONE, index, pipeline.fetched, pipeline.failed))
+
+
+class ShardedIngestion:
+    """
+    Runs the ingestion pipeline in several processes, one shard of the cities each, with a single writer.
+
+    Cities are partitioned with shard_of(), so every worker process polls a fixed subset. Workers
+    fetch and parse in parallel, on separate interpreters and therefore separate GILs, and send
+    compact WeatherBatch objects to the process that called run(). That process is the only one that
+    writes to the database, so SQLite never sees concurrent writers. A compaction job, if enabled,
+    runs in the same process and takes turns with the writer. When metrics are enabled in the parent,
+    the workers record them too and send them to the parent's registry every few seconds; only the
+    statistics of the workers' caches are not included.
+
+    Attributes:
+        processes (int): The number of worker processes.
+        fetched (int): The number of responses fetched by all workers.
+        failed (int): The number of fetches or parses that failed in all workers.
+        stored (int): The number of observations stored by the writer.
+    """
+
+    def __init__(self, api_key: str, db_url: str, cities_path: str = None, processes: int = 4,
+                 base_url: str = DEFAULT_BASE_URL, interval: float = 600.0, fetch_workers: int = 4,
+                 batch_size: int = 100, flush_interval: float = 5.0, rate_limit: float = None,
+                 change_thresholds: ChangeThresholds = None, retention_policy: RetentionPolicy = None,
+                 compact_interval: float = None, archive_dir: str = None):
+        """
+        Initializes the ShardedIngestion.
+
+        Args:
+            api_key (str): The OpenWeatherMap API key.
+            db_url (str): The database URL; the workers read the city list from it unless cities_path is given.
+            cities_path (str): The CSV file listing the cities (default is the city_records table).
+            processes (int): The number of worker processes.
+            base_url (str): The API endpoint.
+            interval (float): The length of one polling cycle in seconds.
+            fetch_workers (int): The number of fetch threads per worker process.
+            batch_size (int): The maximum number of observations per batch and database write.
+            flush_interval (float): The maximum number of seconds an observation waits for its batch to fill.
+            rate_limit (float): API calls allowed per minute across all workers (default is unlimited).
+            change_thresholds (ChangeThresholds): Passed to the writer's DatabaseService to store only
+                observations that changed (default is to store every new observation).
+            retention_policy (RetentionPolicy): The policy enforced by the compaction job (default is
+                RetentionPolicy()).
+            compact_interval (float): The number of seconds between compaction runs (default is no compaction).
+            archive_dir (str): The directory expired weather records are archived to (default is to delete them).
+        """
+        self.processes = max(1, processes)
+        self.db_url = db_url
+        self.change_thresholds = change_thresholds
+        self.retention_policy = retention_policy
+        self.compact_interval = compact_interval
+        self.archive_dir = archive_dir
+        self._options = {
+            'api_key': api_key,
+            'base_url': base_url,
+            'db_url': db_url,
+            'cities_path': cities_path,
+            'interval': interval,
+            'fetch_workers': max(1, fetch_workers),
+            'batch_size': max(1, batch_size),
+            'flush_interval': flush_interval,
+            'rate_limit': rate_limit,
+            'metrics': metrics.enabled,
+        }
+        self.fetched = 0
+        self.failed = 0
+        self.stored = 0
+        # Workers must not be forked from the threaded parent. A fork server that has already imported
+        # this module starts them almost as fast as a fork; spawn is the fallback where it is unavailable
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            self._context = multiprocessing.get_context('forkserver')
+            self._context.set_forkserver_preload([__name__])
+        else:
+            self._context = multiprocessing.get_context('spawn')
+        self._stop_event = self._context.Event()
+
+    def stop(self):
+        """
+        Asks all workers to stop. They finish their queued work, which the writer still stores.
+        """
+        self._stop_event.set()
+
+    def run(self, cycles: int = None):
+        """
+        Starts the worker processes and stores their batches until every worker has finished.
+
+        Args:
+            cycles (int): The number of polling cycles to run (default is until stopped).
+        """
+        db_service = DatabaseService(self.db_url, change_thresholds=self.change_thresholds,
+                                     archive_dir=self.archive_dir)
+        db_service.create_schema()
+        write_lock = threading.Lock()
+        compaction = None
+        if self.compact_interval is not None:
+            # Compaction batches and stored batches take turns on the lock instead of competing for SQLite's
+            compaction = CompactionJob(db_service, self.retention_policy, interval=self.compact_interval,
+                                       write_lock=write_lock).start()
+        results = self._context.Queue(maxsize=4 * self.processes)
+        workers = [
+            self._context.Process(target=_run_shard, name=f'ingest-shard-{index}',
+                                  args=(index, self.processes, self._options, results, self._stop_event, cycles))
+            for index in range(self.processes)
+        ]
+        for worker in workers:
+            worker.start()
+
+        try:
+            running = set(range(self.processes))
+            while running:
+                try:
+                    message = results.get(timeout=1.0)
+                except queue.Empty:
+                    # A worker that died without reporting would otherwise keep the writer waiting forever
+                    for index in list(running):
+                        if not workers[index].is_alive() and results.empty():
+                            print(f"Ingestion worker {index} exited with code {workers[index].exitcode}.")
+                            running.discard(index)
+                    continue
+
+                if message[0] == _METRICS:
+                    metrics.merge(message[1], message[2])
+                elif message[0] == _BATCH:
+                    batch = message[1]
+                    with write_lock:
+                        self.stored += db_service.add_weather_records(batch, chunk_size=len(batch))
+                else:
+                    _, index, fetched, failed = message
+                    self.fetched += fetched
+                    self.failed += failed
+                    running.discard(index)
+
+            for worker in workers:
+                worker.join()
+        finally:
+            if compaction is not None:
+                compaction.stop()
@@ -0,0 +1,190 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import heapq
+import math
+from bisect import bisect_left, bisect_right
+from typing import Callable, Hashable, Iterable
+
+# The mean radius of the Earth
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Returns the great-circle distance between two points.
+
+    Args:
+        lat1 (float): The latitude of the first point in degrees.
+        lon1 (float): The longitude of the first point in degrees.
+        lat2 (float): The latitude of the second point in degrees.
+        lon2 (float): The longitude of the second point in degrees.
+
+    Returns:
+        float: The distance in kilometres.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _unit_vector(lat: float, lon: float) -> tuple[float, float, float]:
+    phi, lam = math.radians(lat), math.radians(lon)
+    return math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi)
+
+
+def _chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+class SpatialIndex:
+    """
+    An immutable k-d tree over points on the globe, for nearest-neighbour and range queries.
+
+    Points are stored as 3D unit vectors, so straight-line (chord) distances order them exactly like
+    great-circle distances and neither the poles nor the antimeridian need special cases. The tree is
+    kept implicitly in flat lists: the node of a range is its middle element, split on the axis of
+    its depth. A copy of the points sorted by latitude answers bounding box queries.
+
+    The index is rebuilt rather than updated when points change, which takes about ten milliseconds per
+    thousand points.
+    """
+
+    def __init__(self, points: Iterable[tuple[Hashable, float, float]]):
+        """
+        Builds the index.
+
+        Args:
+            points (Iterable[tuple[Hashable, float, float]]): The (key, latitude, longitude) of every point,
+                in degrees.
+        """
+        points = list(points)
+        nodes = [(_unit_vector(lat, lon), key) for key, lat, lon in points]
+        self._build(nodes, 0, len(nodes), 0)
+        self._vectors = [vector for vector, _ in nodes]
+        self._keys = [key for _, key in nodes]
+
+        by_latitude = sorted(points, key=lambda point: point[1])
+        self._latitudes = [lat for _, lat, _ in by_latitude]
+        self._by_latitude = [(key, lon) for key, _, lon in by_latitude]
+
+    @classmethod
+    def _build(cls, nodes: list, low: int, high: int, depth: int):
+        if high - low <= 1:
+            return
+        axis = depth % 3
+        nodes[low:high] = sorted(nodes[low:high], key=lambda node: node[0][axis])
+        middle = (low + high) // 2
+        cls._build(nodes, low, middle, depth + 1)
+        cls._build(nodes, middle + 1, high, depth + 1)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def nearest(self, lat: float, lon: float, k: int = 1,
+                accept: Callable[[Hashable], bool] = None) -> list[tuple[Hashable, float]]:
+        """
+        Finds the k points nearest to a location.
+
+        Args:
+            lat (float): The latitude of the location in degrees.
+            lon (float): The longitude of the location in degrees.
+            k (int): The number of points to return.
+            accept (Callable[[Hashable], bool]): Skips the points whose key it rejects (optional).
+
+        Returns:
+            list[tuple[Hashable, float]]: Up to k (key, distance in km) pairs, nearest first.
+        """
+        if k <= 0:
+            return []
+        target = _unit_vector(lat, lon)
+        vectors, keys = self._vectors, self._keys
+        # A max-heap of the best candidates so far, as (-squared chord, index)
+        best = []
+
+        def search(low: int, high: int, depth: int):
+            if low >= high:
+                return
+            middle = (low + high) // 2
+            vector = vectors[middle]
+            if accept is None or accept(keys[middle]):
+                distance = ((vector[0] - target[0]) ** 2 + (vector[1] - target[1]) ** 2
+                            + (vector[2] - target[2]) ** 2)
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, middle))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, middle))
+            offset = target[depth % 3] - vector[depth % 3]
+            near, far = ((low, middle), (middle + 1, high)) if offset < 0 else ((middle + 1, high), (low, middle))
+            search(*near, depth + 1)
+            if len(best) < k or offset * offset < -best[0][0]:
+                search(*far, depth + 1)
+
+        search(0, len(vectors), 0)
+        return [(keys[index], _chord_to_km(math.sqrt(-distance))) for distance, index in sorted(best, reverse=True)]
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> list[tuple[Hashable, float]]:
+        """
+        Finds all points within a distance of a location.
+
+        Args:
+            lat (float): The latitude of the location in degrees.
+            lon (float): The longitude of the location in degrees.
+            radius_km (float): The maximum great-circle distance in km.
+
+        Returns:
+            list[tuple[Hashable, float]]: The (key, distance in km) pairs, nearest first.
+        """
+        if radius_km < 0:
+            return []
+        target = _unit_vector(lat, lon)
+        # The chord that subtends the radius; the square root of 4 covers the whole globe
+        limit = 2 * math.sin(min(math.pi, radius_km / EARTH_RADIUS_KM) / 2)
+        limit_squared = limit * limit
+        vectors, keys = self._vectors, self._keys
+        found = []
+
+        def search(low: int, high: int, depth: int):
+            if low >= high:
+                return
+            middle = (low + high) // 2
+            vector = vectors[middle]
+            distance = (vector[0] - target[0]) ** 2 + (vector[1] - target[1]) ** 2 + (vector[2] - target[2]) ** 2
+            if distance <= limit_squared:
+                found.append((distance, middle))
+            offset = target[depth % 3] - vector[depth % 3]
+            if offset <= limit:
+                search(low, middle, depth + 1)
+            if offset >= -limit:
+                search(middle + 1, high, depth + 1)
+
+        search(0, len(vectors), 0)
+        found.sort()
+        return [(keys[index], _chord_to_km(math.sqrt(distance))) for distance, index in found]
+
+    def within_bbox(self, south: float, west: float, north: float, east: float) -> list[Hashable]:
+        """
+        Finds all points inside a latitude/longitude box, such as a map tile.
+
+        Args:
+            south (float): The minimum latitude in degrees.
+            west (float): The western longitude in degrees.
+            north (float): The maximum latitude in degrees.
+            east (float): The eastern longitude in degrees; a box with east < west crosses the antimeridian.
+
+        Returns:
+            list[Hashable]: The keys of the points, from south to north.
+        """
+        band = self._by_latitude[bisect_left(self._latitudes, south):bisect_right(self._latitudes, north)]
+        if west <= east:
+            return [key for key, lon in band if west <= lon <= east]
+        return [key for key, lon in band if lon >= west or lon <= east]
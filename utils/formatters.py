@@ -4,14 +4,20 @@ Address: Gradišćanska 24, 10000 Zagreb, Croatia
 Web: www.algebra.hr
 VAT-ID: 10750578045
 
-Last modified: 2024-09-29
+Last modified: 2026-10-18
 
 NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
 """
 
+from operator import attrgetter
+from typing import TYPE_CHECKING
+
 from models.city import City
 from models.weather import Weather
-from services.database_service import WeatherRecord
+
+if TYPE_CHECKING:
+    # Imported for type hints only, so formatting does not pull in SQLAlchemy
+    from services.database_service import WeatherRecord
 
 
 def format_city(city: City) -> str:
@@ -47,7 +53,7 @@ def format_weather(weather: Weather) -> str:
     )
 
 
-def format_weather_record(record: WeatherRecord) -> str:
+def format_weather_record(record: 'WeatherRecord') -> str:
     """
     Formats a WeatherRecord object for display.
 
@@ -67,7 +73,7 @@ def format_weather_record(record: WeatherRecord) -> str:
     )
 
 
-def format_weather_history(records: list[WeatherRecord]) -> str:
+def format_weather_history(records: list['WeatherRecord']) -> str:
     """
     Formats a list of WeatherRecord objects for display.
 
@@ -82,3 +88,97 @@ def format_weather_history(records: list[WeatherRecord]) -> str:
 
     formatted_records = [format_weather_record(record) for record in records]
     return "\n".join(formatted_records)
+
+
+# The columns of the weather history table: (attribute, header, format); the attribute is the only
+# value read from each row, so ORM records, Core rows and Weather objects can all be printed
+WEATHER_TABLE_COLUMNS = (
+    ('observed_at', 'Observed (UTC)', lambda value: value.isoformat(' ', 'minutes') if value else '-'),
+    ('temperature', 'Temp °C', lambda value: f"{value:.1f}"),
+    ('humidity', 'Hum %', str),
+    ('pressure', 'hPa', str),
+    ('condition', 'Condition', str),
+    ('wind_speed', 'Wind m/s', lambda value: f"{value:.1f}"),
+)
+
+# Columns that identify the city, for tables that mix several cities
+CITY_TABLE_COLUMNS = (
+    ('city', 'City', str),
+    ('country', 'Country', str),
+)
+
+
+def iter_weather_table(rows, columns=WEATHER_TABLE_COLUMNS, window: int = 100):
+    """
+    Formats weather rows as a compact table, one line at a time.
+
+    Rows are formatted in windows of a fixed size. Column widths are computed from the header and
+    the first window and then kept, so memory use depends on the window size and not on the number
+    of rows, and the first lines are produced as soon as the first window has arrived. A later value
+    wider than its column is printed in full and shifts the rest of its line.
+
+    Args:
+        rows (Iterable): Objects with the attributes named in columns, e.g. the rows of
+            DatabaseService.iter_weather_history_rows.
+        columns (tuple): (attribute, header, format) triples of the printed columns.
+        window (int): The number of rows whose values are used to size the columns.
+
+    Yields:
+        str: The header line, a separator line and one line per row, without line endings.
+    """
+    get_values = attrgetter(*(attribute for attribute, _, _ in columns))
+    if len(columns) == 1:
+        # attrgetter returns the value itself, not a tuple, for a single attribute
+        get_single = get_values
+
+        def get_values(row):
+            return get_single(row),
+    formats = [fmt for _, _, fmt in columns]
+    widths = [len(header) for _, header, _ in columns]
+    alignments = None
+    buffered = []
+    template = None
+
+    def flush():
+        nonlocal template
+        if template is None:
+            for cells in buffered:
+                widths[:] = map(max, widths, map(len, cells))
+            yield "  ".join(header.ljust(width) for (_, header, _), width in zip(columns, widths)).rstrip()
+            yield "  ".join("-" * width for width in widths)
+            # One format string for the whole table keeps the per-row work to a single call
+            template = "  ".join(f"{{:{alignment}{width}}}" for alignment, width in zip(alignments, widths))
+        for cells in buffered:
+            yield template.format(*cells).rstrip()
+        buffered.clear()
+
+    for row in rows:
+        values = get_values(row)
+        if alignments is None:
+            # Numbers are right-aligned, text left-aligned
+            alignments = ['>' if isinstance(value, (int, float)) else '<' for value in values]
+        buffered.append([fmt(value) for fmt, value in zip(formats, values)])
+        if len(buffered) >= window:
+            yield from flush()
+    if buffered:
+        yield from flush()
+
+
+def write_weather_table(rows, file, columns=WEATHER_TABLE_COLUMNS, window: int = 100) -> int:
+    """
+    Writes weather rows to a file-like object as a compact table while they are being read.
+
+    Args:
+        rows (Iterable): Objects with the attributes named in columns.
+        file (TextIO): The file to write to, e.g. sys.stdout.
+        columns (tuple): (attribute, header, format) triples of the printed columns.
+        window (int): The number of rows whose values are used to size the columns.
+
+    Returns:
+        int: The number of rows written; nothing, not even the header, is written when there are none.
+    """
+    count = -2  # the header and separator lines are not rows
+    for line in iter_weather_table(rows, columns, window):
+        file.write(line + "\n")
+        count += 1
+    return max(count, 0)
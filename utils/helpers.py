@@ -4,12 +4,21 @@ Address: Gradišćanska 24, 10000 Zagreb, Croatia
 Web: www.algebra.hr
 VAT-ID: 10750578045
 
-Last modified: 2024-09-29
+Last modified: 2026-10-18
 
 NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
 """
 
 import re
+from array import array
+
+from models.weather_batch import WeatherBatch
+
+_numpy = None
+
+# The realistic temperature range for Earth, in °C
+MIN_TEMPERATURE = -100
+MAX_TEMPERATURE = 60
 
 def validate_city_name(city_name: str) -> bool:
     """
@@ -77,4 +86,111 @@ def validate_temperature_range(temperature: float) -> bool:
     Returns:
         bool: True if the temperature is within a valid range, False otherwise.
     """
-    return -100 <= temperature <= 60
+    return MIN_TEMPERATURE <= temperature <= MAX_TEMPERATURE
+
+
+def _import_numpy():
+    """
+    Imports NumPy on first use, so that importing this module stays cheap.
+
+    Returns:
+        module | None: The numpy module, or None if NumPy is not installed (the batch helpers then
+        fall back to the array module).
+    """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+def _temperature_values(temperatures):
+    """
+    Returns the temperatures of a batch, query result or sequence in a form the batch helpers accept.
+
+    Args:
+        temperatures: A numpy array, array('d'), sequence of floats, WeatherBatch, or iterable of objects
+            with a 'temperature' attribute (e.g., WeatherRecord or Weather).
+
+    Returns:
+        numpy.ndarray | array: The temperatures, without copying when the input already is an array.
+    """
+    if isinstance(temperatures, WeatherBatch):
+        return temperatures.temperature
+    np = _import_numpy()
+    if (np is not None and isinstance(temperatures, np.ndarray)) or isinstance(temperatures, array):
+        return temperatures
+    values = array('d')
+    for value in temperatures:
+        values.append(getattr(value, 'temperature', value))
+    return values
+
+
+def _apply(temperatures, scale: float, offset: float):
+    """
+    Computes temperature * scale + offset for every temperature.
+
+    Returns a numpy array for numpy input and array('d') otherwise. With NumPy installed the
+    arithmetic is vectorized, also for array('d') input, which NumPy reads without copying.
+    """
+    values = _temperature_values(temperatures)
+    np = _import_numpy()
+    if np is not None:
+        result = np.asarray(values, dtype=np.float64) * scale + offset
+        return result if isinstance(values, np.ndarray) else array('d', result.tobytes())
+    return array('d', [value * scale + offset for value in values])
+
+
+def kelvin_to_celsius_batch(kelvin_temps):
+    """
+    Converts many temperatures from Kelvin to Celsius.
+
+    Args:
+        kelvin_temps: The temperatures in Kelvin, as a numpy array, array('d'), sequence of floats,
+            WeatherBatch or history query result.
+
+    Returns:
+        numpy.ndarray | array: The temperatures converted to Celsius; a numpy array for numpy input,
+            array('d') otherwise.
+    """
+    return _apply(kelvin_temps, 1.0, -273.15)
+
+
+def celsius_to_fahrenheit_batch(celsius_temps):
+    """
+    Converts many temperatures from Celsius to Fahrenheit.
+
+    Args:
+        celsius_temps: The temperatures in Celsius, as a numpy array, array('d'), sequence of floats,
+            WeatherBatch or history query result.
+
+    Returns:
+        numpy.ndarray | array: The temperatures converted to Fahrenheit; a numpy array for numpy input,
+            array('d') otherwise.
+    """
+    return _apply(celsius_temps, 9 / 5, 32.0)
+
+
+def validate_temperature_range_batch(temperatures) -> list[int]:
+    """
+    Validates many temperatures against the realistic range for Earth (-100°C to 60°C).
+
+    NaN readings are treated as out of range.
+
+    Args:
+        temperatures: The temperatures in Celsius, as a numpy array, array('d'), sequence of floats,
+            WeatherBatch or history query result.
+
+    Returns:
+        list[int]: The indices of the readings outside the valid range, in ascending order.
+    """
+    values = _temperature_values(temperatures)
+    np = _import_numpy()
+    if np is not None:
+        values = np.asarray(values, dtype=np.float64)
+        valid = (values >= MIN_TEMPERATURE) & (values <= MAX_TEMPERATURE)
+        return np.flatnonzero(~valid).tolist()
+    return [index for index, value in enumerate(values) if not MIN_TEMPERATURE <= value <= MAX_TEMPERATURE]
@@ -0,0 +1,83 @@
+"""
+Owner: Algebra University, Zagreb
+Address: Gradišćanska 24, 10000 Zagreb, Croatia
+Web: www.algebra.hr
+VAT-ID: 10750578045
+
+Last modified: 2026-10-18
+
+NOTE: This script is the property of Algebra University, Zagreb. Unauthorized use is strictly prohibited.
+"""
+
+import json
+
+# The decoder used by loads(); chosen on first use so that importing this module stays cheap
+_loads = None
+_backend = None
+
+
+def _select_decoder():
+    """
+    Picks the fastest installed JSON decoder: orjson if it is available, otherwise the standard library.
+
+    Both accept the raw response bytes. orjson decodes UTF-8 directly without creating a str first;
+    the standard library detects the encoding and decodes the bytes itself.
+    """
+    global _loads, _backend
+    try:
+        import orjson
+    except ImportError:
+        _loads, _backend = json.loads, 'json'
+    else:
+        _loads, _backend = orjson.loads, 'orjson'
+
+
+def loads(raw: bytes | str):
+    """
+    Decodes a JSON document with the selected decoder.
+
+    Args:
+        raw (bytes | str): The document, preferably the raw response bytes.
+
+    Returns:
+        Any: The decoded value.
+
+    Raises:
+        ValueError: If the document is not valid JSON (both decoders raise a ValueError subclass).
+    """
+    if _loads is None:
+        _select_decoder()
+    return _loads(raw)
+
+
+def backend() -> str:
+    """
+    Returns the name of the selected decoder.
+
+    Returns:
+        str: 'orjson' or 'json'.
+    """
+    if _backend is None:
+        _select_decoder()
+    return _backend
+
+
+def set_backend(name: str):
+    """
+    Forces a decoder, e.g. to compare them in benchmarks.
+
+    Args:
+        name (str): 'orjson' or 'json'.
+
+    Raises:
+        ValueError: If the name is unknown.
+        ImportError: If orjson is requested but not installed.
+    """
+    global _loads, _backend
+    if name == 'json':
+        _loads, _backend = json.loads, 'json'
+    elif name == 'orjson':
+        import orjson
+        _loads, _backend = orjson.loads, 'orjson'
+    else:
+        raise ValueError(f"Unknown JSON backend '{name}', expected 'orjson' or 'json'")